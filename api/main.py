@@ -1,5 +1,6 @@
-from fastapi import FastAPI, APIRouter, Request, Body
+from fastapi import FastAPI, APIRouter, Request, Body, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from api.schemas import (
     RPTRequest,
     RPTResponse,
@@ -10,16 +11,27 @@ from api.schemas import (
     BulkTruckCleanRequest,
 )
 from api.routes.predict import predict_rate
-from api.routes.truck_cleaner import clean_truck_gemini, clean_truck_gemini_async
+from api.routes.truck_cleaner import (
+    clean_truck_async,
+    truck_clean_error,
+)
 from api.routes.auto_match_headers import auto_match_headers
-from typing import List
-import joblib
+from typing import List, Optional
 import os
 import json
 import asyncio
+import math
+import httpx
 
 
+from utils.circuit_breaker import CircuitOpenError
 from utils.constants import CONSTANTS
+from utils.gemini_transport import close_async_client
+from utils.model_bundle import load_model_bundle
+from utils.llm_accounting import llm_usage, log_usage_periodically, set_llm_endpoint
+from utils.metrics import metrics
+from utils.prompt_registry import prompt_registry
+from utils.truck_index import TruckNameIndex
 
 app = FastAPI(title="Freight Rate Prediction API")
 
@@ -46,19 +58,70 @@ api_router = APIRouter(prefix="/api")
 def load_model_once():
     model_dir = os.path.join("models", CONSTANTS.MODEL_VERSION)
 
-    # load model
-    model_path = os.path.join(model_dir, "model.pkl")
-    app.state.model = joblib.load(model_path)
+    # model.bundle if the version has one (utils/model_bundle.py)
+    bundle = load_model_bundle(model_dir)
+    app.state.model = bundle.model
+    app.state.model_config = bundle.config
+    app.state.category_map = bundle.category_map
+    # lookup arrays of models that encode the hex columns
+    app.state.hex_encoder = bundle.hex_encoder
 
-    model_config_path = os.path.join(model_dir, "model_config.json")
-    with open(model_config_path, "r") as f:
-        app.state.model_config = json.load(f)
+    print("Model, category map, and config loaded successfully.")
 
-    # load category map
-    category_map_path = os.path.join(model_dir, "category_map.pkl")
-    app.state.category_map = joblib.load(category_map_path)
 
-    print("Model, category map, and config loaded successfully.")
+@app.on_event("startup")
+def load_prompts_once():
+    prompt_registry.load_all()
+
+
+@app.on_event("startup")
+def load_truck_index_once():
+    app.state.truck_index = TruckNameIndex.from_files(CONSTANTS.TRUCK_INDEX_GLOB)
+    print(f"Truck index loaded with {len(app.state.truck_index)} known names.")
+
+
+@app.on_event("startup")
+async def start_usage_log():
+    if CONSTANTS.LLM_USAGE_LOG_INTERVAL > 0:
+        app.state.usage_log = asyncio.ensure_future(
+            log_usage_periodically(CONSTANTS.LLM_USAGE_LOG_INTERVAL)
+        )
+
+
+@app.on_event("shutdown")
+async def close_http_client():
+    await close_async_client()
+    if hasattr(app.state, "usage_log"):
+        app.state.usage_log.cancel()
+    print(f"LLM usage:\n{llm_usage.format_summary()}")
+
+
+async def run_llm_call(coro, request: Request):
+    """
+    Await an LLM-backed coroutine on the event loop, cancelling it if the
+    client disconnects or it runs past GEMINI_DEADLINE. An open Gemini
+    circuit with no fallback answer becomes a 503 with Retry-After.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=0.5)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    except (asyncio.TimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail="Gemini request timed out")
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
+    finally:
+        if not task.done():
+            task.cancel()
 
 
 @app.get("/")
@@ -74,15 +137,39 @@ def healthcheck():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    return metrics.render_prometheus()
+
+
+@api_router.get("/prompts")
+def prompt_versions():
+    # content-hash versions, so clients can invalidate cached LLM results
+    return prompt_registry.versions()
+
+
+@api_router.get("/llm_usage")
+def llm_usage_summary():
+    # per-endpoint calls, tokens, cost and how requests were answered
+    return llm_usage.summary()
+
+
 @api_router.post("/clean_truck", response_model=TruckCleanResponse)
-def clean_truck(req: TruckCleanRequest):
-    result = clean_truck_gemini(req.raw_truck_name)
+async def clean_truck(req: TruckCleanRequest, request: Request):
+    set_llm_endpoint("clean_truck")
+    truck_index = getattr(request.app.state, "truck_index", None)
+    result = await run_llm_call(
+        clean_truck_async(req.raw_truck_name, truck_index), request
+    )
     return TruckCleanResponse(**result)
 
 
 @api_router.post("/auto_match_headers", response_model=AutoMatchHeadersResponse)
-def match_headers(req: AutoMatchHeadersRequest):
-    result = auto_match_headers(req.headers, req.sample_rows)
+async def match_headers(req: AutoMatchHeadersRequest, request: Request):
+    set_llm_endpoint("auto_match_headers")
+    result = await run_llm_call(
+        auto_match_headers(req.headers, req.sample_rows), request
+    )
     return AutoMatchHeadersResponse(**result)
 
 
@@ -97,34 +184,96 @@ def predict(request: RPTRequest, req: Request):
         model=model,
         category_map=category_map,
         model_config=model_config,
+        hex_encoder=req.app.state.hex_encoder,
     )
 
 
 @api_router.post("/bulk_clean_truck")
-async def bulk_clean_truck(req: BulkTruckCleanRequest) -> List[TruckCleanResponse]:
+async def bulk_clean_truck(
+    req: BulkTruckCleanRequest, request: Request
+) -> List[TruckCleanResponse]:
+    set_llm_endpoint("bulk_clean_truck")
+    truck_index = getattr(request.app.state, "truck_index", None)
+
     tasks = []
     for raw in req.raw_truck_names:
-        tasks.append(clean_truck_gemini_async(raw))
+        tasks.append(clean_truck_async(raw, truck_index))
 
     cleaned_trucks = []
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
     for raw, result in zip(req.raw_truck_names, results):
         if isinstance(result, Exception):
-            cleaned_trucks.append(
-                {
-                    "raw_truck_name": raw,
-                    "cleaned_code": "",
-                    "dimensions": {},
-                    "error": str(result),
-                }
-            )
+            cleaned_trucks.append(truck_clean_error(raw, result))
         else:
             cleaned_trucks.append(result)
 
     return cleaned_trucks
 
 
+@api_router.post("/bulk_clean_truck/stream")
+async def bulk_clean_truck_stream(
+    req: BulkTruckCleanRequest,
+    request: Request,
+    deadline: Optional[float] = Query(None, gt=0),
+):
+    """
+    Same work as /bulk_clean_truck, streamed as NDJSON: one TruckCleanResponse
+    per line, tagged with its `index` in the request, in completion order.
+    Items still running after `deadline` seconds (BULK_CLEAN_DEADLINE by
+    default) come back as timed-out errors.
+    """
+    truck_index = getattr(request.app.state, "truck_index", None)
+    if deadline is None:
+        deadline = CONSTANTS.BULK_CLEAN_DEADLINE
+    deadline = min(deadline, CONSTANTS.BULK_CLEAN_DEADLINE)
+
+    async def clean_indexed(idx, raw):
+        try:
+            return idx, await clean_truck_async(raw, truck_index)
+        except Exception as e:
+            return idx, truck_clean_error(raw, e)
+
+    def line(idx, result):
+        item = TruckCleanResponse(**result).model_dump()
+        return json.dumps({"index": idx, **item}, ensure_ascii=False) + "\n"
+
+    async def results():
+        # runs in the response's task, so tag the LLM calls here
+        set_llm_endpoint("bulk_clean_truck_stream")
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + deadline
+        pending = {
+            asyncio.ensure_future(clean_indexed(idx, raw))
+            for idx, raw in enumerate(req.raw_truck_names)
+        }
+        finished = set()
+        try:
+            while pending:
+                remaining = stop_at - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    idx, result = task.result()
+                    finished.add(idx)
+                    yield line(idx, result)
+        finally:
+            # also runs when the client disconnects mid-stream
+            for task in pending:
+                task.cancel()
+
+        for idx, raw in enumerate(req.raw_truck_names):
+            if idx not in finished:
+                yield line(
+                    idx, truck_clean_error(raw, f"Timed out after {deadline:g}s")
+                )
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
 @api_router.post("/bulk_predict", response_model=List[RPTResponse])
 def bulk_predict(
     request: Request,
@@ -142,6 +291,7 @@ def bulk_predict(
                 model=model,
                 category_map=category_map,
                 model_config=model_config,
+                hex_encoder=request.app.state.hex_encoder,
             )
             results.append(response)
         except Exception as e:
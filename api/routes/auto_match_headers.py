@@ -1,24 +1,31 @@
-import requests
 import json
+import time
+from utils.circuit_breaker import CircuitOpenError
 from utils.constants import CONSTANTS
-from utils.llm_utils import read_prompt_from_file
+from utils.llm_accounting import llm_usage
+from utils.header_matcher import (
+    REQUIRED_FIELDS,
+    FingerprintCache,
+    header_fingerprint,
+    match_headers_locally,
+)
+from utils.llm_utils import build_gemini_payload, post_gemini_async
+from utils.metrics import metrics
+from utils.prompt_registry import prompt_registry
 
+PROMPT_NAME = "auto_header_matching"
 
-def auto_match_headers(headers, sample_rows):
-    GEMINI_URL = CONSTANTS.GEMINI_URL
+fingerprint_cache = FingerprintCache(
+    max_size=CONSTANTS.HEADER_CACHE_SIZE, path=CONSTANTS.HEADER_CACHE_PATH
+)
 
-    filepath = "utils/prompts/auto_header_matching.txt"
-    prompt_template = read_prompt_from_file(filepath)
 
-    # Replace placeholders safely
-    prompt = prompt_template.replace("{{headers}}", json.dumps(headers)).replace(
-        "{{sample_rows}}", json.dumps(sample_rows)
+async def match_headers_with_llm(headers, sample_rows, template):
+    prompt = template.render(
+        headers=json.dumps(headers), sample_rows=json.dumps(sample_rows)
     )
 
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    headers_req = {"Content-Type": "application/json"}
-
-    response = requests.post(GEMINI_URL, headers=headers_req, data=json.dumps(payload))
+    response = await post_gemini_async(build_gemini_payload(prompt))
 
     if response.status_code == 200:
         candidates = response.json().get("candidates", [])
@@ -26,20 +33,95 @@ def auto_match_headers(headers, sample_rows):
             try:
                 mapping_text = candidates[0]["content"]["parts"][0]["text"]
                 parsed = json.loads(mapping_text.strip("```json").strip("```").strip())
+                return parsed.get("mapping", {}), parsed.get("missing_fields", [])
+            except Exception as e:
+                raise ValueError(f"Gemini returned unparsable output: {e}")
+    raise RuntimeError(f"Gemini API error {response.status_code}: {response.text}")
 
-                mapping = parsed.get("mapping", {})
-                missing = parsed.get("missing_fields", [])
 
-                if missing:
-                    return {
-                        "mapping": mapping,
-                        "error": f"Missing fields: {', '.join(missing)}",
-                        "missing_fields": missing,
-                    }
-                else:
-                    return {"mapping": mapping, "missing_fields": []}
+def _subset_columns(headers, sample_rows, keep):
+    idx = [i for i, h in enumerate(headers) if h in keep]
+    rows = [[row[i] for i in idx if i < len(row)] for row in sample_rows]
+    return [headers[i] for i in idx], rows
 
-            except Exception as e:
-                raise ValueError(f"Gemini returned unparsable output: {e}")
+
+async def resolve_mapping(headers, sample_rows, template):
+    """
+    Map required fields locally and only ask Gemini about ambiguous ones,
+    sending just the headers the local matcher didn't claim. While the
+    Gemini circuit is open the ambiguous fields are reported missing
+    instead (source "local_fallback"), so the user can map them by hand.
+
+    Returns:
+        (mapping, missing_fields, source, llm_calls)
+    """
+    local = match_headers_locally(headers, sample_rows)
+    mapping = dict(local["mapping"])
+    missing = list(local["missing_fields"])
+    ambiguous = local["ambiguous_fields"]
+
+    if not ambiguous:
+        return mapping, missing, "local", 0
+
+    unclaimed = set(headers) - set(mapping.values())
+    llm_headers, llm_rows = _subset_columns(headers, sample_rows, unclaimed)
+    try:
+        llm_mapping, _ = await match_headers_with_llm(llm_headers, llm_rows, template)
+    except CircuitOpenError:
+        missing = [f for f in REQUIRED_FIELDS if f in missing or f in ambiguous]
+        return mapping, missing, "local_fallback", 0
+
+    for field in ambiguous:
+        header = llm_mapping.get(field)
+        if header in unclaimed:
+            mapping[field] = header
+            unclaimed.discard(header)
+        else:
+            missing.append(field)
+
+    mapping = {f: mapping[f] for f in REQUIRED_FIELDS if f in mapping}
+    missing = [f for f in REQUIRED_FIELDS if f in missing]
+    source = "llm" if not local["mapping"] else "local+llm"
+    return mapping, missing, source, 1
+
+
+async def auto_match_headers(headers, sample_rows):
+    start = time.perf_counter()
+    template = prompt_registry.get(PROMPT_NAME)
+    key = header_fingerprint(headers, template.version)
+
+    cached = fingerprint_cache.get(key)
+    if cached is not None:
+        mapping, missing, source, llm_calls = (
+            cached["mapping"],
+            cached["missing_fields"],
+            "cache",
+            0,
+        )
     else:
-        raise RuntimeError(f"Gemini API error {response.status_code}: {response.text}")
+        mapping, missing, source, llm_calls = await resolve_mapping(
+            headers, sample_rows, template
+        )
+        if source != "local_fallback":
+            # degraded answers shouldn't outlive the outage
+            await fingerprint_cache.aput(
+                key, {"mapping": mapping, "missing_fields": missing}
+            )
+
+    latency_ms = round((time.perf_counter() - start) * 1000, 2)
+    metrics.inc("header_match_uploads_total", source=source)
+    llm_usage.record_answer(source)
+    metrics.inc("header_match_llm_calls_total", llm_calls)
+    metrics.observe("header_match_latency_ms", latency_ms, source=source)
+
+    result = {
+        "mapping": mapping,
+        "missing_fields": missing,
+        "prompt_version": template.version,
+        "source": source,
+        "llm_calls": llm_calls,
+        "latency_ms": latency_ms,
+    }
+    if missing:
+        result["error"] = f"Missing fields: {', '.join(missing)}"
+    return result
@@ -1,8 +1,7 @@
 import os
-import joblib
-import json
 
 from utils.constants import CONSTANTS
+from utils.model_bundle import load_model_bundle
 
 MODEL_VERSION = CONSTANTS.MODEL_VERSION
 MODEL_DIR = os.path.join("models", MODEL_VERSION)
@@ -13,14 +12,15 @@ class ModelLoader:
         self.model = None
         self.category_map = None
         self.metadata = None
+        self.hex_encoder = None
         self.load_model()
 
     def load_model(self):
-        self.model = joblib.load(os.path.join(MODEL_DIR, "model.pkl"))
-        with open(os.path.join(MODEL_DIR, "category_map.pkl"), "rb") as f:
-            self.category_map = joblib.load(f)
-        with open(os.path.join(MODEL_DIR, "model_config.json")) as f:
-            self.metadata = json.load(f)
+        bundle = load_model_bundle(MODEL_DIR)
+        self.model = bundle.model
+        self.category_map = bundle.category_map
+        self.metadata = bundle.config
+        self.hex_encoder = bundle.hex_encoder
 
     def get_model(self):
         return self.model
@@ -31,6 +31,9 @@ class ModelLoader:
     def get_metadata(self):
         return self.metadata
 
+    def get_hex_encoder(self):
+        return self.hex_encoder
+
 
 # Singleton instance
 model_loader = ModelLoader()
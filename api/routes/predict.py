@@ -11,7 +11,9 @@ from utils.model_utils import predict_lane_price
 from utils.cost_utils import compute_estimated_fuel_cost, compute_fuel_price_per_km
 
 
-def predict_rate(request: RPTRequest, model, category_map, model_config) -> RPTResponse:
+def predict_rate(
+    request: RPTRequest, model, category_map, model_config, hex_encoder=None
+) -> RPTResponse:
 
     # Extract origin and destination coordinates
     origin_coords = (request.origin.location.lat, request.origin.location.lon)
@@ -75,6 +77,11 @@ def predict_rate(request: RPTRequest, model, category_map, model_config) -> RPTR
         "estimated_fuel_cost_h": estimated_fuel_cost_h,
     }
 
+    # models trained on hex encodings get lookups instead of the hex ids
+    if hex_encoder is not None:
+        encoded = hex_encoder.encode([origin_hex], [destination_hex])
+        input_kwargs.update({name: float(v[0]) for name, v in encoded.items()})
+
     features = model_config["input_features"]
 
     # Sanity check for mismatched features
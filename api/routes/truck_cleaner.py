@@ -1,27 +1,30 @@
-import requests
 import json
+from utils.llm_utils import build_gemini_payload, post_gemini, post_gemini_async
+from utils.prompt_registry import prompt_registry
+from utils.circuit_breaker import CircuitOpenError
 from utils.constants import CONSTANTS
-from utils.llm_utils import read_prompt_from_file
-import httpx
-from typing import Dict
+from utils.llm_accounting import llm_usage
+from utils.metrics import metrics
+from typing import Dict, Optional
 
+PROMPT_NAME = "truck_cleaning"
 
-def clean_truck_gemini(raw_text: str) -> dict:
 
-    filepath = "utils/prompts/truck_cleaning.txt"
+def build_truck_prompt(raw_text: str):
+    """
+    Build the full cleaning prompt for a raw truck name.
 
-    # Read the base prompt from the file
-    base_prompt = read_prompt_from_file(filepath)
+    Returns:
+        (prompt, prompt_version)
+    """
+    template = prompt_registry.get(PROMPT_NAME)
+    return f'{template.text}\n\nRaw Truck: "{raw_text}"\n\nOutput:', template.version
 
-    # Construct the full prompt with the raw text
-    full_prompt = f'{base_prompt}\n\nRaw Truck: "{raw_text}"\n\nOutput:'
 
-    payload = {"contents": [{"parts": [{"text": full_prompt}]}]}
-    headers = {"Content-Type": "application/json"}
+def clean_truck_gemini(raw_text: str) -> dict:
+    full_prompt, prompt_version = build_truck_prompt(raw_text)
 
-    response = requests.post(
-        CONSTANTS.GEMINI_URL, headers=headers, data=json.dumps(payload)
-    )
+    response = post_gemini(build_gemini_payload(full_prompt))
 
     if response.status_code == 200:
         candidates = response.json().get("candidates", [])
@@ -33,6 +36,8 @@ def clean_truck_gemini(raw_text: str) -> dict:
                     cleaned_output.strip("```json").strip("```").strip()
                 )
                 parsed_json["raw_truck_name"] = raw_text
+                parsed_json["prompt_version"] = prompt_version
+                parsed_json["source"] = "llm"
                 return parsed_json
             except Exception as e:
                 raise ValueError(f"Gemini returned unparsable output: {e}")
@@ -40,17 +45,9 @@ def clean_truck_gemini(raw_text: str) -> dict:
 
 
 async def clean_truck_gemini_async(raw_text: str) -> Dict:
-    filepath = "utils/prompts/truck_cleaning.txt"
-    base_prompt = read_prompt_from_file(filepath)
-    full_prompt = f'{base_prompt}\n\nRaw Truck: "{raw_text}"\n\nOutput:'
-
-    payload = {"contents": [{"parts": [{"text": full_prompt}]}]}
-    headers = {"Content-Type": "application/json"}
+    full_prompt, prompt_version = build_truck_prompt(raw_text)
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        response = await client.post(
-            CONSTANTS.GEMINI_URL, headers=headers, json=payload
-        )
+    response = await post_gemini_async(build_gemini_payload(full_prompt))
 
     if response.status_code == 200:
         candidates = response.json().get("candidates", [])
@@ -61,8 +58,69 @@ async def clean_truck_gemini_async(raw_text: str) -> Dict:
                     cleaned_output.strip("```json").strip("```").strip()
                 )
                 parsed_json["raw_truck_name"] = raw_text
+                parsed_json["prompt_version"] = prompt_version
+                parsed_json["source"] = "llm"
                 return parsed_json
             except Exception as e:
                 raise ValueError(f"Gemini returned unparsable output: {e}")
 
     raise RuntimeError(f"Gemini API error {response.status_code}: {response.text}")
+
+
+def clean_truck_from_index(raw_text: str, truck_index) -> Optional[Dict]:
+    """
+    Answer from the closest previously cleaned truck name, if it is similar
+    enough. Returns None when the LLM should be asked instead.
+    """
+    if truck_index is None:
+        return None
+    match = truck_index.best_match(raw_text, CONSTANTS.TRUCK_MATCH_THRESHOLD)
+    metrics.inc("truck_clean_requests_total", source="index" if match else "llm")
+    if match is None:
+        return None
+    match["source"] = "index"
+    return match
+
+
+def clean_truck_fallback(raw_text: str, truck_index) -> Optional[Dict]:
+    """
+    Degraded answer while Gemini's circuit is open: the closest known truck
+    at the looser TRUCK_FALLBACK_THRESHOLD.
+    """
+    if truck_index is None:
+        return None
+    match = truck_index.best_match(raw_text, CONSTANTS.TRUCK_FALLBACK_THRESHOLD)
+    metrics.inc("truck_clean_fallbacks_total", served="index" if match else "none")
+    if match is None:
+        return None
+    match["source"] = "index_fallback"
+    return match
+
+
+async def clean_truck_async(raw_text: str, truck_index=None) -> Dict:
+    """
+    Index lookup first, Gemini for everything the index can't answer. While
+    the circuit is open, falls back to a looser index match or re-raises
+    `CircuitOpenError`.
+    """
+    result = clean_truck_from_index(raw_text, truck_index)
+    if result is None:
+        try:
+            result = await clean_truck_gemini_async(raw_text)
+        except CircuitOpenError:
+            result = clean_truck_fallback(raw_text, truck_index)
+            if result is None:
+                raise
+    llm_usage.record_answer(result["source"])
+    return result
+
+
+def truck_clean_error(raw_text: str, error) -> Dict:
+    """Failed bulk item, shaped like a TruckCleanResponse."""
+    return {
+        "raw_truck_name": raw_text,
+        "cleaned_code": "",
+        "dimensions": {},
+        "reasoning": "",
+        "error": str(error) or type(error).__name__,
+    }
@@ -11,6 +11,10 @@ class AutoMatchHeadersResponse(BaseModel):
     mapping: Dict[str, str]
     missing_fields: List[str] = []
     error: Optional[str] = None
+    prompt_version: Optional[str] = None
+    source: Optional[str] = None  # cache | local | llm | local+llm
+    llm_calls: int = 0
+    latency_ms: Optional[float] = None
 
 
 class TruckCleanRequest(BaseModel):
@@ -22,6 +26,11 @@ class TruckCleanResponse(BaseModel):
     cleaned_code: str
     dimensions: dict
     reasoning: str
+    prompt_version: Optional[str] = None
+    source: Optional[str] = None  # "index" or "llm"
+    match_score: Optional[float] = None
+    matched_raw: Optional[str] = None
+    error: Optional[str] = None
 
 
 class LocationDetails(BaseModel):
@@ -0,0 +1,148 @@
+"""
+Compare training frames loaded with and without the compact dtype schema.
+
+    python scripts/bench_compact_dtypes.py --rows 2000000
+
+A synthetic raw history is run through the data pipeline and written as a
+prepared dataset. Each mode then runs in a fresh process: load the
+haversine model's columns, split, prepare categoricals and construct the
+LightGBM training Dataset, reporting peak RSS, frame size and Dataset
+construction time. Both modes train a few rounds; the compact run also
+scores its test rows with the model trained on float64 columns, the way
+compare_rpt_models.py scores existing models, and counts predictions that
+changed.
+"""
+
+import argparse
+import multiprocessing as mp
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from scripts.bench_dataset_transformations import synthetic_raw
+from src.data import dataset_transformations as dt
+from src.utils.feature_config import (
+    BASE_FEATURES,
+    CATEGORICAL_COLS,
+    DISTANCE_FEATURE_SETS,
+    TARGET,
+)
+from utils.dataset_utils import parquet_path, write_parquet_dataset
+from utils.memory_utils import rss_mb
+
+FEATURES = BASE_FEATURES + DISTANCE_FEATURE_SETS["h"]
+VERSION = "bench"
+PARAMS = {"objective": "regression", "verbosity": -1, "seed": 42}
+
+
+def _run(processed_dir: str, compact: bool, rounds: int, reference, queue):
+    import lightgbm as lgb
+
+    from utils.dataset_utils import load_prepared_dataset
+    from utils.model_utils import prepare_categorical, split_dataset
+
+    before = rss_mb()
+    start = time.perf_counter()
+    df = load_prepared_dataset(
+        VERSION,
+        columns=FEATURES + [TARGET],
+        processed_dir=processed_dir,
+        compact=compact,
+    )
+    load_s = time.perf_counter() - start
+    frame_mb = df.memory_usage(deep=True).sum() / 2**20
+
+    X_train, X_test, y_train, y_test = split_dataset(df, FEATURES, TARGET)
+    X_train, X_test, _ = prepare_categorical(X_train, X_test, CATEGORICAL_COLS)
+    start = time.perf_counter()
+    train_data = lgb.Dataset(X_train, label=y_train, free_raw_data=False).construct()
+    build_s = time.perf_counter() - start
+    peak_mb = rss_mb("VmHWM") - before
+
+    model = lgb.train(PARAMS, train_data, num_boost_round=rounds)
+    pred = model.predict(X_test)
+    changed = None
+    if reference is not None:
+        reference_pred, reference_model = reference
+        booster = lgb.Booster(model_str=reference_model)
+        changed = int((booster.predict(X_test) != reference_pred).sum())
+    queue.put(
+        (len(df), load_s, frame_mb, build_s, peak_mb, pred, model.model_to_string()),
+    )
+    queue.put(changed)
+
+
+def measure(processed_dir: Path, compact: bool, rounds: int, reference=None):
+    """
+    Returns:
+        (results, changed): changed counts test predictions of the
+        `reference` (predictions, model string) that differ in this run.
+    """
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(
+        target=_run, args=(str(processed_dir), compact, rounds, reference, queue)
+    )
+    proc.start()
+    try:
+        return queue.get(timeout=1800), queue.get(timeout=600)
+    finally:
+        proc.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000, help="raw rows")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = dt.build_dataset(synthetic_raw(args.rows, seed=args.seed))
+    workdir = Path(tempfile.mkdtemp(prefix="rpt-dtypes-"))
+    try:
+        write_parquet_dataset(df, parquet_path(VERSION, workdir))
+        del df
+
+        plain, _ = measure(workdir, compact=False, rounds=args.rounds)
+        compact, changed = measure(
+            workdir,
+            compact=True,
+            rounds=args.rounds,
+            # the float64 model's test predictions and the model itself
+            reference=(plain[5], plain[6]),
+        )
+
+        print(f"{plain[0]:,} prepared rows, {len(FEATURES)} features")
+        print(
+            f"{'dtypes':<8} {'load s':>7} {'frame MB':>9} "
+            f"{'Dataset s':>10} {'peak MB':>8}"
+        )
+        for name, (_, load_s, frame_mb, build_s, peak_mb, *_) in [
+            ("float64", plain),
+            ("compact", compact),
+        ]:
+            print(
+                f"{name:<8} {load_s:>7.2f} {frame_mb:>9.0f} "
+                f"{build_s:>10.2f} {peak_mb:>8.0f}"
+            )
+        retrained = np.abs(np.expm1(compact[5]) / np.expm1(plain[5]) - 1)
+        print(
+            f"float64 model on compact test rows: {changed} of {len(plain[5]):,} "
+            f"predictions changed"
+        )
+        print(
+            f"model trained on compact rows: {(retrained > 0).sum()} predictions "
+            f"changed, max relative change {retrained.max():.2e}"
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Compare loading the prepared dataset from CSV and from partitioned Parquet.
+
+    python scripts/bench_dataset_io.py --rows 1000000
+
+A synthetic raw history is run through the data pipeline and written in both
+formats. Each load runs in a fresh process so its peak RSS can be measured;
+"eval" loads only the haversine model's features for the test year, the way
+compare_rpt_models.py does.
+"""
+
+import argparse
+import multiprocessing as mp
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+
+from scripts.bench_dataset_transformations import synthetic_raw
+from src.data import dataset_transformations as dt
+from src.utils.feature_config import BASE_FEATURES, DISTANCE_FEATURE_SETS, TARGET
+from utils.dataset_utils import read_parquet_dataset, write_parquet_dataset
+
+EVAL_COLUMNS = BASE_FEATURES + DISTANCE_FEATURE_SETS["h"] + [TARGET]
+TEST_YEAR = 2025
+
+
+def _rss_mb(field: str) -> float:
+    # VmHWM is the process's peak RSS; unlike ru_maxrss it is reset on exec
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _load(fmt: str, path: str, projected: bool, queue):
+    before = _rss_mb("VmRSS")
+    start = time.perf_counter()
+    if fmt == "csv":
+        df = pd.read_csv(path, usecols=EVAL_COLUMNS if projected else None)
+        if projected:
+            df = df[df["year"] == TEST_YEAR]
+    else:
+        df = read_parquet_dataset(
+            path,
+            columns=EVAL_COLUMNS if projected else None,
+            filters=[("year", "==", TEST_YEAR)] if projected else None,
+        )
+    seconds = time.perf_counter() - start
+    peak_mb = _rss_mb("VmHWM") - before
+    frame_mb = df.memory_usage(deep=True).sum() / 2**20
+    queue.put((len(df), seconds, peak_mb, frame_mb))
+
+
+def measure(fmt: str, path: str, projected: bool):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_load, args=(fmt, path, projected, queue))
+    proc.start()
+    try:
+        return queue.get(timeout=600)
+    finally:
+        proc.join()
+
+
+def disk_mb(path: Path) -> float:
+    out = subprocess.run(["du", "-sk", str(path)], capture_output=True, text=True)
+    return int(out.stdout.split()[0]) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="raw rows")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    df = dt.build_dataset(synthetic_raw(args.rows, seed=args.seed))
+    workdir = Path(tempfile.mkdtemp(prefix="rpt-io-"))
+    try:
+        paths = {"csv": workdir / "data.csv", "parquet": workdir / "data.parquet"}
+        start = time.perf_counter()
+        df.to_csv(paths["csv"], index=False)
+        csv_write = time.perf_counter() - start
+        start = time.perf_counter()
+        write_parquet_dataset(df, paths["parquet"])
+        parquet_write = time.perf_counter() - start
+
+        print(f"{len(df):,} prepared rows")
+        print(
+            f"{'format':<8} {'load':<5} {'rows':>10} {'seconds':>8} "
+            f"{'peak MB':>8} {'frame MB':>9} {'disk MB':>8} {'write s':>8}"
+        )
+        for fmt, write_s in [("csv", csv_write), ("parquet", parquet_write)]:
+            for projected in (False, True):
+                rows, seconds, peak_mb, frame_mb = measure(
+                    fmt, str(paths[fmt]), projected
+                )
+                print(
+                    f"{fmt:<8} {'eval' if projected else 'full':<5} {rows:>10,} "
+                    f"{seconds:>8.2f} {peak_mb:>8.0f} {frame_mb:>9.0f} "
+                    f"{disk_mb(paths[fmt]):>8.1f} {write_s:>8.2f}"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""
+Benchmark the vectorized training-data pipeline against the old row-wise one.
+
+    python scripts/bench_dataset_transformations.py --rows 100000 5000000
+
+Raw rows are synthetic but shaped like the freight history (a few hundred
+cities, lanes repeating across shipments). The row-wise pipeline is the
+notebook's code from before vectorization, copied here; it is only run on
+`--legacy-rows` rows, its throughput is extrapolated, and its output on that
+sample must match the vectorized output exactly.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from src.data import dataset_transformations as dt
+from utils.cleaning_utils import iqr_filter
+from utils.cost_utils import compute_estimated_fuel_cost, compute_fuel_price_per_km
+from utils.geo_utils import compute_lane_features_from_row
+
+
+def synthetic_raw(rows: int, cities: int = 400, lanes: int = 20000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    city_lat = rng.uniform(8, 34, cities)
+    city_lng = rng.uniform(69, 95, cities)
+    lane_o = rng.integers(0, cities, lanes)
+    lane_d = rng.integers(0, cities, lanes)
+    lane = rng.integers(0, lanes, rows)
+    o, d = lane_o[lane], lane_d[lane]
+
+    capacity = rng.choice([3.5, 7.0, 9.0, 16.0, 21.0, 25.0, 32.0], rows)
+    g_distance = np.round(rng.uniform(0, 2500, rows), 1)
+    names = np.array([f"City{i}" for i in range(cities)], dtype=object)
+    states = np.array([f"State{i % 28}" for i in range(cities)], dtype=object)
+    return pd.DataFrame(
+        {
+            "Origin Latitude": city_lat[o],
+            "Origin Longitude": city_lng[o],
+            "Destination Latitude": city_lat[d],
+            "Destination Longitude": city_lng[d],
+            "Cleaned Origin Name": names[o],
+            "Cleaned Origin District": names[o],
+            "Cleaned Origin State": states[o],
+            "Cleaned Destination Name": names[d],
+            "Cleaned Destination District": names[d],
+            "Destination State": states[d],
+            "no_of_wheels": rng.choice([6, 10, 12, 14], rows),
+            "capacity_mt": capacity,
+            "length_ft": rng.choice([14, 17, 19, 20, 22, 24, 32], rows),
+            "axle_type": rng.choice(["Multi Axle", "single axle", "MA", "SA"], rows),
+            "body_type": rng.choice(["Open Body", "Container", "Reefer", "OB"], rows),
+            "Fuel Price - Diesel (INR Rs per liter)": np.round(
+                rng.uniform(85, 100, rows), 2
+            ),
+            "G-Distance (km)": g_distance,
+            "Date": pd.Timestamp("2023-01-01")
+            + pd.to_timedelta(rng.integers(0, 900, rows), unit="D"),
+            "Base Charge": np.round(g_distance * capacity * rng.uniform(2, 6, rows)),
+            "Company": "synthetic",
+        }
+    )
+
+
+# The notebook's steps 1-8, filters and outlier removal as they were before
+# the pipeline was vectorized, kept here verbatim as the baseline
+LEGACY_DROP = [
+    "Cleaned Origin Name",
+    "Cleaned Origin District",
+    "Cleaned Origin State",
+    "Cleaned Destination Name",
+    "Cleaned Destination District",
+    "Destination State",
+    "Mapped Truck Type",
+    "Date",
+    "Month",
+    "Day",
+    "Year",
+    "Mapped OrginName",
+    "Mapped DestinationName",
+    "Cleaned Truck Type",
+    "Company",
+    "H-Distance (km)",
+]
+LEGACY_RENAME = {
+    "Origin Latitude": "origin_lat",
+    "Origin Longitude": "origin_lng",
+    "Destination Latitude": "destination_lat",
+    "Destination Longitude": "destination_lng",
+    "capacity": "capacity_mt",
+    "length": "length_ft",
+    "fuel_price": "fuel_price_inr_per_litre",
+    "g_distance": "g_distance_km",
+    "haversine_distance": "h_distance_km",
+    "bearing_angle": "bearing_angle_deg",
+}
+LEGACY_NUMERIC = [
+    "origin_lat",
+    "origin_lng",
+    "destination_lat",
+    "destination_lng",
+    "no_of_wheels",
+    "capacity_mt",
+    "length_ft",
+    "fuel_price_inr_per_litre",
+    "g_distance_km",
+    "h_distance_km",
+    "hex_ring_distance",
+    "bearing_angle_deg",
+    "fuel_price_per_km_g",
+    "fuel_price_per_km_h",
+    "estimated_fuel_cost_g",
+    "estimated_fuel_cost_h",
+    "fuel_cost_per_tkm_g",
+    "fuel_cost_per_tkm_h",
+    "base_price",
+    "log_base_price",
+    "is_multi_axle",
+]
+
+
+def legacy_build(df: pd.DataFrame) -> pd.DataFrame:
+    # Step 1: Geospatial Features
+    features = [
+        "origin_hex",
+        "destination_hex",
+        "lane_hex",
+        "haversine_distance",
+        "bearing_angle",
+        "hex_ring_distance",
+    ]
+    df[features] = df.apply(
+        lambda row: pd.Series(compute_lane_features_from_row(row)), axis=1
+    )
+
+    # Step 2: Truck Feature Engineering
+    df.rename(columns={"capacity_mt": "capacity", "length_ft": "length"}, inplace=True)
+    df["axle_type"] = (
+        df["axle_type"]
+        .astype(str)
+        .str.strip()
+        .str.upper()
+        .replace({"MULTI AXLE": "MA", "SINGLE AXLE": "SA"})
+    )
+    df["is_multi_axle"] = df["axle_type"].map({"SA": 0, "MA": 1})
+    df["body_type"] = (
+        df["body_type"]
+        .astype(str)
+        .str.strip()
+        .str.upper()
+        .replace(
+            {
+                "CONTAINER": "CB",
+                "CLOSED BODY": "CB",
+                "OPEN BODY": "OB",
+                "REEFER": "CB",
+                "HIGH CUBE": "HC",
+                "FLATBED": "FL",
+            }
+        )
+    )
+
+    # Step 3: Cost Feature Engineering
+    df.rename(
+        columns={
+            "Fuel Price - Diesel (INR Rs per liter)": "fuel_price",
+            "G-Distance (km)": "g_distance",
+        },
+        inplace=True,
+    )
+    df["fuel_price_per_km_g"] = df.apply(
+        lambda row: compute_fuel_price_per_km(row["fuel_price"], row["g_distance"]),
+        axis=1,
+    )
+    df["fuel_price_per_km_h"] = df.apply(
+        lambda row: compute_fuel_price_per_km(
+            row["fuel_price"], row["haversine_distance"]
+        ),
+        axis=1,
+    )
+    df["estimated_fuel_cost_g"] = df.apply(
+        lambda row: compute_estimated_fuel_cost(
+            row["fuel_price"], row["g_distance"], row["capacity"]
+        ),
+        axis=1,
+    )
+    df["estimated_fuel_cost_h"] = (
+        df["fuel_price"] * df["haversine_distance"] * df["capacity"]
+    )
+    df["fuel_cost_per_tkm_g"] = df["fuel_price_per_km_g"] / df["capacity"]
+    df["fuel_cost_per_tkm_h"] = df["fuel_price_per_km_h"] / df["capacity"]
+
+    # Step 4: Temporal Features
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["day"] = df["Date"].dt.day
+    df["month"] = df["Date"].dt.month
+    df["year"] = df["Date"].dt.year
+
+    # Step 5: Target Variable
+    df.rename(columns={"Base Charge": "base_price"}, inplace=True)
+    df["log_base_price"] = np.log1p(df["base_price"])
+
+    # Step 6: Cleanup
+    df["lane_identifier"] = (
+        df["Cleaned Origin Name"].str.strip()
+        + " - "
+        + df["Cleaned Origin District"].str.strip()
+        + ", "
+        + df["Cleaned Origin State"].str.strip()
+        + " → "
+        + df["Cleaned Destination Name"].str.strip()
+        + " - "
+        + df["Cleaned Destination District"].str.strip()
+        + ", "
+        + df["Destination State"].str.strip()
+        + " | "
+        + df["capacity"].astype(str)
+        + "MT_"
+        + df["axle_type"]
+        + "_"
+        + df["body_type"]
+    )
+    df.drop(columns=[col for col in LEGACY_DROP if col in df.columns], inplace=True)
+    df = df[df["g_distance"] > 0]
+    df.dropna(subset=["g_distance", "fuel_price", "base_price"], inplace=True)
+
+    # Step 7: Rename and Reorder Columns
+    df.rename(columns=LEGACY_RENAME, inplace=True)
+    df = df[dt.FINAL_COLUMNS]
+
+    # Step 8: Final Cleaning
+    df[LEGACY_NUMERIC] = df[LEGACY_NUMERIC].apply(pd.to_numeric, errors="coerce")
+    df = df[
+        (df["origin_hex"] != df["destination_hex"])
+        & (df["base_price"] >= 100)
+        & (df["g_distance_km"] > 1)
+        & (df["h_distance_km"] > 1)
+        & (df["bearing_angle_deg"] > 0)
+    ]
+    df = df[
+        ~((df["bearing_angle_deg"] <= 1) & (df["h_distance_km"] < 10))
+        & ~(df["g_distance_km"] < df["h_distance_km"])
+    ]
+    df = iqr_filter(df, "base_price")
+    df["log_base_price"] = np.log1p(df["base_price"])
+    return df
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 5_000_000])
+    parser.add_argument("--legacy-rows", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sample = synthetic_raw(args.legacy_rows, seed=args.seed)
+    legacy, legacy_s = timed(legacy_build, sample.copy())
+    fast, _ = timed(dt.build_dataset, sample.copy())
+    pd.testing.assert_frame_equal(
+        legacy.reset_index(drop=True), fast.reset_index(drop=True), check_exact=True
+    )
+    legacy_rate = args.legacy_rows / legacy_s
+    print(
+        f"row-wise: {args.legacy_rows} rows in {legacy_s:.1f}s "
+        f"({legacy_rate:,.0f} rows/s); vectorized output identical"
+    )
+
+    for rows in args.rows:
+        raw = synthetic_raw(rows, seed=args.seed)
+        stages = {}
+        start = time.perf_counter()
+        df = raw
+        for name, stage in [
+            ("geo", dt.add_geo_features),
+            ("truck", dt.add_truck_features),
+            ("cost", dt.add_cost_features),
+            ("temporal", dt.add_temporal_features),
+            ("finalize", dt.finalize_columns),
+            ("filter", dt.filter_rows),
+            ("outlier", dt.remove_outliers),
+        ]:
+            df, stages[name] = timed(stage, df)
+        total = time.perf_counter() - start
+        breakdown = " ".join(f"{k}={v:.2f}s" for k, v in stages.items())
+        print(
+            f"vectorized: {rows:>9,} rows in {total:6.2f}s "
+            f"({rows / total:,.0f} rows/s, ~{rows / legacy_rate / total:,.0f}x "
+            f"row-wise) | {breakdown}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Compare the hex encodings of utils/hex_encoding.py with hex categoricals.
+
+    python scripts/bench_hex_encoding.py --rows 2000000
+    python scripts/bench_hex_encoding.py --data-version v4 --modes categorical target
+
+Each mode trains the haversine feature set with config.yaml's params and
+`training` schedule through src/models/train.py's prepare_datasets. It
+saves the artifacts the API loads (model.txt, category_map.pkl and, for
+encoded modes, hex_encoding.npz) to a temporary directory. Reports:
+artifact sizes, load time, single-request latency through
+predict_lane_price (with the hex lookups for encoded modes, as in
+api/routes/predict.py) and test-year accuracy.
+
+Without --data-version a synthetic raw history is run through the data
+pipeline first, as in bench_compact_dtypes.py.
+"""
+
+import argparse
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import lightgbm as lgb
+import numpy as np
+
+from scripts.bench_dataset_transformations import synthetic_raw
+from src.data import dataset_transformations as dt
+from src.models.train import hex_encoder, prepare_datasets
+from src.utils.feature_config import BASE_FEATURES, DISTANCE_FEATURE_SETS, TARGET
+from utils.dataset_utils import (
+    load_prepared_dataset,
+    parquet_path,
+    write_parquet_dataset,
+)
+from utils.hex_encoding import HEX_ENCODING_FILE, MODES, HexEncoder
+from utils.model_utils import evaluate, load_config, predict_lane_price, train_booster
+
+FEATURES = BASE_FEATURES + DISTANCE_FEATURE_SETS["h"]
+VERSION = "bench"
+
+
+def save_artifacts(out_dir: Path, model, category_map, encoder) -> dict:
+    """The API's model files; returns {file: bytes on disk}."""
+    out_dir.mkdir(parents=True)
+    model.save_model(str(out_dir / "model.txt"))
+    with open(out_dir / "category_map.pkl", "wb") as f:
+        pickle.dump(category_map, f)
+    if encoder is not None:
+        encoder.save(out_dir / HEX_ENCODING_FILE)
+    return {p.name: p.stat().st_size for p in sorted(out_dir.iterdir())}
+
+
+def load_artifacts(out_dir: Path):
+    model = lgb.Booster(model_file=str(out_dir / "model.txt"))
+    with open(out_dir / "category_map.pkl", "rb") as f:
+        category_map = pickle.load(f)
+    path = out_dir / HEX_ENCODING_FILE
+    encoder = HexEncoder.load(path) if path.exists() else None
+    return model, category_map, encoder
+
+
+def request_latency(model, category_map, encoder, rows) -> np.ndarray:
+    """Seconds per single-row prediction, the way /predict makes it."""
+    features = model.feature_name()
+    seconds = []
+    for row in rows:
+        start = time.perf_counter()
+        kwargs = dict(row)
+        if encoder is not None:
+            encoded = encoder.encode([row["origin_hex"]], [row["destination_hex"]])
+            kwargs.update({name: float(v[0]) for name, v in encoded.items()})
+        predict_lane_price(model, category_map, features, **kwargs)
+        seconds.append(time.perf_counter() - start)
+    return np.array(seconds)
+
+
+def run_mode(mode, config, data_version, processed_dir, workdir, requests, seed):
+    training = config["training"]
+    settings = {**config.get("hex_encoding", {}), "mode": mode}
+    start = time.perf_counter()
+    train_data, valid_data, category_map, (X_test, y_test), encoder, _ = (
+        prepare_datasets(
+            data_version,
+            FEATURES,
+            TARGET,
+            config["params"],
+            training["test_year"],
+            processed_dir=processed_dir,
+            encoder=hex_encoder(settings),
+        )
+    )
+    prepare_s = time.perf_counter() - start
+    start = time.perf_counter()
+    model = train_booster(
+        config["params"],
+        train_data,
+        valid_data,
+        num_boost_round=training["num_boost_round"],
+        early_stopping_rounds=training["early_stopping_rounds"],
+        log_period=training["log_period"],
+    )
+    train_s = time.perf_counter() - start
+    metrics = evaluate(y_test, model.predict(X_test))
+    rounds = model.best_iteration
+
+    sizes = save_artifacts(workdir / mode, model, category_map, encoder)
+    loads = []
+    for _ in range(5):
+        start = time.perf_counter()
+        model, category_map, encoder = load_artifacts(workdir / mode)
+        loads.append(time.perf_counter() - start)
+
+    test = load_prepared_dataset(
+        data_version,
+        columns=FEATURES,
+        filters=[("year", "==", training["test_year"])],
+        processed_dir=processed_dir,
+        compact=False,
+    )
+    sample = np.random.default_rng(seed).choice(len(test), requests)
+    rows = test.iloc[sample].to_dict("records")
+    latency = request_latency(model, category_map, encoder, rows)
+    return {
+        "mode": mode,
+        "prepare_seconds": prepare_s,
+        "train_seconds": train_s,
+        "best_iteration": rounds,
+        "sizes": sizes,
+        "load_seconds": float(np.median(loads)),
+        "latency_ms": (
+            float(np.median(latency) * 1e3),
+            float(np.percentile(latency, 95) * 1e3),
+        ),
+        "metrics": metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, default=2_000_000, help="synthetic raw rows"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-version", help="benchmark a prepared dataset instead")
+    parser.add_argument("--processed-dir", help="default: data/processed/<version>")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    config = load_config()
+    workdir = Path(tempfile.mkdtemp(prefix="rpt-hex-encoding-"))
+    data_version, processed_dir = args.data_version, args.processed_dir
+    try:
+        if data_version is None:
+            write_parquet_dataset(
+                dt.build_dataset(synthetic_raw(args.rows, seed=args.seed)),
+                parquet_path(VERSION, workdir),
+            )
+            data_version, processed_dir = VERSION, str(workdir)
+        results = [
+            run_mode(
+                mode,
+                config,
+                data_version,
+                processed_dir,
+                workdir,
+                args.requests,
+                args.seed,
+            )
+            for mode in args.modes
+        ]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(
+        f"\n{'mode':<12} {'model KB':>9} {'cats KB':>8} {'hex KB':>7} {'load ms':>8} "
+        f"{'p50 ms':>7} {'p95 ms':>7} {'prep s':>7} {'train s':>8} {'rounds':>6} "
+        f"{'RMSE':>9} {'MAPE':>7}"
+    )
+    for r in results:
+        sizes = r["sizes"]
+        print(
+            f"{r['mode']:<12} {sizes['model.txt'] / 1024:>9.0f} "
+            f"{sizes['category_map.pkl'] / 1024:>8.0f} "
+            f"{sizes.get(HEX_ENCODING_FILE, 0) / 1024:>7.0f} "
+            f"{r['load_seconds'] * 1e3:>8.1f} {r['latency_ms'][0]:>7.2f} "
+            f"{r['latency_ms'][1]:>7.2f} {r['prepare_seconds']:>7.2f} "
+            f"{r['train_seconds']:>8.2f} {r['best_iteration']:>6} "
+            f"{r['metrics']['RMSE']:>9.1f} {r['metrics']['MAPE']:>7.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Train the feature_config feature set over a grid of LightGBM settings.
+
+    python scripts/bench_lgb_settings.py --rows 2000000
+    python scripts/bench_lgb_settings.py --data-version v4 --threads 1 4 8 \\
+        --max-bin 63 255 --output lgb_settings.json
+
+Every combination of --threads, --max-bin, --layout (force_col_wise,
+force_row_wise or LightGBM's choice), --max-cat-to-onehot, --cat-smooth and
+--bagging runs in a fresh process on top of config.yaml's params. The run
+loads the model's columns, splits off the test year, builds the Dataset and
+trains a fixed number of rounds, so every run does the same work. It reports
+Dataset build and training time, peak memory above the loaded frames, model
+size and test-year RMSE.
+
+Without --data-version a synthetic raw history is run through the data
+pipeline first, as in bench_compact_dtypes.py. Its three hex columns have
+the cardinality of real lanes but no real price signal, so RMSE differences
+between settings matter more than the values.
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from scripts.bench_dataset_transformations import synthetic_raw
+from src.data import dataset_transformations as dt
+from src.utils.feature_config import BASE_FEATURES, DISTANCE_FEATURE_SETS, TARGET
+from utils.dataset_utils import parquet_path, write_parquet_dataset
+from utils.model_utils import load_config
+
+VERSION = "bench"
+LAYOUTS = {
+    "col": {"force_col_wise": True},
+    "row": {"force_row_wise": True},
+    "auto": {},
+}
+GRID = [
+    "num_threads",
+    "max_bin",
+    "layout",
+    "max_cat_to_onehot",
+    "cat_smooth",
+    "bagging",
+]
+
+
+def run_params(base: dict, setting: dict) -> dict:
+    """config.yaml's params with one grid point applied."""
+    params = {
+        k: v for k, v in base.items() if k not in ("bagging_fraction", "bagging_freq")
+    }
+    params.update(
+        num_threads=setting["num_threads"],
+        max_bin=setting["max_bin"],
+        max_cat_to_onehot=setting["max_cat_to_onehot"],
+        cat_smooth=setting["cat_smooth"],
+        **LAYOUTS[setting["layout"]],
+    )
+    if setting["bagging"] == "on":
+        params.update(
+            bagging_fraction=base.get("bagging_fraction", 0.8),
+            bagging_freq=base.get("bagging_freq", 5) or 5,
+        )
+    return params
+
+
+def _run(data_version, processed_dir, features, test_year, params, rounds, queue):
+    import lightgbm as lgb
+
+    from src.models.train import categorical_features
+    from utils.dataset_utils import load_prepared_dataset
+    from utils.memory_utils import PeakRss
+    from utils.model_utils import evaluate, prepare_categorical, split_dataset
+
+    df = load_prepared_dataset(
+        data_version,
+        columns=features + [TARGET],
+        filters=[("year", "<=", test_year)],
+        processed_dir=processed_dir,
+    )
+    X_train, X_test, y_train, y_test = split_dataset(df, features, TARGET, test_year)
+    del df
+    X_train, X_test, _ = prepare_categorical(
+        X_train, X_test, categorical_features(features)
+    )
+
+    with PeakRss() as mem:
+        start = time.perf_counter()
+        train_data = lgb.Dataset(X_train, label=y_train, params=params).construct()
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        model = lgb.train(params, train_data, num_boost_round=rounds)
+        train_s = time.perf_counter() - start
+    queue.put(
+        {
+            "dataset_seconds": round(build_s, 2),
+            "train_seconds": round(train_s, 2),
+            "peak_mb": round(mem.peak_mb, 1),
+            "model_mb": round(len(model.model_to_string()) / 2**20, 2),
+            "rmse": float(evaluate(y_test, model.predict(X_test))["RMSE"]),
+            "train_rows": len(X_train),
+        }
+    )
+
+
+def measure(data_version, processed_dir, features, test_year, params, rounds):
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(
+        target=_run,
+        args=(data_version, processed_dir, features, test_year, params, rounds, queue),
+    )
+    proc.start()
+    try:
+        return queue.get(timeout=3600)
+    finally:
+        proc.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, default=2_000_000, help="synthetic raw rows"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-version", help="benchmark a prepared dataset instead")
+    parser.add_argument("--processed-dir", help="default: data/processed/<version>")
+    parser.add_argument(
+        "--distance", choices=sorted(DISTANCE_FEATURE_SETS), default="h"
+    )
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--threads", type=int, nargs="+", default=[os.cpu_count()])
+    parser.add_argument("--max-bin", type=int, nargs="+", default=[63, 255])
+    parser.add_argument(
+        "--layout", nargs="+", choices=sorted(LAYOUTS), default=["col", "row"]
+    )
+    parser.add_argument("--max-cat-to-onehot", type=int, nargs="+", default=[4])
+    parser.add_argument("--cat-smooth", type=float, nargs="+", default=[10, 50])
+    parser.add_argument(
+        "--bagging", nargs="+", choices=["on", "off"], default=["on", "off"]
+    )
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    config = load_config()
+    features = BASE_FEATURES + DISTANCE_FEATURE_SETS[args.distance]
+    test_year = config["training"]["test_year"]
+    grid = [
+        dict(zip(GRID, values))
+        for values in itertools.product(
+            args.threads,
+            args.max_bin,
+            args.layout,
+            args.max_cat_to_onehot,
+            args.cat_smooth,
+            args.bagging,
+        )
+    ]
+
+    workdir = None
+    data_version, processed_dir = args.data_version, args.processed_dir
+    if data_version is None:
+        workdir = Path(tempfile.mkdtemp(prefix="rpt-lgb-settings-"))
+        write_parquet_dataset(
+            dt.build_dataset(synthetic_raw(args.rows, seed=args.seed)),
+            parquet_path(VERSION, workdir),
+        )
+        data_version, processed_dir = VERSION, str(workdir)
+
+    results = []
+    try:
+        for setting in grid:
+            params = run_params(config["params"], setting)
+            result = measure(
+                data_version, processed_dir, features, test_year, params, args.rounds
+            )
+            results.append({**setting, **result})
+            print(
+                "  "
+                + " ".join(f"{k}={v}" for k, v in setting.items())
+                + f": {result['train_seconds']}s"
+            )
+    finally:
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print(
+        f"\n{results[0]['train_rows']:,} training rows, {len(features)} features, "
+        f"{args.rounds} rounds"
+    )
+    header = (
+        f"{'threads':>7} {'max_bin':>7} {'layout':>6} {'onehot':>6} {'smooth':>6} "
+        f"{'bagging':>7} {'Dataset s':>9} {'train s':>8} {'peak MB':>8} "
+        f"{'model MB':>8} {'RMSE':>10}"
+    )
+    print(header)
+    for r in sorted(results, key=lambda r: r["train_seconds"]):
+        print(
+            f"{r['num_threads']:>7} {r['max_bin']:>7} {r['layout']:>6} "
+            f"{r['max_cat_to_onehot']:>6} {r['cat_smooth']:>6g} {r['bagging']:>7} "
+            f"{r['dataset_seconds']:>9.2f} {r['train_seconds']:>8.2f} "
+            f"{r['peak_mb']:>8.0f} {r['model_mb']:>8.2f} {r['rmse']:>10.1f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rounds": args.rounds, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark the Gemini scheduler against a simulated rate-limited stub.
+
+The stub accepts `--quota` requests per second (one second of burst) and
+answers 429 with a Retry-After header beyond that. We compare the old batch
+cleaner behaviour (fixed 0.5-0.85s sleep, no retries) with the scheduler
+configured above and below the real quota.
+
+    python scripts/bench_llm_scheduler.py --requests 200 --quota 5
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from utils.llm_scheduler import GeminiScheduler, TokenBucket
+
+
+class RateLimitedStub:
+    """In-process stand-in for Gemini that enforces a requests-per-second quota."""
+
+    def __init__(self, quota: float, burst: int, latency: float):
+        self.bucket = TokenBucket(quota, burst)
+        self.latency = latency
+        self.accepted = 0
+        self.rejected = 0
+
+    async def post(self):
+        await asyncio.sleep(self.latency)
+        if not self.bucket.try_take():
+            self.rejected += 1
+            return SimpleNamespace(status_code=429, headers={"Retry-After": "1"})
+        self.accepted += 1
+        return SimpleNamespace(status_code=200, headers={})
+
+
+async def run_fixed_sleep(stub, n):
+    ok = 0
+    for _ in range(n):
+        response = await stub.post()
+        ok += response.status_code == 200
+        await asyncio.sleep(0.5 + random.uniform(0, 0.35))
+    return ok
+
+
+async def run_scheduler(stub, n, scheduler, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await scheduler.acall(stub.post)
+            return response.status_code == 200
+
+    results = await asyncio.gather(*[one() for _ in range(n)])
+    return sum(results)
+
+
+def report(name, n, ok, stub, elapsed, scheduler=None):
+    line = (
+        f"{name:<28} ok={ok:>4}/{n:<4} 429s={stub.rejected:>4} "
+        f"time={elapsed:7.2f}s throughput={ok / elapsed:6.2f} req/s"
+    )
+    if scheduler is not None:
+        line += f" final_rate={scheduler.rate:5.2f} req/s"
+    print(line)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--quota", type=float, default=5.0, help="stub req/s")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency (s)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    n = args.requests
+    print(f"Stub quota: {args.quota} req/s, {n} requests\n")
+
+    if n <= 50:
+        stub = RateLimitedStub(args.quota, burst=int(args.quota), latency=args.latency)
+        start = time.perf_counter()
+        ok = await run_fixed_sleep(stub, n)
+        report("fixed sleep (old)", n, ok, stub, time.perf_counter() - start)
+    else:
+        print("fixed sleep (old)            skipped for >50 requests (~0.68s/request)")
+
+    for label, rpm in [("at quota", args.quota * 60), ("2x over quota", args.quota * 120)]:
+        stub = RateLimitedStub(args.quota, burst=int(args.quota), latency=args.latency)
+        scheduler = GeminiScheduler(
+            requests_per_minute=rpm,
+            burst=2,
+            max_retries=6,
+            backoff_base=0.25,
+            backoff_max=5,
+        )
+        start = time.perf_counter()
+        ok = await run_scheduler(stub, n, scheduler, args.concurrency)
+        report(f"scheduler {label}", n, ok, stub, time.perf_counter() - start, scheduler)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
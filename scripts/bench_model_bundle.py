@@ -0,0 +1,169 @@
+"""
+Compare loading and serving a model version from model.bundle with its
+separate pickle files.
+
+    python scripts/bench_model_bundle.py --model-version v2_h
+    python scripts/bench_model_bundle.py --model-version v1_h --write \\
+        --data-version v4
+
+--write first builds the bundle of a version saved before bundles existed,
+from its model.pkl, category_map.pkl, model_config.json and hex_encoding.npz.
+Reports file sizes, load time (with and without the checksum) and
+single-request latency through predict_lane_price, and checks that both
+loads predict the same on the test year of --data-version.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from src.models.warm_start import raw_features
+from utils.dataset_utils import load_prepared_dataset
+from utils.model_bundle import BUNDLE_FILE, read_bundle, read_model_files, write_bundle
+from utils.model_utils import (
+    apply_category_map,
+    load_config,
+    predict_lane_price,
+    project_root,
+)
+
+LEGACY_FILES = [
+    "model.pkl",
+    "category_map.pkl",
+    "model_config.json",
+    "hex_encoding.npz",
+]
+
+
+def median_seconds(fn, repeats: int) -> float:
+    seconds = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return float(np.median(seconds))
+
+
+def request_latency(bundle, rows) -> np.ndarray:
+    """Seconds per single-row prediction, the way /predict makes it."""
+    features = bundle.config["input_features"]
+    seconds = []
+    predictions = []
+    for row in rows:
+        start = time.perf_counter()
+        kwargs = dict(row)
+        if bundle.hex_encoder is not None:
+            encoded = bundle.hex_encoder.encode(
+                [row["origin_hex"]], [row["destination_hex"]]
+            )
+            kwargs.update({name: float(v[0]) for name, v in encoded.items()})
+        predictions.append(
+            predict_lane_price(bundle.model, bundle.category_map, features, **kwargs)
+        )
+        seconds.append(time.perf_counter() - start)
+    return np.array(seconds), np.array(predictions)
+
+
+def batch_predictions(bundle, raw) -> np.ndarray:
+    X = raw.copy()
+    if bundle.hex_encoder is not None:
+        X = bundle.hex_encoder.transform(X)
+    features = bundle.config["input_features"]
+    return bundle.model.predict(apply_category_map(X[features], bundle.category_map))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-version", required=True, help="folder under models/")
+    parser.add_argument(
+        "--write", action="store_true", help="build the bundle from the pickles"
+    )
+    parser.add_argument("--data-version", help="default: the model's data version")
+    parser.add_argument("--processed-dir", help="default: data/processed/<version>")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    model_dir = project_root / "models" / args.model_version
+    legacy = read_model_files(model_dir)
+    if args.write:
+        config = {
+            **legacy.config,
+            "artifacts": {
+                **legacy.config.get("artifacts", {}),
+                "bundle": str(model_dir / BUNDLE_FILE),
+            },
+        }
+        write_bundle(
+            model_dir / BUNDLE_FILE,
+            legacy.model,
+            legacy.category_map,
+            config,
+            legacy.hex_encoder,
+        )
+    bundle = read_bundle(model_dir / BUNDLE_FILE)
+
+    sizes = {
+        name: (model_dir / name).stat().st_size
+        for name in LEGACY_FILES
+        if (model_dir / name).exists()
+    }
+    load_s = {
+        "files": median_seconds(lambda: read_model_files(model_dir), args.repeats),
+        "bundle": median_seconds(
+            lambda: read_bundle(model_dir / BUNDLE_FILE), args.repeats
+        ),
+        "bundle_unverified": median_seconds(
+            lambda: read_bundle(model_dir / BUNDLE_FILE, verify=False), args.repeats
+        ),
+    }
+
+    training = legacy.config.get("training", {})
+    config = load_config()
+    test_year = training.get("test_year") or config["training"]["test_year"]
+    test = load_prepared_dataset(
+        args.data_version
+        or training.get("data_version")
+        or config["training"]["data_version"],
+        columns=raw_features(legacy.config["input_features"], legacy.hex_encoder),
+        filters=[("year", "==", test_year)],
+        processed_dir=args.processed_dir,
+        compact=False,
+    )
+    batch_diff = np.abs(
+        batch_predictions(legacy, test) - batch_predictions(bundle, test)
+    ).max()
+    sample = np.random.default_rng(0).choice(len(test), args.requests)
+    rows = test.iloc[sample].to_dict("records")
+    legacy_s, legacy_pred = request_latency(legacy, rows)
+    bundle_s, bundle_pred = request_latency(bundle, rows)
+
+    print(
+        f"\nfiles: {sum(sizes.values()) / 1024:,.0f} KB "
+        f"({', '.join(f'{k} {v / 1024:,.0f}' for k, v in sizes.items())}), "
+        f"bundle: {(model_dir / BUNDLE_FILE).stat().st_size / 1024:,.0f} KB"
+    )
+    print(
+        f"load ms: files {load_s['files'] * 1e3:.1f}, bundle "
+        f"{load_s['bundle'] * 1e3:.1f} ({load_s['bundle_unverified'] * 1e3:.1f} "
+        "without the checksum)"
+    )
+    for name, seconds in (("files", legacy_s), ("bundle", bundle_s)):
+        print(
+            f"/predict {name}: p50 {np.median(seconds) * 1e3:.2f} ms, "
+            f"p95 {np.percentile(seconds, 95) * 1e3:.2f} ms"
+        )
+    print(
+        f"max |difference|: batch log-price {batch_diff:.2e}, "
+        f"single-request price {np.abs(legacy_pred - bundle_pred).max():.2f} "
+        f"over {len(test):,} test rows / {len(rows)} requests"
+    )
+
+
+if __name__ == "__main__":
+    main()
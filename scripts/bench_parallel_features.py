@@ -0,0 +1,74 @@
+"""
+Scaling benchmark for the process-pool feature stages.
+
+    python scripts/bench_parallel_features.py --rows 2000000 --workers 1 2 4 8 16 32
+
+Runs the row-local stages (geo, truck, cost, temporal, finalize)
+of the data pipeline with each worker count, checks that every output is
+identical to the serial one and reports speedup and parallel efficiency.
+Worker counts above the machine's cores are still run but oversubscribed.
+"""
+
+import argparse
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import pandas as pd
+
+from scripts.bench_dataset_transformations import synthetic_raw
+from src.data import dataset_transformations as dt
+from utils.parallel_utils import map_row_chunks, resolve_workers, run_stages
+
+FEATURE_STAGES = [
+    partial(dt.add_geo_features, h3_res=dt.H3_RES),
+    dt.add_truck_features,
+    dt.add_cost_features,
+    dt.add_temporal_features,
+    dt.finalize_columns,
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--workers", type=int, nargs="+")
+    parser.add_argument("--chunk-rows", type=int, default=dt.FEATURE_CHUNK_ROWS)
+    parser.add_argument("--lanes", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    cores = resolve_workers(0)
+    counts = args.workers or sorted(
+        {1, *(2**i for i in range(8) if 2**i <= cores), cores}
+    )
+    raw = synthetic_raw(args.rows, lanes=args.lanes, seed=args.seed)
+    fn = partial(run_stages, FEATURE_STAGES)
+    print(
+        f"{args.rows:,} rows, {args.chunk_rows:,}-row chunks, {cores} cores available"
+    )
+    print(
+        f"{'workers':>7} {'seconds':>8} {'rows/s':>11} {'speedup':>8} {'efficiency':>10}"
+    )
+
+    baseline, serial_s = None, None
+    for workers in counts:
+        start = time.perf_counter()
+        out = map_row_chunks(fn, raw.copy(), workers, args.chunk_rows)
+        seconds = time.perf_counter() - start
+        if baseline is None:
+            baseline, serial_s = out, seconds
+        else:
+            pd.testing.assert_frame_equal(baseline, out, check_exact=True)
+        speedup = serial_s / seconds
+        print(
+            f"{workers:>7} {seconds:>8.2f} {args.rows / seconds:>11,.0f} "
+            f"{speedup:>7.2f}x {speedup / workers:>9.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark TruckNameIndex build and thresholded query time on a synthetic index.
+
+    python scripts/bench_truck_index.py --entries 100000 --queries 2000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from utils.truck_index import TruckNameIndex
+
+BODIES = ["open body", "closed body", "container", "reefer", "high cube", "trailer", ""]
+MAKES = ["tata", "eicher", "ashok leyland", "bharat benz", "mahindra", ""]
+AXLES = ["single axle", "multi axle", "MXL", "SXL", ""]
+
+
+def synthetic_name(rng: random.Random) -> str:
+    capacity = rng.choice([1, 2, 3, 5, 7, 8, 9, 10, 12, 16, 18, 19, 20, 21, 25, 28, 32])
+    length = rng.choice([8, 10, 14, 17, 19, 20, 22, 24, 28, 32, 36, 40])
+    parts = [
+        rng.choice(MAKES),
+        f"{capacity}{rng.choice([' MT', 'MT', ' ton', 'T'])}",
+        f"{length}{rng.choice([' ft', 'ft', ' feet'])}",
+        rng.choice(AXLES),
+        rng.choice(BODIES),
+        str(rng.randint(1, 999)) if rng.random() < 0.7 else "",
+    ]
+    rng.shuffle(parts)
+    return " ".join(p for p in parts if p)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = [(synthetic_name(rng), {"cleaned_code": "X"}) for _ in range(args.entries)]
+
+    start = time.perf_counter()
+    index = TruckNameIndex().build(items)
+    print(f"Built index of {len(index)} entries in {time.perf_counter() - start:.2f}s")
+
+    # perturb known names so queries exercise the n-gram path, not exact hits
+    queries = []
+    for _ in range(args.queries):
+        raw = rng.choice(items)[0]
+        queries.append(raw.replace(" ", "  ", 1).lower() + rng.choice([" ", ".", " x"]))
+
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        index.best_match(q, args.threshold)
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    latencies.sort()
+    print(
+        f"{len(queries)} queries: p50={statistics.median(latencies):.3f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:.3f}ms "
+        f"max={latencies[-1]:.3f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
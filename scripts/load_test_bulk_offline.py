@@ -0,0 +1,126 @@
+"""
+Offline load test for /api/bulk_clean_truck and /api/auto_match_headers.
+
+Runs the API in-process against either a local fake Gemini (configurable
+latency, error rate and throttling) or a recorded cassette, so no key or
+network is needed:
+
+    python scripts/load_test_bulk_offline.py --batches 20 --batch-size 50 \
+        --latency 0.3 --error-rate 0.05 --rpm 1200
+    python scripts/load_test_bulk_offline.py --replay data/cassettes/gemini.jsonl
+
+Record a cassette against the real API (or the fake) with
+GEMINI_TRANSPORT=record GEMINI_CASSETTE=<path> and the usual server.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+import httpx
+
+
+def start_fake_gemini(port, latency, jitter, error_rate, rpm):
+    import uvicorn
+    from utils.fake_gemini import create_fake_gemini_app
+
+    app = create_fake_gemini_app(latency, jitter, error_rate, rpm)
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return app
+
+
+def raw_truck_names(batch, size):
+    bodies = ["open body", "closed body", "container", "reefer -18°C", ""]
+    return [
+        f"{(batch * size + i) % 40 + 1} MT {bodies[i % len(bodies)]} {14 + i % 20} ft"
+        for i in range(size)
+    ]
+
+
+async def run(args):
+    from api.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://rpt", timeout=300
+    ) as client:
+        latencies, items, errors = [], 0, 0
+        start = time.perf_counter()
+        for batch in range(args.batches):
+            names = raw_truck_names(batch, args.batch_size)
+            t0 = time.perf_counter()
+            res = await client.post(
+                "/api/bulk_clean_truck", json={"raw_truck_names": names}
+            )
+            latencies.append(time.perf_counter() - t0)
+            results = res.json()
+            items += len(results)
+            errors += sum(1 for r in results if r.get("error"))
+        elapsed = time.perf_counter() - start
+
+        print(
+            f"bulk_clean_truck: {args.batches} batches x {args.batch_size} | "
+            f"p50={statistics.median(latencies):.2f}s max={max(latencies):.2f}s | "
+            f"{items / elapsed:.1f} items/s | errors={errors}"
+        )
+
+        t0 = time.perf_counter()
+        res = await client.post(
+            "/api/auto_match_headers",
+            json={
+                "headers": ["Pickup", "Drop", "Vehicle", "Loading Dt"],
+                "sample_rows": [["Mumbai", "Delhi", "21 MT open", "2025-07-03"]],
+            },
+        )
+        print(
+            f"auto_match_headers: {res.status_code} in "
+            f"{(time.perf_counter() - t0) * 1000:.1f}ms {res.json()}"
+        )
+        print(f"LLM usage: {(await client.get('/api/llm_usage')).json()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batches", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument(
+        "--replay", help="replay this cassette instead of a fake server"
+    )
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=0.0, help="fake server quota")
+    parser.add_argument(
+        "--client-rpm", type=float, default=6000, help="API scheduler quota"
+    )
+    args = parser.parse_args()
+
+    # settings are read at import time, so configure them before importing the API
+    os.environ["GEMINI_RPM"] = str(args.client_rpm)
+    os.environ["GEMINI_BURST"] = str(max(1, int(args.client_rpm / 60)))
+    if args.replay:
+        os.environ["GEMINI_TRANSPORT"] = "replay"
+        os.environ["GEMINI_CASSETTE"] = args.replay
+    else:
+        os.environ["GEMINI_URL"] = f"http://127.0.0.1:{args.port}/generate"
+        start_fake_gemini(
+            args.port, args.latency, args.jitter, args.error_rate, args.rpm
+        )
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Load test: /api/predict latency while LLM-backed routes are slow.
+
+Start a slow fake Gemini, point the API at it, then run the test:
+
+    python -m utils.fake_gemini --port 8001 --latency 10
+    GEMINI_URL=http://localhost:8001/generate make run-api
+    python scripts/load_test_llm_isolation.py --llm-concurrency 100
+
+The test measures predict latency alone, then again while
+`--llm-concurrency` clean_truck / auto_match_headers requests are stuck on
+the slow fake. With async LLM routes the two distributions should match.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+PREDICT_BODY = {
+    "origin": {
+        "location": {"lat": 19.07, "lon": 72.87},
+        "location_name": "Mumbai",
+        "coordinates": [72.87, 19.07],
+    },
+    "destination": {
+        "location": {"lat": 28.61, "lon": 77.20},
+        "location_name": "Delhi",
+        "coordinates": [77.20, 28.61],
+    },
+    "truck": {
+        "truck_type": "10WL_21MT_MA_OB_L20",
+        "no_of_wheels": 10,
+        "capacity_mt": 21,
+        "length_ft": 20,
+        "axle_type": "MA",
+        "body_type": "OB",
+    },
+    "date": "2025-07-03",
+    "fuel_price": 95,
+}
+
+HEADERS_BODY = {
+    "headers": ["Pickup", "Drop", "Vehicle", "When"],
+    "sample_rows": [["Mumbai", "Delhi", "21 MT open", "2025-07-03"]],
+}
+
+
+async def measure_predict(client, base_url, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        res = await client.post(f"{base_url}/api/predict", json=PREDICT_BODY)
+        res.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarize(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<28} n={len(latencies):<4} p50={statistics.median(latencies):8.2f}ms "
+        f"p95={p95:8.2f}ms max={latencies[-1]:8.2f}ms"
+    )
+
+
+async def run(base_url, n_predict, llm_concurrency):
+    limits = httpx.Limits(max_connections=llm_concurrency + 10)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        await measure_predict(client, base_url, 5)  # warm-up
+        summarize("predict (idle)", await measure_predict(client, base_url, n_predict))
+
+        llm_calls = []
+        for i in range(llm_concurrency):
+            if i % 2:
+                req = client.post(f"{base_url}/api/auto_match_headers", json=HEADERS_BODY)
+            else:
+                req = client.post(
+                    f"{base_url}/api/clean_truck", json={"raw_truck_name": f"{i} MT"}
+                )
+            llm_calls.append(asyncio.ensure_future(req))
+        await asyncio.sleep(1)  # let the LLM requests occupy the server
+
+        summarize(
+            f"predict (+{llm_concurrency} slow LLM)",
+            await measure_predict(client, base_url, n_predict),
+        )
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*llm_calls, return_exceptions=True)
+        statuses = {}
+        for r in results:
+            key = type(r).__name__ if isinstance(r, Exception) else r.status_code
+            statuses[key] = statuses.get(key, 0) + 1
+        print(f"LLM requests finished {time.perf_counter() - start:.1f}s later: {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--predict-requests", type=int, default=100)
+    parser.add_argument("--llm-concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.base_url, args.predict_requests, args.llm_concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
 # %%
-import requests
 import json
-import time
+import sys
 import pandas as pd
 import os
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "../../")))
+from utils.circuit_breaker import CircuitOpenError
+from utils.llm_accounting import llm_usage, set_llm_endpoint
+from utils.llm_scheduler import gemini_scheduler
+from utils.llm_utils import build_gemini_payload, post_gemini
+from utils.cleaning_utils import normalize_raw_truck
 
 # %%
 
@@ -139,12 +146,6 @@ length_of_raw = len(raw_truck_inputs)
 print(f"✅ Loaded {length_of_raw} raw truck inputs.")
 
 
-# %%
-# Normalization function
-def normalize_raw_truck(raw):
-    return raw.replace(" ", "").upper()
-
-
 # %%
 # Load cache
 CACHE_FILE = "cleaned_truck_outputs2.json"
@@ -166,11 +167,17 @@ print(f"🔁 Loaded {len(cache_map)} cached entries.")
 
 
 # %%
-# Gemini request function
+# Gemini request function (paced, retried and accounted like the API's calls;
+# while the circuit breaker is open the batch waits instead of failing items)
 def call_gemini_api(prompt):
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
-    headers = {"Content-Type": "application/json"}
-    response = requests.post(GEMINI_URL, headers=headers, data=json.dumps(payload))
+    payload = build_gemini_payload(prompt)
+    while True:
+        try:
+            response = post_gemini(payload, url=GEMINI_URL)
+            break
+        except CircuitOpenError as e:
+            print(f"⏸️  {e}, waiting")
+            time.sleep(e.retry_after)
     if response.status_code == 200:
         candidates = response.json().get("candidates", [])
         if candidates:
@@ -182,9 +189,8 @@ def call_gemini_api(prompt):
 
 
 # %%
-import random
-
 # Run batch cleaning
+set_llm_endpoint("batch_cleaner")
 for idx, raw in enumerate(raw_truck_inputs, start=1):
     norm_key = normalize_raw_truck(raw)
 
@@ -196,10 +202,12 @@ for idx, raw in enumerate(raw_truck_inputs, start=1):
         cache_entry["raw"] = raw
         cache_entry["normalized_key"] = norm_key
         results.append(cache_entry)
+        llm_usage.record_answer("cache")
         continue
 
     full_prompt = BASE_PROMPT + f'\n\nRaw Truck: "{raw}"\n\nOutput:'
     output_text = call_gemini_api(full_prompt)
+    llm_usage.record_answer("llm")
 
     cleaned_output = output_text.strip().strip("```json").strip("```").strip()
 
@@ -225,8 +233,9 @@ for idx, raw in enumerate(raw_truck_inputs, start=1):
     print(f"✅ Done [{idx}/{len(raw_truck_inputs)}]: {raw}")
     print("-" * 60)
 
-    time.sleep(0.5 + random.uniform(0, 0.35))
 
+print(f"📊 Scheduler stats: {gemini_scheduler.stats}, rate={gemini_scheduler.rate:.2f} req/s")
+print(f"📊 LLM usage:\n{llm_usage.format_summary()}")
 
 # %%
 # Save updated JSON cache
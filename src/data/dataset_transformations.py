@@ -1,33 +1,79 @@
-# %%
-# Imports & Configuration
-import sys
+"""
+Build the LightGBM training set from the raw freight history.
+
+    python -m src.data.dataset_transformations
+    python -m src.data.dataset_transformations --input data/raw/history.xlsx \
+        --version v5 --filter min_base_price=200 --plot
+
+Row filters are declared under `data_filters` in src/config/config.yaml.
+Stages (load, geo, truck, cost, temporal, finalize, filter, outlier, save)
+are cached under data/cache/pipeline, keyed by a hash of their input, code
+and parameters, so a re-run only recomputes the stages that changed.
+
+Every stage works on whole columns: lane features are computed once per
+distinct origin/destination pair (see `compute_lane_features_frame`) and
+cost features with numpy, so the output is identical to the old row-wise
+notebook at a fraction of the time (scripts/bench_dataset_transformations.py).
+"""
+
+import argparse
+import json
 import os
-import pandas as pd
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from math import atan2, degrees, radians
-from geopy.distance import geodesic
-import json
+import pandas as pd
 
-# %%
-# Local module imports
-sys.path.append(os.path.abspath(os.path.join(os.getcwd(), "../../")))
-from utils.geo_utils import compute_lane_features_from_row
-from utils.cleaning_utils import iqr_filter
-from utils.cost_utils import compute_estimated_fuel_cost, compute_fuel_price_per_km
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+import utils.cleaning_utils as cleaning_utils
+import utils.cost_utils as cost_utils
+import utils.dataset_utils as dataset_utils
+import utils.filter_engine as filter_engine
+import utils.geo_utils as geo_utils
+from utils.cleaning_utils import factorize_rows, map_distinct
+from utils.cost_utils import (
+    compute_estimated_fuel_cost_vectorized,
+    compute_fuel_price_per_km_vectorized,
+)
+from utils.geo_utils import compute_lane_features_frame
+from src.data import raw_ingestion
+from src.data.raw_ingestion import CHUNK_ROWS, ingest_raw, load_ingested
+from utils.dataset_utils import (
+    PARTITION_COLUMNS,
+    csv_path,
+    dataset_base_name,
+    parquet_path,
+    write_parquet_dataset,
+)
+from utils.filter_engine import (
+    IQR_RULE,
+    ROW_RULE,
+    apply_filters,
+    load_filter_rules,
+    override_rules,
+    rule_kind,
+)
+from utils.parallel_utils import map_row_chunks, resolve_workers, run_stages
+from utils.stage_cache import StageCache, file_digest, stage_key
 
 # Constants
 H3_RES = 6
-RAW_DATA_PATH = "../../data/raw/dataset-hector-apollo-v2.xlsx"
+DATA_VERSION = "v4"
+RAW_DATA_PATH = PROJECT_ROOT / "data/raw/dataset-hector-apollo-v2.xlsx"
+PROCESSED_DIR = PROJECT_ROOT / "data/processed"
+CACHE_DIR = PROJECT_ROOT / "data/cache/pipeline"
+# rows per task when feature stages run in a process pool (--workers)
+FEATURE_CHUNK_ROWS = 250_000
 
-# %%
-# Load Data
-df = pd.read_excel(RAW_DATA_PATH, engine="openpyxl")
+# Row filters applied after feature engineering (config.yaml: data_filters)
+FILTER_RULES = load_filter_rules()
 
-# %%
-# Step 1: Geospatial Features
-features = [
+GEO_FEATURES = [
     "origin_hex",
     "destination_hex",
     "lane_hex",
@@ -35,146 +81,31 @@ features = [
     "bearing_angle",
     "hex_ring_distance",
 ]
-df[features] = df.apply(lambda row: pd.Series(compute_lane_features_from_row(row)), axis=1)
-
-# %%
-# Step 2: Truck Feature Engineering
-df.rename(columns={"capacity_mt": "capacity", "length_ft": "length"}, inplace=True)
-
-df["axle_type"] = (
-    df["axle_type"]
-    .astype(str)
-    .str.strip()
-    .str.upper()
-    .replace({"MULTI AXLE": "MA", "SINGLE AXLE": "SA"})
-)
-df["is_multi_axle"] = df["axle_type"].map({"SA": 0, "MA": 1})
-
-df["body_type"] = (
-    df["body_type"]
-    .astype(str)
-    .str.strip()
-    .str.upper()
-    .replace(
-        {
-            "CONTAINER": "CB",
-            "CLOSED BODY": "CB",
-            "OPEN BODY": "OB",
-            "REEFER": "CB",
-            "HIGH CUBE": "HC",
-            "FLATBED": "FL",
-        }
-    )
-)
 
-# %%
-df.describe()
-# %%
-# Step 3: Cost Feature Engineering
-df.rename(
-    columns={
-        "Fuel Price - Diesel (INR Rs per liter)": "fuel_price",
-        "G-Distance (km)": "g_distance",
-    },
-    inplace=True,
-)
-
-df["fuel_price_per_km_g"] = df.apply(
-    lambda row: compute_fuel_price_per_km(row["fuel_price"], row["g_distance"]), axis=1
-)
-df["fuel_price_per_km_h"] = df.apply(
-    lambda row: compute_fuel_price_per_km(row["fuel_price"], row["haversine_distance"]),
-    axis=1,
-)
-df["estimated_fuel_cost_g"] = df.apply(
-    lambda row: compute_estimated_fuel_cost(
-        row["fuel_price"], row["g_distance"], row["capacity"]
-    ),
-    axis=1,
-)
-df["estimated_fuel_cost_h"] = (
-    df["fuel_price"] * df["haversine_distance"] * df["capacity"]
-)
-df["fuel_cost_per_tkm_g"] = df["fuel_price_per_km_g"] / df["capacity"]
-df["fuel_cost_per_tkm_h"] = df["fuel_price_per_km_h"] / df["capacity"]
-
-# %%
-# Step 4: Temporal Features
-df["Date"] = pd.to_datetime(df["Date"])
-df["day"] = df["Date"].dt.day
-df["month"] = df["Date"].dt.month
-df["year"] = df["Date"].dt.year
-
-# %%
-# Step 5: Target Variable
-df.rename(columns={"Base Charge": "base_price"}, inplace=True)
-df["log_base_price"] = np.log1p(df["base_price"])
-
-# %%
-# Step 6: Cleanup
-columns_to_drop = [
-    "Cleaned Origin Name",
-    "Cleaned Origin District",
-    "Cleaned Origin State",
-    "Cleaned Destination Name",
-    "Cleaned Destination District",
-    "Destination State",
-    "Mapped Truck Type",
-    "Date",
-    "Month",
-    "Day",
-    "Year",
-    "Mapped OrginName",
-    "Mapped DestinationName",
-    "Cleaned Truck Type",
-    "Company",
-    "H-Distance (km)",
-]
-
-df["lane_identifier"] = (
-    df["Cleaned Origin Name"].str.strip()
-    + " - "
-    + df["Cleaned Origin District"].str.strip()
-    + ", "
-    + df["Cleaned Origin State"].str.strip()
-    + " → "
-    + df["Cleaned Destination Name"].str.strip()
-    + " - "
-    + df["Cleaned Destination District"].str.strip()
-    + ", "
-    + df["Destination State"].str.strip()
-    + " | "
-    + df["capacity"].astype(str)
-    + "MT_"
-    + df["axle_type"]
-    + "_"
-    + df["body_type"]
-)
+AXLE_TYPES = {"MULTI AXLE": "MA", "SINGLE AXLE": "SA"}
+BODY_TYPES = {
+    "CONTAINER": "CB",
+    "CLOSED BODY": "CB",
+    "OPEN BODY": "OB",
+    "REEFER": "CB",
+    "HIGH CUBE": "HC",
+    "FLATBED": "FL",
+}
 
-df.drop(columns=[col for col in columns_to_drop if col in df.columns], inplace=True)
-
-df = df[df["g_distance"] > 0]
-df.dropna(subset=["g_distance", "fuel_price", "base_price"], inplace=True)
-
-# %%
-# Step 7: Rename and Reorder Columns
-df.rename(
-    columns={
-        "Origin Latitude": "origin_lat",
-        "Origin Longitude": "origin_lng",
-        "Destination Latitude": "destination_lat",
-        "Destination Longitude": "destination_lng",
-        "capacity": "capacity_mt",
-        "length": "length_ft",
-        "fuel_price": "fuel_price_inr_per_litre",
-        "g_distance": "g_distance_km",
-        "haversine_distance": "h_distance_km",
-        "bearing_angle": "bearing_angle_deg",
-    },
-    inplace=True,
-)
+FINAL_RENAMES = {
+    "Origin Latitude": "origin_lat",
+    "Origin Longitude": "origin_lng",
+    "Destination Latitude": "destination_lat",
+    "Destination Longitude": "destination_lng",
+    "capacity": "capacity_mt",
+    "length": "length_ft",
+    "fuel_price": "fuel_price_inr_per_litre",
+    "g_distance": "g_distance_km",
+    "haversine_distance": "h_distance_km",
+    "bearing_angle": "bearing_angle_deg",
+}
 
-final_columns = [
+FINAL_COLUMNS = [
     "lane_identifier",
     "origin_lat",
     "origin_lng",
@@ -206,11 +137,8 @@ final_columns = [
     "base_price",
     "log_base_price",
 ]
-df = df[final_columns]
 
-# %%
-# Step 8: Final Cleaning
-numeric_cols = [
+NUMERIC_COLUMNS = [
     "origin_lat",
     "origin_lng",
     "destination_lat",
@@ -234,94 +162,532 @@ numeric_cols = [
     "is_multi_axle",
 ]
 
-df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors="coerce")
 
-# %%
-# Filter suspicious data
-df = df[
-    (df["origin_hex"] != df["destination_hex"])
-    & (df["base_price"] >= 100)
-    & (df["g_distance_km"] > 1)
-    & (df["h_distance_km"] > 1)
-    & (df["bearing_angle_deg"] > 0)
-]
+def load_raw(
+    path=RAW_DATA_PATH, chunk_rows: int = CHUNK_ROWS, source_digest: str = None
+) -> pd.DataFrame:
+    """
+    Step 0: the raw columns the pipeline uses, streamed through
+    src/data/raw_ingestion.py so reading never holds more than `chunk_rows`
+    raw rows at once.
+    """
+    return load_ingested(
+        ingest_raw(path, chunk_rows=chunk_rows, source_digest=source_digest)
+    )
 
-# %%
-# Apply additional filters
-df = df[
-    ~((df["bearing_angle_deg"] <= 1) & (df["h_distance_km"] < 10))
-    & ~(df["g_distance_km"] < df["h_distance_km"])
-]
 
-# %%
-# Remove outliers
-df = iqr_filter(df, "base_price")
-df["log_base_price"] = np.log1p(df["base_price"])
-
-# %%
-# Step 9: Visualizations
-plt.figure(figsize=(8, 5))
-sns.histplot(df["log_base_price"], bins=50, kde=True)
-plt.title("Log Base Price Distribution (Filtered)")
-plt.xlabel("Log(Base Price + 1) ₹")
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-plt.figure(figsize=(8, 5))
-sns.scatterplot(x="g_distance_km", y="base_price", data=df)
-plt.title("Base Price vs Google Distance")
-plt.xlabel("Google Distance (km)")
-plt.ylabel("Base Price (₹)")
-plt.grid(True)
-plt.tight_layout()
-plt.show()
-
-# %%
-# Step 10: Save
-
-# Create output dirs
-DATA_VERSION = "v4"
-BASE_NAME = f"rpt_prepared_lightgbm_{DATA_VERSION}"
-OUTPUT_DIR = f"../../data/processed/{DATA_VERSION}"
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-
-OUTPUT_PATH = f"{OUTPUT_DIR}/{BASE_NAME}.csv"
-METADATA_PATH = f"{OUTPUT_DIR}/{BASE_NAME}_metadata.json"
-
-
-meta = {
-    "dataset_name": "rpt_prepared_lightgbm_4.csv",
-    "version": "v4",
-    "rows": len(df),
-    "columns": list(df.columns),
-    "filters": [
-        "Removed g_distance < h_distance",
-        "Filtered bearing_angle <= 1 with h_distance < 10",
-        "IQR filter on base_price",
-    ],
-    "features": {
-        "fuel": [
-            "fuel_price_per_km_g",
-            "fuel_price_per_km_h",
-            "estimated_fuel_cost_g",
-            "estimated_fuel_cost_h",
-        ],
-        "target": ["base_price", "log_base_price"],
-    },
-}
+# Stages below modify `df` in place where they can and return it.
 
-df.to_csv(OUTPUT_PATH, index=False)
-with open(METADATA_PATH, "w") as f:
-    json.dump(meta, f, indent=4)
 
-print("Saved dataset:", OUTPUT_PATH)
-print("Saved metadata:", METADATA_PATH)
+def add_geo_features(df: pd.DataFrame, h3_res: int = H3_RES) -> pd.DataFrame:
+    """Step 1: H3 cells, geodesic distance, bearing and hex ring distance."""
+    lanes = compute_lane_features_frame(
+        df["Origin Latitude"],
+        df["Origin Longitude"],
+        df["Destination Latitude"],
+        df["Destination Longitude"],
+        h3_res,
+    )
+    for name, column in zip(GEO_FEATURES, lanes.columns):
+        df[name] = lanes[column].to_numpy()
+    return df
+
+
+def add_truck_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Step 2: normalise axle and body type codes."""
+    df.rename(columns={"capacity_mt": "capacity", "length_ft": "length"}, inplace=True)
+
+    df["axle_type"] = map_distinct(
+        df["axle_type"],
+        lambda s: s.astype(str).str.strip().str.upper().replace(AXLE_TYPES),
+    )
+    df["is_multi_axle"] = df["axle_type"].map({"SA": 0, "MA": 1})
+
+    df["body_type"] = map_distinct(
+        df["body_type"],
+        lambda s: s.astype(str).str.strip().str.upper().replace(BODY_TYPES),
+    )
+    return df
+
+
+def add_cost_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Step 3: fuel price per km and estimated fuel cost, Google and haversine."""
+    df.rename(
+        columns={
+            "Fuel Price - Diesel (INR Rs per liter)": "fuel_price",
+            "G-Distance (km)": "g_distance",
+        },
+        inplace=True,
+    )
+
+    df["fuel_price_per_km_g"] = compute_fuel_price_per_km_vectorized(
+        df["fuel_price"], df["g_distance"]
+    )
+    df["fuel_price_per_km_h"] = compute_fuel_price_per_km_vectorized(
+        df["fuel_price"], df["haversine_distance"]
+    )
+    df["estimated_fuel_cost_g"] = compute_estimated_fuel_cost_vectorized(
+        df["fuel_price"], df["g_distance"], df["capacity"]
+    )
+    df["estimated_fuel_cost_h"] = (
+        df["fuel_price"] * df["haversine_distance"] * df["capacity"]
+    )
+    df["fuel_cost_per_tkm_g"] = df["fuel_price_per_km_g"] / df["capacity"]
+    df["fuel_cost_per_tkm_h"] = df["fuel_price_per_km_h"] / df["capacity"]
+    return df
+
+
+def add_temporal_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Step 4: day, month and year of the shipment date."""
+    df["Date"] = pd.to_datetime(df["Date"])
+    df["day"] = df["Date"].dt.day
+    df["month"] = df["Date"].dt.month
+    df["year"] = df["Date"].dt.year
+    return df
+
+
+def _distinct_labels(df: pd.DataFrame, columns, build):
+    """
+    (per-row codes, labels) where `build` turns the distinct combinations
+    of `columns` into label strings; codes index into labels.
+    """
+    codes, first = factorize_rows(df[columns])
+    return codes, build(df[columns].iloc[first]).to_numpy()
+
+
+def _place_label(parts: pd.DataFrame) -> pd.Series:
+    name, district, state = (parts[c].str.strip() for c in parts.columns)
+    return name + " - " + district + ", " + state
+
+
+def _truck_label(parts: pd.DataFrame) -> pd.Series:
+    return (
+        parts["capacity"].astype(str)
+        + "MT_"
+        + parts["axle_type"]
+        + "_"
+        + parts["body_type"]
+    )
+
+
+def lane_identifiers(df: pd.DataFrame) -> np.ndarray:
+    """
+    "Origin - District, State → Destination - District, State | 21.0MT_MA_OB"
+    per row. Origin, destination and truck labels are built from their few
+    distinct values, then joined once per distinct combination.
+    """
+    origin, origin_labels = _distinct_labels(
+        df,
+        ["Cleaned Origin Name", "Cleaned Origin District", "Cleaned Origin State"],
+        _place_label,
+    )
+    destination, destination_labels = _distinct_labels(
+        df,
+        [
+            "Cleaned Destination Name",
+            "Cleaned Destination District",
+            "Destination State",
+        ],
+        _place_label,
+    )
+    truck, truck_labels = _distinct_labels(
+        df, ["capacity", "axle_type", "body_type"], _truck_label
+    )
+
+    n_destination, n_truck = len(destination_labels), len(truck_labels)
+    combined = (origin * n_destination + destination) * n_truck + truck
+    codes, distinct = pd.factorize(combined)
+    labels = (
+        pd.Series(origin_labels[distinct // (n_destination * n_truck)], dtype=object)
+        + " → "
+        + pd.Series(
+            destination_labels[distinct // n_truck % n_destination], dtype=object
+        )
+        + " | "
+        + pd.Series(truck_labels[distinct % n_truck], dtype=object)
+    )
+    return labels.to_numpy()[codes]
+
+
+def finalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Steps 5-8: log target and lane identifier, then rename and reorder the
+    final columns and coerce them to numbers. Rows are dropped later, by
+    `filter_rows`.
+    """
+    df.rename(columns={"Base Charge": "base_price"}, inplace=True)
+    df["log_base_price"] = np.log1p(df["base_price"])
+
+    df["lane_identifier"] = lane_identifiers(df)
+
+    # one column selection instead of drop copies; the raw columns that used
+    # to be dropped aren't in FINAL_COLUMNS anyway
+    source_names = {new: old for old, new in FINAL_RENAMES.items()}
+    df = df[[source_names.get(col, col) for col in FINAL_COLUMNS]]
+    df.columns = FINAL_COLUMNS
+
+    for col in NUMERIC_COLUMNS:
+        if not pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df
+
+
+def filter_rows(df: pd.DataFrame, rules=FILTER_RULES) -> pd.DataFrame:
+    """
+    Drop suspicious rows (missing values, same-hex lanes, tiny prices or
+    distances, Google distances shorter than the geodesic) with one mask
+    over every row rule; counts go to `attrs["filter_counts"]`.
+    """
+    return apply_filters(df, rules, kinds=(ROW_RULE,))
+
+
+def remove_outliers(df: pd.DataFrame, rules=FILTER_RULES) -> pd.DataFrame:
+    """IQR filter on base_price: the iqr_upper rules, over filtered rows."""
+    return apply_filters(df, rules, kinds=(IQR_RULE,))
+
+
+def build_dataset(
+    raw: pd.DataFrame,
+    h3_res: int = H3_RES,
+    rules=FILTER_RULES,
+    workers: int = 1,
+    chunk_rows: int = FEATURE_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """
+    Run every feature and filter stage on a raw frame (modified in place
+    when serial). The row-local stages run on `chunk_rows`-row chunks in
+    `workers` processes (0 = every core) with the same result.
+    """
+    stages = [
+        partial(add_geo_features, h3_res=h3_res),
+        add_truck_features,
+        add_cost_features,
+        add_temporal_features,
+        finalize_columns,
+    ]
+    df = map_row_chunks(partial(run_stages, stages), raw, workers, chunk_rows)
+    return remove_outliers(filter_rows(df, rules), rules)
+
+
+def dataset_paths(version: str = DATA_VERSION, output_dir=None, fmt: str = "parquet"):
+    """(dataset path, metadata path) of a prepared dataset version."""
+    output_dir = Path(output_dir or PROCESSED_DIR / version)
+    path = (parquet_path if fmt == "parquet" else csv_path)(version, output_dir)
+    return path, output_dir / f"{dataset_base_name(version)}_metadata.json"
+
+
+def save_dataset(
+    df: pd.DataFrame,
+    version: str = DATA_VERSION,
+    output_dir=None,
+    pipeline_key: str = None,
+    fmt: str = "parquet",
+    rules=FILTER_RULES,
+):
+    """
+    Step 10: write the dataset and its metadata next to each other. Parquet
+    (partitioned by year and month, see utils/dataset_utils.py) is the
+    default; "csv" writes the old single-file format. The metadata lists
+    the filter rules and the rows each removed (from `filter_rows` and
+    `remove_outliers`).
+    """
+    output_path, metadata_path = dataset_paths(version, output_dir, fmt)
+    os.makedirs(output_path.parent, exist_ok=True)
+
+    meta = {
+        "dataset_name": output_path.name,
+        "format": fmt,
+        "partition_columns": PARTITION_COLUMNS if fmt == "parquet" else [],
+        "version": version,
+        "rows": len(df),
+        "columns": list(df.columns),
+        "filters": {
+            "rules": rules,
+            "rows_removed": df.attrs.get("filter_counts", {}),
+        },
+        "features": {
+            "fuel": [
+                "fuel_price_per_km_g",
+                "fuel_price_per_km_h",
+                "estimated_fuel_cost_g",
+                "estimated_fuel_cost_h",
+            ],
+            "target": ["base_price", "log_base_price"],
+        },
+        # identifies the inputs, code and parameters this file was built from
+        "pipeline_key": pipeline_key,
+    }
+
+    if fmt == "parquet":
+        write_parquet_dataset(df, output_path)
+    else:
+        df.to_csv(output_path, index=False)
+    with open(metadata_path, "w") as f:
+        json.dump(meta, f, indent=4)
+
+    print("Saved dataset:", output_path)
+    print("Saved metadata:", metadata_path)
+    return output_path
+
+
+def _saved_pipeline_key(version: str, output_dir=None, fmt: str = "parquet"):
+    output_path, metadata_path = dataset_paths(version, output_dir, fmt)
+    if not (output_path.exists() and metadata_path.exists()):
+        return None
+    with open(metadata_path, "r") as f:
+        return json.load(f).get("pipeline_key")
+
+
+def pipeline_stages(
+    input_path,
+    h3_res: int,
+    rules,
+    chunk_rows: int = CHUNK_ROWS,
+    input_digest: str = None,
+):
+    """
+    (name, run, code, params, row_local) for every cached stage, in order.
+    `code` lists the functions and modules whose source invalidates the
+    stage; module level settings a stage reads go in `params`. Row-local
+    stages (each output row depends only on its input row) can run on
+    chunks in parallel; `run` is then picklable.
+    """
+    row_rules = [rule for rule in rules if rule_kind(rule) == ROW_RULE]
+    iqr_rules = [rule for rule in rules if rule_kind(rule) == IQR_RULE]
+    return [
+        (
+            "load",
+            lambda _: load_raw(input_path, chunk_rows, input_digest),
+            [load_raw, raw_ingestion],
+            {"suffix": Path(input_path).suffix},
+            False,
+        ),
+        (
+            "geo",
+            partial(add_geo_features, h3_res=h3_res),
+            [add_geo_features, geo_utils, cleaning_utils],
+            {"h3_res": h3_res},
+            True,
+        ),
+        (
+            "truck",
+            add_truck_features,
+            [add_truck_features, cleaning_utils],
+            {"axle_types": AXLE_TYPES, "body_types": BODY_TYPES},
+            True,
+        ),
+        (
+            "cost",
+            add_cost_features,
+            [add_cost_features, cost_utils, cleaning_utils],
+            {},
+            True,
+        ),
+        ("temporal", add_temporal_features, [add_temporal_features], {}, True),
+        (
+            "finalize",
+            finalize_columns,
+            [
+                finalize_columns,
+                lane_identifiers,
+                _distinct_labels,
+                _place_label,
+                _truck_label,
+                cleaning_utils,
+            ],
+            {
+                "renames": FINAL_RENAMES,
+                "columns": FINAL_COLUMNS,
+                "numeric": NUMERIC_COLUMNS,
+            },
+            True,
+        ),
+        (
+            "filter",
+            partial(filter_rows, rules=row_rules),
+            [filter_rows, filter_engine],
+            {"rules": row_rules},
+            False,
+        ),
+        (
+            "outlier",
+            partial(remove_outliers, rules=iqr_rules),
+            [remove_outliers, filter_engine],
+            {"rules": iqr_rules},
+            False,
+        ),
+    ]
+
+
+def run_pipeline(
+    input_path=RAW_DATA_PATH,
+    version: str = DATA_VERSION,
+    output_dir=None,
+    h3_res: int = H3_RES,
+    rules=FILTER_RULES,
+    cache_dir=CACHE_DIR,
+    use_cache: bool = True,
+    need_result: bool = False,
+    fmt: str = "parquet",
+    chunk_rows: int = CHUNK_ROWS,
+    workers: int = 1,
+    feature_chunk_rows: int = FEATURE_CHUNK_ROWS,
+):
+    """
+    Run the stages, resuming from the latest one whose cached output is
+    still valid, and save the dataset unless it is already up to date.
+
+    With `workers` other than 1 (0 = every core), consecutive row-local
+    stages are fused into one pass over `feature_chunk_rows`-row chunks in
+    a process pool; the output is identical to a serial run, but only the
+    last stage of the pass is cached.
+
+    Returns:
+        (dataset or None, report) where report lists (stage, status,
+        seconds) and status is "computed", "fused" (computed within the
+        next stage's parallel pass), "cached" (loaded from cache) or
+        "skipped" (not needed).
+    """
+    cache = StageCache(cache_dir)
+    input_digest = file_digest(input_path)
+    stages = pipeline_stages(input_path, h3_res, rules, chunk_rows, input_digest)
+
+    keys, key = [], input_digest
+    for _, _, code, params, _ in stages:
+        key = stage_key(key, code, params)
+        keys.append(key)
+    save_key = stage_key(
+        key, [save_dataset, dataset_utils], {"version": version, "format": fmt}
+    )
+    saved = use_cache and _saved_pipeline_key(version, output_dir, fmt) == save_key
+
+    # index of the first stage to run; the one before it is read from cache
+    start = 0
+    if use_cache:
+        for i in reversed(range(len(stages))):
+            if cache.has(stages[i][0], keys[i]):
+                start = i + 1
+                break
+
+    report, df = [], None
+    if saved and not need_result:
+        report = [(name, "skipped", 0.0) for name, *_ in stages]
+        return None, report + [("save", "skipped", 0.0)]
+
+    parallel = resolve_workers(workers) > 1
+    i = 0
+    while i < len(stages):
+        name, run, _, _, row_local = stages[i]
+        t0 = time.perf_counter()
+        if i < start - 1:
+            report.append((name, "skipped", 0.0))
+            i += 1
+            continue
+        if i == start - 1:
+            df = cache.load(name, keys[i])
+            report.append((name, "cached", time.perf_counter() - t0))
+            i += 1
+            continue
+
+        last = i
+        if parallel and row_local:
+            while last + 1 < len(stages) and stages[last + 1][4]:
+                last += 1
+            runs = [stage[1] for stage in stages[i : last + 1]]
+            df = map_row_chunks(
+                partial(run_stages, runs), df, workers, feature_chunk_rows
+            )
+        else:
+            df = run(df)
+        if use_cache:
+            cache.store(stages[last][0], keys[last], df)
+        report.extend((stage[0], "fused", 0.0) for stage in stages[i:last])
+        report.append((stages[last][0], "computed", time.perf_counter() - t0))
+        i = last + 1
+
+    t0 = time.perf_counter()
+    if saved:
+        report.append(("save", "skipped", 0.0))
+    else:
+        save_dataset(
+            df, version, output_dir, pipeline_key=save_key, fmt=fmt, rules=rules
+        )
+        report.append(("save", "computed", time.perf_counter() - t0))
+    return df, report
+
+
+def print_report(report):
+    for name, status, seconds in report:
+        timing = f"{seconds:.2f}s" if status not in ("skipped", "fused") else ""
+        print(f"  {name:<9} {status:<9} {timing}")
+
+
+def plot_distributions(df: pd.DataFrame):
+    """Step 9: target distribution and price vs distance."""
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    plt.figure(figsize=(8, 5))
+    sns.histplot(df["log_base_price"], bins=50, kde=True)
+    plt.title("Log Base Price Distribution (Filtered)")
+    plt.xlabel("Log(Base Price + 1) ₹")
+    plt.grid(True)
+    plt.tight_layout()
+    plt.show()
+
+    plt.figure(figsize=(8, 5))
+    sns.scatterplot(x="g_distance_km", y="base_price", data=df)
+    plt.title("Base Price vs Google Distance")
+    plt.xlabel("Google Distance (km)")
+    plt.ylabel("Base Price (₹)")
+    plt.grid(True)
+    plt.tight_layout()
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=str(RAW_DATA_PATH), help="raw .xlsx or .csv")
+    parser.add_argument("--version", default=DATA_VERSION)
+    parser.add_argument("--output-dir", help="default: data/processed/<version>")
+    parser.add_argument("--h3-res", type=int, default=H3_RES)
+    parser.add_argument(
+        "--filter", action="append", metavar="NAME=VALUE", help="override a filter"
+    )
+    parser.add_argument("--cache-dir", default=str(CACHE_DIR))
+    parser.add_argument("--no-cache", action="store_true", help="recompute everything")
+    parser.add_argument("--format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument(
+        "--workers", type=int, default=1, help="processes for feature stages, 0 = all"
+    )
+    parser.add_argument("--feature-chunk-rows", type=int, default=FEATURE_CHUNK_ROWS)
+    parser.add_argument(
+        "--chunk-rows", type=int, default=CHUNK_ROWS, help="raw rows read at a time"
+    )
+    parser.add_argument("--plot", action="store_true", help="show diagnostic plots")
+    args = parser.parse_args()
+
+    df, report = run_pipeline(
+        args.input,
+        version=args.version,
+        output_dir=args.output_dir,
+        h3_res=args.h3_res,
+        rules=override_rules(FILTER_RULES, args.filter),
+        cache_dir=args.cache_dir,
+        use_cache=not args.no_cache,
+        need_result=args.plot,
+        fmt=args.format,
+        chunk_rows=args.chunk_rows,
+        workers=args.workers,
+        feature_chunk_rows=args.feature_chunk_rows,
+    )
+    print_report(report)
+    if df is not None:
+        print(f"{len(df)} rows after filtering")
 
+    if args.plot:
+        plot_distributions(df)
 
-# %%
-data_path = "../../data/processed/v4/rpt_prepared_lightgbm_v4.csv"
-df = pd.read_csv(data_path)
 
-df.describe()
+if __name__ == "__main__":
+    main()
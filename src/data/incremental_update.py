@@ -0,0 +1,364 @@
+"""
+Update a prepared dataset in place with new or changed months of raw data.
+
+    python -m src.data.incremental_update --input data/raw/history.xlsx
+    python -m src.data.incremental_update --input data/raw/2025-09.csv --version v4
+
+Source rows are grouped by shipment month and each month is fingerprinted.
+Only months that are new or whose rows changed go through the feature and
+filter stages; a month that appears in the inputs replaces the stored one,
+months absent from the inputs are kept as they are.
+
+Each processed month keeps its filtered rows (before the outlier filter),
+their per-rule filter counts and the value counts of the outlier rule's
+column (base_price) under <dataset>_incremental/. The IQR limit of the
+outlier filter is recomputed from those value counts alone, so it is
+exactly what a full rebuild would get without rereading any rows. Published
+partitions are rewritten for processed months and, if the limit moved, for
+months holding a price between the old and the new limit. Rows without a
+shipment date are not part of any month and are skipped.
+
+A dataset published without this bookkeeping (by run_pipeline, or with other
+code or filter settings) has no month counts to compute the limit from, so
+the update refuses it; --rebuild replaces it with the months of the inputs,
+which must then be the full raw history.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+import utils.cleaning_utils as cleaning_utils
+import utils.cost_utils as cost_utils
+import utils.geo_utils as geo_utils
+from src.data import dataset_transformations as dt
+from src.data import raw_ingestion
+from src.data.raw_ingestion import CHUNK_ROWS, RAW_COLUMNS
+from utils.filter_engine import IQR_RULE, override_rules, rule_kind
+from utils.dataset_utils import (
+    PARTITION_COLUMNS,
+    dataset_base_name,
+    parquet_path,
+    write_parquet_partition,
+)
+from utils.stage_cache import stage_key
+
+
+def month_of(raw: pd.DataFrame) -> pd.Series:
+    """Shipment month ("YYYY-MM") of each raw row."""
+    return pd.to_datetime(raw["Date"]).dt.strftime("%Y-%m")
+
+
+def month_digests(raw: pd.DataFrame, months: pd.Series) -> dict:
+    """
+    {month: fingerprint of its rows}. Row hashes are sorted first, so the
+    same rows in a different order give the same fingerprint.
+    """
+    row_hashes = pd.util.hash_pandas_object(raw[RAW_COLUMNS], index=False)
+    digests = {}
+    for month, hashes in row_hashes.groupby(months.to_numpy()):
+        digests[month] = hashlib.sha256(
+            np.sort(hashes.to_numpy()).tobytes()
+        ).hexdigest()
+    return digests
+
+
+def filtered_rows(raw: pd.DataFrame, h3_res: int, rules) -> pd.DataFrame:
+    """
+    Every stage up to, not including, the outlier filter; per-rule counts
+    are in `attrs["filter_counts"]`.
+    """
+    df = dt.add_geo_features(raw, h3_res)
+    df = dt.add_truck_features(df)
+    df = dt.add_cost_features(df)
+    df = dt.add_temporal_features(df)
+    df = dt.finalize_columns(df)
+    return dt.filter_rows(df, rules)
+
+
+def outlier_rule(rules) -> dict:
+    """The single iqr_upper rule, the only kind updated from value counts."""
+    found = [rule for rule in rules if rule_kind(rule) == IQR_RULE]
+    if len(found) != 1 or found[0]["column"] != "base_price":
+        raise ValueError(
+            "Incremental updates need exactly one iqr_upper rule on base_price"
+        )
+    return found[0]
+
+
+def quantile_from_counts(values: np.ndarray, counts: np.ndarray, q: float) -> float:
+    """
+    `Series.quantile(q)` (linear interpolation) of the series that has
+    `counts[i]` copies of sorted `values[i]`, bit for bit.
+    """
+    ends = np.cumsum(counts)
+    position = (ends[-1] - 1) * q
+    below = int(np.floor(position))
+    above = min(below + 1, ends[-1] - 1)
+    pair = values[np.searchsorted(ends, [below, above], side="right")]
+    # numpy's own interpolation between the two neighbours
+    return float(np.quantile(pair, position - below))
+
+
+def iqr_upper_limit(price_counts: pd.Series, k: float) -> float:
+    """Upper limit `iqr_filter` would use, from merged base_price counts."""
+    price_counts = price_counts.sort_index()
+    values, counts = price_counts.index.to_numpy(), price_counts.to_numpy()
+    q1 = quantile_from_counts(values, counts, 0.25)
+    q3 = quantile_from_counts(values, counts, 0.75)
+    return q3 + k * (q3 - q1)
+
+
+class IncrementalState:
+    """
+    Per-month bookkeeping next to the published dataset:
+
+        <dataset>_incremental/state.json            fingerprints, limit, config
+        <dataset>_incremental/<YYYY-MM>/rows.parquet   rows before the outlier filter
+        <dataset>_incremental/<YYYY-MM>/prices.parquet base_price value counts
+    """
+
+    def __init__(self, dataset_path: Path):
+        self.root = dataset_path.with_name(dataset_path.stem + "_incremental")
+        self.path = self.root / "state.json"
+        self.data = {"config_key": None, "upper_limit": None, "months": {}}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.data = json.load(f)
+
+    @property
+    def months(self) -> dict:
+        return self.data["months"]
+
+    def rows(self, month: str) -> pd.DataFrame:
+        return pq.read_table(self.root / month / "rows.parquet").to_pandas()
+
+    def prices(self, month: str) -> pd.Series:
+        frame = pq.read_table(self.root / month / "prices.parquet").to_pandas()
+        return frame.set_index("base_price")["count"]
+
+    def store(self, month: str, digest: str, source_rows: int, rows: pd.DataFrame):
+        filter_counts = rows.attrs.get("filter_counts", {})
+        os.makedirs(self.root / month, exist_ok=True)
+        rows.to_parquet(self.root / month / "rows.parquet", index=False)
+        prices = rows["base_price"].value_counts().rename("count").reset_index()
+        prices.to_parquet(self.root / month / "prices.parquet", index=False)
+        self.months[month] = {
+            "digest": digest,
+            "source_rows": source_rows,
+            "rows": len(rows),
+            "filter_counts": filter_counts,
+        }
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=4)
+        os.replace(tmp, self.path)
+
+
+def config_key(h3_res: int, rules) -> str:
+    """Changes whenever stored months can no longer be reused as they are."""
+    return stage_key(
+        "incremental",
+        [
+            dt,
+            raw_ingestion,
+            geo_utils,
+            cost_utils,
+            cleaning_utils,
+            filtered_rows,
+            quantile_from_counts,
+            iqr_upper_limit,
+        ],
+        {"h3_res": h3_res, "rules": rules},
+    )
+
+
+def update_dataset(
+    inputs,
+    version: str = dt.DATA_VERSION,
+    output_dir=None,
+    h3_res: int = dt.H3_RES,
+    rules=dt.FILTER_RULES,
+    chunk_rows: int = CHUNK_ROWS,
+    rebuild: bool = False,
+):
+    """
+    Bring the partitioned dataset of `version` up to date with `inputs`
+    (raw .xlsx/.csv files). With `rebuild`, a published dataset the stored
+    months do not describe is replaced by the inputs' months.
+
+    Returns:
+        report dict: months processed, republished and unchanged, the IQR
+        limit before and after, and timings.
+
+    Raises:
+        ValueError: the dataset exists but has no usable incremental state,
+            and `rebuild` is not set
+    """
+    start = time.perf_counter()
+    dataset = parquet_path(version, output_dir)
+    state = IncrementalState(dataset)
+    outlier = outlier_rule(rules)
+    key = config_key(h3_res, rules)
+    if state.data["config_key"] != key:
+        # code or parameters changed: nothing stored can be reused
+        state.data = {"config_key": key, "upper_limit": None, "months": {}}
+    # the published months' prices are unknown, so the limit would come from
+    # the inputs alone and months missing from them would stay as published
+    replace = not state.months and dataset.exists()
+    if replace and not rebuild:
+        raise ValueError(
+            f"{dataset} has no incremental state for these settings; rerun with "
+            "--rebuild and the full raw history"
+        )
+
+    raw = pd.concat(
+        [dt.load_raw(path, chunk_rows) for path in inputs], ignore_index=True
+    )
+    months = month_of(raw)
+    digests = month_digests(raw, months)
+    changed = sorted(
+        month
+        for month, digest in digests.items()
+        if state.months.get(month, {}).get("digest") != digest
+    )
+
+    t0 = time.perf_counter()
+    row_months = months.to_numpy()
+    for month in changed:
+        rows = raw[row_months == month].reset_index(drop=True)
+        state.store(
+            month, digests[month], len(rows), filtered_rows(rows, h3_res, rules)
+        )
+    process_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    month_prices = {month: state.prices(month) for month in state.months}
+    prices = pd.concat(month_prices.values()).groupby(level=0).sum()
+    upper = iqr_upper_limit(prices, outlier["value"])
+    previous = state.data["upper_limit"]
+    # besides processed months, only months with a price between the old and
+    # the new limit publish different rows
+    republish = sorted(
+        month
+        for month, counts in month_prices.items()
+        if month in changed
+        or previous is None
+        or _crosses(counts.index, previous, upper)
+    )
+    if replace:
+        shutil.rmtree(dataset)
+    published_rows = 0
+    for month in republish:
+        rows = state.rows(month)
+        kept = rows[rows["base_price"] <= upper].reset_index(drop=True)
+        year, month_number = (int(part) for part in month.split("-"))
+        write_parquet_partition(kept, dataset, {"year": year, "month": month_number})
+        published_rows += len(kept)
+    publish_s = time.perf_counter() - t0
+
+    report = {
+        "processed_months": changed,
+        "republished_months": republish,
+        "unchanged_months": len(state.months) - len(republish),
+        "processed_rows": int(sum(state.months[m]["source_rows"] for m in changed)),
+        "published_rows": published_rows,
+        "iqr_upper_limit": {"before": previous, "after": upper},
+        "process_seconds": round(process_s, 2),
+        "publish_seconds": round(publish_s, 2),
+        "total_seconds": round(time.perf_counter() - start, 2),
+    }
+    state.data["upper_limit"] = upper
+    state.save()
+    outliers = {
+        "failed": int(prices[prices.index > upper].sum()),
+        "limit": upper,
+    }
+    outliers["removed"] = outliers["failed"]
+    _write_metadata(dataset, version, state, rules, {outlier["name"]: outliers}, report)
+    return report
+
+
+def _crosses(values: pd.Index, old: float, new: float) -> bool:
+    low, high = sorted((old, new))
+    return bool(((values > low) & (values <= high)).any())
+
+
+def _write_metadata(
+    dataset: Path, version: str, state, rules, outlier_counts: dict, report: dict
+):
+    # row rule counts are per month, so they add up over the whole dataset
+    filter_counts = {}
+    for entry in state.months.values():
+        for name, counts in entry.get("filter_counts", {}).items():
+            total = filter_counts.setdefault(name, {"failed": 0, "removed": 0})
+            total["failed"] += counts["failed"]
+            total["removed"] += counts["removed"]
+    filter_counts.update(outlier_counts)
+
+    meta = {
+        "dataset_name": dataset.name,
+        "format": "parquet",
+        "partition_columns": PARTITION_COLUMNS,
+        "version": version,
+        "months": sorted(state.months),
+        "columns": dt.FINAL_COLUMNS,
+        "iqr_upper_limit": state.data["upper_limit"],
+        "filters": {"rules": rules, "rows_removed": filter_counts},
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+        "last_update": report,
+    }
+    metadata_path = dataset.with_name(f"{dataset_base_name(version)}_metadata.json")
+    with open(metadata_path, "w") as f:
+        json.dump(meta, f, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--input", action="append", required=True, help="raw .xlsx or .csv (repeatable)"
+    )
+    parser.add_argument("--version", default=dt.DATA_VERSION)
+    parser.add_argument("--output-dir", help="default: data/processed/<version>")
+    parser.add_argument("--h3-res", type=int, default=dt.H3_RES)
+    parser.add_argument(
+        "--filter", action="append", metavar="NAME=VALUE", help="override a filter"
+    )
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="replace a dataset without incremental state by the inputs' months",
+    )
+    args = parser.parse_args()
+
+    report = update_dataset(
+        args.input,
+        version=args.version,
+        output_dir=args.output_dir,
+        h3_res=args.h3_res,
+        rules=override_rules(dt.FILTER_RULES, args.filter),
+        chunk_rows=args.chunk_rows,
+        rebuild=args.rebuild,
+    )
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Stream a raw freight export (.xlsx or .csv) into chunked Parquet parts.
+
+    python -m src.data.raw_ingestion --input data/raw/dataset-hector-apollo-v2.xlsx
+    python -m src.data.raw_ingestion --input data/raw/history.csv --chunk-rows 20000
+
+Rows are read CHUNK_ROWS at a time (openpyxl in read-only mode for
+workbooks, pandas' chunked reader for CSV). Each chunk is projected to the
+columns the pipeline uses, with headers matched regardless of case and
+spacing, normalised and written as data/interim/<name>/part-NNNNN.parquet.
+Peak memory therefore follows the chunk size, not the file size.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from utils.memory_utils import PeakRss
+from utils.stage_cache import file_digest
+
+INTERIM_DIR = PROJECT_ROOT / "data/interim"
+CHUNK_ROWS = 50_000
+
+# Raw columns read by the data pipeline; everything else is dropped on read
+RAW_STRING_COLUMNS = [
+    "Cleaned Origin Name",
+    "Cleaned Origin District",
+    "Cleaned Origin State",
+    "Cleaned Destination Name",
+    "Cleaned Destination District",
+    "Destination State",
+    "axle_type",
+    "body_type",
+]
+RAW_NUMERIC_COLUMNS = [
+    "Origin Latitude",
+    "Origin Longitude",
+    "Destination Latitude",
+    "Destination Longitude",
+    "no_of_wheels",
+    "capacity_mt",
+    "length_ft",
+    "Fuel Price - Diesel (INR Rs per liter)",
+    "G-Distance (km)",
+    "Base Charge",
+]
+RAW_DATE_COLUMNS = ["Date"]
+RAW_COLUMNS = RAW_NUMERIC_COLUMNS + RAW_STRING_COLUMNS + RAW_DATE_COLUMNS
+
+# Parts share one schema; numbers are stored as float64 and integer columns
+# are restored on load (see `load_ingested`)
+PART_SCHEMA = pa.schema(
+    [(col, pa.float64()) for col in RAW_NUMERIC_COLUMNS]
+    + [(col, pa.string()) for col in RAW_STRING_COLUMNS]
+    + [(col, pa.timestamp("ns")) for col in RAW_DATE_COLUMNS]
+)
+
+
+def _header_key(name) -> str:
+    return " ".join(str(name).split()).lower()
+
+
+CANONICAL_HEADERS = {_header_key(col): col for col in RAW_COLUMNS}
+
+
+def canonical_columns(headers) -> dict:
+    """
+    {position: canonical name} for the headers the pipeline needs. Raises
+    ValueError if any of them is missing.
+    """
+    found = {}
+    for i, header in enumerate(headers):
+        col = CANONICAL_HEADERS.get(_header_key(header)) if header is not None else None
+        if col is not None and col not in found.values():
+            found[i] = col
+    missing = [col for col in RAW_COLUMNS if col not in found.values()]
+    if missing:
+        raise ValueError(f"Raw file is missing columns: {', '.join(missing)}")
+    return found
+
+
+def _iter_csv_chunks(path: Path, chunk_rows: int):
+    positions = canonical_columns(pd.read_csv(path, nrows=0).columns)
+    for chunk in pd.read_csv(
+        path, usecols=list(positions), chunksize=chunk_rows, low_memory=False
+    ):
+        # usecols by position keeps the file's column order
+        chunk.columns = [positions[i] for i in sorted(positions)]
+        yield chunk
+
+
+def _excel_value(value):
+    # what pd.read_excel does: whole floats become ints
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _iter_excel_chunks(path: Path, chunk_rows: int):
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        positions = canonical_columns(next(rows, ()))
+        names = list(positions.values())
+        buffer = []
+        for row in rows:
+            values = [_excel_value(row[i]) if i < len(row) else None for i in positions]
+            if all(v is None for v in values):
+                continue
+            buffer.append(values)
+            if len(buffer) == chunk_rows:
+                yield pd.DataFrame(buffer, columns=names)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=names)
+    finally:
+        workbook.close()
+
+
+def iter_raw_chunks(path, chunk_rows: int = CHUNK_ROWS):
+    """Yield the raw file as DataFrames of at most `chunk_rows` rows."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        return _iter_csv_chunks(path, chunk_rows)
+    return _iter_excel_chunks(path, chunk_rows)
+
+
+def normalize_chunk(chunk: pd.DataFrame):
+    """
+    Coerce one raw chunk to PART_SCHEMA types: numbers (unparseable values
+    become NaN), stripped strings and dates; fully empty rows are dropped.
+
+    Returns:
+        (chunk, integer columns): the numeric columns whose values were all
+        integers, before casting to float.
+    """
+    chunk = chunk.dropna(how="all")
+    integer_columns = set()
+    for col in RAW_NUMERIC_COLUMNS:
+        values = pd.to_numeric(chunk[col], errors="coerce")
+        if pd.api.types.is_integer_dtype(values):
+            integer_columns.add(col)
+        chunk[col] = values.astype("float64")
+    for col in RAW_STRING_COLUMNS:
+        values = chunk[col]
+        chunk[col] = values.where(values.isna(), values.astype(str).str.strip())
+    for col in RAW_DATE_COLUMNS:
+        chunk[col] = pd.to_datetime(chunk[col])
+    return chunk[RAW_COLUMNS], integer_columns
+
+
+def ingest_raw(
+    path,
+    output_dir=None,
+    chunk_rows: int = CHUNK_ROWS,
+    source_digest: str = None,
+    force: bool = False,
+) -> Path:
+    """
+    Convert a raw export into Parquet parts under `output_dir` (default
+    data/interim/<file stem>) plus a manifest.json. Does nothing if the
+    manifest already describes the same source contents.
+    """
+    path = Path(path)
+    output_dir = Path(output_dir or INTERIM_DIR / path.stem)
+    manifest_path = output_dir / "manifest.json"
+    source_digest = source_digest or file_digest(path)
+
+    if not force and manifest_path.exists():
+        with open(manifest_path) as f:
+            if json.load(f).get("source_digest") == source_digest:
+                return output_dir
+
+    tmp = output_dir.with_name(output_dir.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    rows, parts = 0, 0
+    integer_columns = set(RAW_NUMERIC_COLUMNS)
+    start = time.perf_counter()
+    with PeakRss() as memory:
+        for chunk in iter_raw_chunks(path, chunk_rows):
+            chunk, chunk_integers = normalize_chunk(chunk)
+            # a column is integer only if it was in every chunk, as it would
+            # be when reading the whole file at once
+            integer_columns &= chunk_integers
+            table = pa.Table.from_pandas(
+                chunk, schema=PART_SCHEMA, preserve_index=False
+            )
+            pq.write_table(table, tmp / f"part-{parts:05d}.parquet")
+            rows += len(chunk)
+            parts += 1
+
+    manifest = {
+        "source": str(path),
+        "source_digest": source_digest,
+        "ingested_at": datetime.now().isoformat(timespec="seconds"),
+        "rows": rows,
+        "parts": parts,
+        "chunk_rows": chunk_rows,
+        "integer_columns": [c for c in RAW_NUMERIC_COLUMNS if c in integer_columns],
+        "seconds": round(time.perf_counter() - start, 2),
+        "peak_rss_mb": round(memory.peak_mb, 1),
+    }
+    with open(tmp / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=4)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp, output_dir)
+    print(
+        f"Ingested {rows} rows from {path.name} into {parts} parts "
+        f"in {manifest['seconds']}s, peak RSS +{manifest['peak_rss_mb']} MB"
+    )
+    return output_dir
+
+
+def load_ingested(output_dir) -> pd.DataFrame:
+    """Read ingested parts back as one frame with the raw column dtypes."""
+    output_dir = Path(output_dir)
+    with open(output_dir / "manifest.json") as f:
+        manifest = json.load(f)
+    parts = sorted(output_dir.glob("part-*.parquet"))
+    if not parts:
+        return PART_SCHEMA.empty_table().to_pandas()
+
+    df = pa.concat_tables(pq.read_table(p, memory_map=True) for p in parts).to_pandas()
+    for col in manifest["integer_columns"]:
+        if df[col].notna().all():
+            df[col] = df[col].astype("int64")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", required=True, help="raw .xlsx or .csv")
+    parser.add_argument("--output-dir", help="default: data/interim/<file stem>")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument(
+        "--force", action="store_true", help="re-ingest unchanged input"
+    )
+    args = parser.parse_args()
+
+    output_dir = ingest_raw(
+        args.input, args.output_dir, chunk_rows=args.chunk_rows, force=args.force
+    )
+    with open(output_dir / "manifest.json") as f:
+        print(json.dumps(json.load(f), indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ from utils.model_utils import (
     evaluate,
     prepare_categorical,
 )
+from utils.dataset_utils import load_prepared_dataset
 
 from src.utils.feature_config import (
     TARGET,
@@ -21,7 +22,8 @@ from src.utils.feature_config import (
 
 # %%
 # --- Configuration ---
-DATA_PATH = "../../data/processed/v4/rpt_prepared_lightgbm_v4.csv"
+DATA_VERSION = "v4"
+TEST_YEAR = 2025
 
 MODELS = {
     "google": {
@@ -39,23 +41,37 @@ MODELS = {
 }
 
 # %%
-# --- Load data ---
-df = pd.read_csv(DATA_PATH)
-df_test = df[df["year"] == 2025].copy()
+# --- Load models and data ---
+# Each model once, as (model, category_map, config), reused by every section
+loaded = {key: load_model(info["version"]) for key, info in MODELS.items()}
+
+# Only the columns the models use, and only the test year's partitions
+eval_columns = {TARGET}
+for _, _, config in loaded.values():
+    eval_columns.update(config["input_features"])
+
+df_test = load_prepared_dataset(
+    DATA_VERSION,
+    columns=sorted(eval_columns),
+    filters=[("year", "==", TEST_YEAR)],
+)
 true_target_log = df_test[TARGET].copy()
 
 results = {}
+# each model's encoded test features, for the SHAP and lane sections too
+model_inputs = {}
 
 # %%
 # --- Evaluate Each Model ---
 for key, model_info in MODELS.items():
-    model, category_map, config = load_model(model_info["version"])
+    model, category_map, config = loaded[key]
     features = config["input_features"]
 
     df_features = df_test[features].copy()
 
     # Categorical handling
     df_features, _, _ = prepare_categorical(df_features, df_features.copy(), category_map)
+    model_inputs[key] = df_features
 
     # Predict
     y_pred_log = model.predict(df_features)
@@ -159,14 +175,10 @@ import shap
 # Summary plots for both models
 for key in results:
     print(f"\n🧬 SHAP Feature Importance for {results[key]['label']}:")
-    model, category_map, config = load_model(MODELS[key]["version"])
-    features = config["input_features"]
-
-    df_features = df_test[features].copy()
-    df_features, _, _ = prepare_categorical(df_features, df_features.copy(), category_map)
+    model = loaded[key][0]
 
     explainer = shap.Explainer(model)
-    shap_values = explainer(df_features)
+    shap_values = explainer(model_inputs[key])
 
     shap.plots.beeswarm(shap_values, max_display=15, show=True)
 
@@ -177,12 +189,7 @@ for key in results:
 # ----------------------------------------
 
 def create_error_df(model_key: str, label: str) -> pd.DataFrame:
-    model, category_map, config = load_model(MODELS[model_key]["version"]   )
-    features = config["input_features"]
-
-    # Subset for required features
-    df_features = df_test[features].copy()
-    df_features, _, _ = prepare_categorical(df_features, df_features.copy(), category_map)
+    df_features = model_inputs[model_key]
 
     y_true = np.expm1(true_target_log)
     y_pred = np.expm1(results[model_key]["pred_log"])
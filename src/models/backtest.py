@@ -0,0 +1,376 @@
+"""
+Rolling-origin backtest over shipment months.
+
+    python -m src.models.backtest
+    python -m src.models.backtest --folds 12 --workers 4 --output backtest.json
+
+Folds expand: each trains on every month before its cutoff and is scored on
+the `horizon_months` after it. This is the single year split behind
+model_metrics.json, repeated over the last `folds` cutoffs (config.yaml
+`backtest`). Early stopping watches the fold's test window, as `train_model`
+does with the test year.
+
+One binary Dataset holds every row, sorted by month, and is cached like the
+training Datasets (src/models/train.py). Workers load it once and train each
+fold on row-range subsets of it, so no fold re-bins from pandas; the bins
+come from all months. Folds run in a spawn process pool with the cores split
+between workers and LightGBM threads, and each worker scores its fold from
+the test months' partitions.
+
+RMSE, MAE and MAPE (on prices, as in `evaluate`) are reported per fold, as
+mean and spread over folds, and pooled over every test row.
+
+Hexes are LightGBM categoricals only: frequency or target encodings must be
+fitted on each fold's training months, which the shared Dataset cannot do,
+so other `hex_encoding` modes are refused.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+from lightgbm import early_stopping
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.models.train import (
+    binning_params,
+    categorical_features,
+    load_cached_datasets,
+    parse_overrides,
+    resolve_features,
+)
+from src.utils.feature_config import DISTANCE_FEATURE_SETS
+from utils.dataset_utils import (
+    compact_dtypes,
+    load_prepared_dataset,
+    prepared_dataset_digest,
+)
+from utils.lgb_dataset_cache import DatasetCache, dataset_key, subset
+from utils.model_utils import (
+    CONFIG_PATH,
+    apply_category_map,
+    evaluate,
+    load_config,
+    prepare_categorical,
+)
+from utils.parallel_utils import split_cores
+
+METRICS = ["RMSE", "MAE", "MAPE", "R2", "Accuracy (1-MAPE)"]
+
+# The all-months Dataset and what a worker needs to score its folds, set
+# once by `_init_worker`
+_WORKER = {}
+
+
+def period_labels(year, month) -> np.ndarray:
+    """Shipment month ("YYYY-MM") of each row."""
+    return np.char.add(
+        np.char.add(np.asarray(year).astype(str), "-"),
+        np.char.zfill(np.asarray(month).astype(str), 2),
+    )
+
+
+def rolling_folds(
+    periods, folds: int, horizon_months: int, step_months: int, min_train_months: int
+):
+    """
+    Expanding-window folds over `periods`: [[label, first row, end row], ...]
+    in month order.
+
+    Returns:
+        [{fold, train_months, test_months, train_rows, test_rows}], rows as
+        (start, stop) ranges of the month-sorted Dataset.
+    """
+    labels = [label for label, _, _ in periods]
+    last_cutoff = len(periods) - horizon_months
+    cutoffs = [last_cutoff - i * step_months for i in reversed(range(folds))]
+    cutoffs = [cutoff for cutoff in cutoffs if cutoff >= min_train_months]
+    if not cutoffs:
+        raise ValueError(
+            f"{len(periods)} months leave no fold with {min_train_months} "
+            f"training months and {horizon_months} test months"
+        )
+    return [
+        {
+            "fold": i,
+            "train_months": [labels[0], labels[cutoff - 1]],
+            "test_months": labels[cutoff : cutoff + horizon_months],
+            "train_rows": (0, periods[cutoff][1]),
+            "test_rows": (
+                periods[cutoff][1],
+                periods[cutoff + horizon_months - 1][2],
+            ),
+        }
+        for i, cutoff in enumerate(cutoffs)
+    ]
+
+
+def prepare_month_dataset(
+    data_version: str,
+    features,
+    target: str,
+    params: dict,
+    processed_dir=None,
+    cache: DatasetCache = None,
+):
+    """
+    Cache one Dataset of every row, sorted by month, unless it already is.
+
+    Returns:
+        (key, meta, report): meta["periods"] maps each month to its rows.
+    """
+    cache = cache or DatasetCache()
+    cat_cols = categorical_features(features)
+    key = dataset_key(
+        prepared_dataset_digest(data_version, processed_dir),
+        [prepare_month_dataset, prepare_categorical, compact_dtypes],
+        {
+            "features": list(features),
+            "categorical": cat_cols,
+            "target": target,
+            "layout": "all rows by month",
+            "binning": binning_params(params),
+        },
+    )
+    report = {"key": key}
+    if cache.has(key):
+        report["dataset_source"] = "cache"
+        return key, cache.meta(key), report
+
+    start = time.perf_counter()
+    columns = list(dict.fromkeys(list(features) + [target, "year", "month"]))
+    df = load_prepared_dataset(
+        data_version, columns=columns, processed_dir=processed_dir
+    )
+    df = df.sort_values(["year", "month"], kind="stable").reset_index(drop=True)
+    labels = period_labels(df["year"], df["month"])
+    X, y = df[list(features)].copy(), df[target]
+    del df
+    X, _, category_map = prepare_categorical(X, X.iloc[:0].copy(), cat_cols)
+    report["data_load_seconds"] = round(time.perf_counter() - start, 2)
+
+    start = time.perf_counter()
+    dataset = lgb.Dataset(X, label=y, params=binning_params(params)).construct()
+    report["dataset_build_seconds"] = round(time.perf_counter() - start, 2)
+    report["dataset_source"] = "built"
+
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    stops = np.r_[starts[1:], len(labels)]
+    meta = {
+        "data_version": data_version,
+        "features": list(features),
+        "target": target,
+        "category_map": category_map,
+        "periods": [[str(labels[a]), int(a), int(b)] for a, b in zip(starts, stops)],
+    }
+    cache.store(key, {"all": dataset}, meta)
+    return key, meta, report
+
+
+def _init_worker(cache_dir: str, key: str, params: dict, scoring: dict):
+    datasets, meta = load_cached_datasets(DatasetCache(cache_dir), key, params)
+    _WORKER.update(dataset=datasets["all"], meta=meta, **scoring)
+
+
+def load_months(data_version: str, columns, months, processed_dir=None):
+    """Rows of the prepared dataset shipped in `months` ("YYYY-MM")."""
+    years = sorted({int(month[:4]) for month in months})
+    columns = list(dict.fromkeys(list(columns) + ["year", "month"]))
+    df = load_prepared_dataset(
+        data_version,
+        columns=columns,
+        filters=[("year", ">=", years[0]), ("year", "<=", years[-1])],
+        processed_dir=processed_dir,
+    )
+    return df[np.isin(period_labels(df["year"], df["month"]), list(months))]
+
+
+def _test_rows(months):
+    """The test months' rows as (X, y), categories encoded as in training."""
+    meta = _WORKER["meta"]
+    features, target = meta["features"], meta["target"]
+    df = load_months(
+        _WORKER["data_version"],
+        features + [target],
+        months,
+        processed_dir=_WORKER["processed_dir"],
+    )
+    X = apply_category_map(df[features].copy(), meta["category_map"])
+    return X, df[target]
+
+
+def _run_fold(fold: dict, params: dict, schedule: dict) -> dict:
+    start = time.perf_counter()
+    dataset = _WORKER["dataset"]
+    train = subset(dataset, np.arange(*fold["train_rows"]))
+    valid = subset(dataset, np.arange(*fold["test_rows"]))
+    model = lgb.train(
+        params,
+        train,
+        num_boost_round=schedule["num_boost_round"],
+        valid_sets=[valid],
+        callbacks=[early_stopping(schedule["early_stopping_rounds"], verbose=False)],
+    )
+    train_s = time.perf_counter() - start
+
+    X_test, y_test = _test_rows(fold["test_months"])
+    pred = model.predict(X_test)
+    return {
+        **fold,
+        "best_iteration": model.best_iteration,
+        "metrics": evaluate(y_test, pred),
+        "train_seconds": round(train_s, 2),
+        "seconds": round(time.perf_counter() - start, 2),
+        "y_true": y_test.to_numpy(),
+        "y_pred": pred,
+    }
+
+
+def backtest(
+    config: dict,
+    features=None,
+    params: dict = None,
+    folds: int = None,
+    workers: int = 0,
+    data_version: str = None,
+    processed_dir=None,
+    cache: DatasetCache = None,
+):
+    """
+    Returns:
+        {"folds": [...], "summary": {...}, "report": {...}}; summary has
+        each metric's mean and std over folds and pooled over all test rows.
+
+    Raises:
+        ValueError: `hex_encoding.mode` is not "categorical"
+    """
+    training, settings = config["training"], config["backtest"]
+    mode = config.get("hex_encoding", {}).get("mode", "categorical")
+    if mode != "categorical":
+        raise ValueError(
+            f"Backtests train hexes as categoricals; hex_encoding.mode {mode!r} "
+            "would need its encodings fitted per fold"
+        )
+    features = features or list(config["features"])
+    params = params or config["params"]
+    data_version = data_version or training["data_version"]
+    cache = cache or DatasetCache()
+
+    start = time.perf_counter()
+    key, meta, report = prepare_month_dataset(
+        data_version, features, config["target"], params, processed_dir, cache
+    )
+    fold_specs = rolling_folds(
+        meta["periods"],
+        folds or settings["folds"],
+        settings["horizon_months"],
+        settings["step_months"],
+        settings["min_train_months"],
+    )
+    workers, threads = split_cores(workers, len(fold_specs))
+    schedule = {
+        "num_boost_round": training["num_boost_round"],
+        "early_stopping_rounds": training["early_stopping_rounds"],
+    }
+    scoring = {"data_version": data_version, "processed_dir": processed_dir}
+    print(f"{len(fold_specs)} folds on {workers} workers x {threads} LightGBM threads")
+
+    results = []
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=(str(cache.cache_dir), key, params, scoring),
+    ) as pool:
+        futures = [
+            pool.submit(_run_fold, fold, {**params, "num_threads": threads}, schedule)
+            for fold in fold_specs
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(
+                f"  fold {result['fold']:>2} test {','.join(result['test_months'])} "
+                f"RMSE {result['metrics']['RMSE']:.1f} ({result['seconds']}s)"
+            )
+    results.sort(key=lambda r: r["fold"])
+    wall_s = time.perf_counter() - start
+
+    pooled = evaluate(
+        np.concatenate([r.pop("y_true") for r in results]),
+        np.concatenate([r.pop("y_pred") for r in results]),
+    )
+    summary = {
+        name: {
+            "mean": float(np.mean([r["metrics"][name] for r in results])),
+            "std": float(np.std([r["metrics"][name] for r in results])),
+            "pooled": float(pooled[name]),
+        }
+        for name in METRICS
+    }
+    fold_seconds = sum(r["seconds"] for r in results)
+    report.update(
+        workers=workers,
+        threads_per_worker=threads,
+        wall_seconds=round(wall_s, 2),
+        fold_seconds=round(fold_seconds, 2),
+        # 1.0 when workers never wait on each other or on the parent
+        parallel_efficiency=round(fold_seconds / (wall_s * workers), 2),
+    )
+    return {"folds": results, "summary": summary, "report": report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--folds", type=int, help="default: backtest.folds")
+    parser.add_argument("--workers", type=int, default=0, help="0 = one per core")
+    parser.add_argument("--data-version", help="default: training.data_version")
+    parser.add_argument("--processed-dir", help="default: data/processed/<version>")
+    parser.add_argument(
+        "--distance",
+        choices=sorted(DISTANCE_FEATURE_SETS),
+        help="use feature_config's features for this distance instead",
+    )
+    parser.add_argument(
+        "--set", action="append", metavar="NAME=VALUE", help="override a param"
+    )
+    parser.add_argument("--cache-dir", help="default: data/cache/lgb_datasets")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    result = backtest(
+        config,
+        features=resolve_features(config, args.distance),
+        params={**config["params"], **parse_overrides(args.set)},
+        folds=args.folds,
+        workers=args.workers,
+        data_version=args.data_version,
+        processed_dir=args.processed_dir,
+        cache=DatasetCache(args.cache_dir) if args.cache_dir else None,
+    )
+
+    print(f"\n{'metric':<20} {'mean':>12} {'std':>12} {'pooled':>12}")
+    for name, values in result["summary"].items():
+        print(
+            f"{name:<20} {values['mean']:>12.4f} {values['std']:>12.4f} "
+            f"{values['pooled']:>12.4f}"
+        )
+    print(json.dumps(result["report"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
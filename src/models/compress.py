@@ -0,0 +1,382 @@
+"""
+Smaller variants of a saved model version, with their latency and accuracy.
+
+    python -m src.models.compress --model-version v2_h
+    python -m src.models.compress --model-version v2_h --budget-ms 1 \\
+        --save-as v2_h_small
+    python -m src.models.compress --model-version v2_h \\
+        --variant distill_l15_lr0.1_r300 --save-as v2_h_small
+
+Variants come from config.yaml's `compression`:
+
+- truncate: the base's first trees only (a fraction of them)
+- refit: retrained from scratch on the base's training rows with fewer
+  leaves and/or rounds (Datasets from the cache, see src/models/train.py)
+- distill: a small student fitted to the base's predictions on its
+  training rows, early-stopped on the true test-year targets
+
+Every variant is scored on the base's test year. Only versions trained with
+a year split (train.py, or a compression of one) record it; warm-started
+versions were trained on months of their test year and are refused. The
+report lists trees, leaves, model.txt size (and its trees' share),
+single-request latency through predict_lane_price (as /predict makes it,
+hex lookups included), batch microseconds per row, RMSE and MAPE.
+--variant saves one variant as a new version with `save_all`. --budget-ms
+instead saves the most accurate variant whose median request latency is
+within the budget.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.models.train import binning_params, prepare_datasets
+from src.models.warm_start import data_through, load_base_model, raw_features
+from utils.dataset_utils import load_prepared_dataset
+from utils.hex_encoding import HexEncoder
+from utils.model_bundle import CategoryLookup
+from utils.model_utils import (
+    CONFIG_PATH,
+    apply_category_map,
+    evaluate,
+    load_config,
+    predict_lane_price,
+    save_all,
+    save_metrics,
+    split_dataset,
+    train_booster,
+)
+
+
+def encode(raw, category_map: dict, encoder, features) -> "pd.DataFrame":
+    """Model input for raw prepared-dataset rows, as in training."""
+    X = raw.copy()
+    if encoder is not None:
+        X = encoder.transform(X)
+    return apply_category_map(X[features], category_map)
+
+
+def request_latency(model, category_map, encoder, rows) -> np.ndarray:
+    """Seconds per single-row prediction, the way /predict makes it."""
+    features = model.feature_name()
+    seconds = []
+    for row in rows:
+        start = time.perf_counter()
+        kwargs = dict(row)
+        if encoder is not None:
+            encoded = encoder.encode([row["origin_hex"]], [row["destination_hex"]])
+            kwargs.update({name: float(v[0]) for name, v in encoded.items()})
+        predict_lane_price(model, category_map, features, **kwargs)
+        seconds.append(time.perf_counter() - start)
+    return np.array(seconds)
+
+
+def measure(variant: dict, raw_test, y_test, rows) -> dict:
+    """Size, latency and test-year accuracy of a variant."""
+    model = variant["model"]
+    X_test = encode(
+        raw_test, variant["category_map"], variant["encoder"], model.feature_name()
+    )
+    batch_s = []
+    for _ in range(3):
+        start = time.perf_counter()
+        pred = model.predict(X_test)
+        batch_s.append(time.perf_counter() - start)
+    # compiled, as served from the variant's model.bundle
+    lookup = variant["category_map"]
+    if not isinstance(lookup, CategoryLookup):
+        lookup = CategoryLookup.from_category_map(lookup)
+    latency = request_latency(model, lookup, variant["encoder"], rows)
+    trees = model.dump_model()["tree_info"]
+    text = model.model_to_string()
+    metrics = evaluate(y_test, pred)
+    return {
+        "name": variant["name"],
+        "kind": variant["kind"],
+        "settings": variant["settings"],
+        "trees": len(trees),
+        "leaves": sum(tree["num_leaves"] for tree in trees),
+        "model_kb": round(len(text) / 1024, 1),
+        # without the category lists saved after the trees
+        "trees_kb": round(text.index("end of trees") / 1024, 1),
+        "latency_ms_p50": round(float(np.median(latency)) * 1e3, 3),
+        "latency_ms_p95": round(float(np.percentile(latency, 95)) * 1e3, 3),
+        "batch_us_per_row": round(min(batch_s) / len(X_test) * 1e6, 3),
+        "metrics": metrics,
+    }
+
+
+# short names of settings in variant names
+_ABBREVIATIONS = {"num_leaves": "l", "learning_rate": "lr", "max_depth": "d"}
+
+
+def variant_name(kind: str, spec: dict, rounds: int) -> str:
+    """e.g. refit_l15_r300 for {num_leaves: 15} and 300 rounds."""
+    parts = [f"{_ABBREVIATIONS.get(k, k)}{v:g}" for k, v in spec.items()]
+    return "_".join([kind, *parts, f"r{rounds}"])
+
+
+def truncated(base, fraction: float) -> lgb.Booster:
+    trees = max(1, int(round(base.current_iteration() * fraction)))
+    return lgb.Booster(model_str=base.model_to_string(num_iteration=trees))
+
+
+def build_variants(
+    base_version: str, config: dict, processed_dir=None, cache=None, requests=None
+):
+    """
+    Train the `compression` variants of `base_version` and measure them
+    with the base.
+
+    Returns:
+        (variants, report rows, base model_config): variants are
+        {name: {model, category_map, encoder, kind, settings}}.
+
+    Raises:
+        ValueError: the base was not trained with a test-year split
+    """
+    settings, training = config["compression"], config["training"]
+    booster, category_map, base_config, encoder = load_base_model(base_version)
+    base_training = base_config.get("training", {})
+    if "lineage" in base_config and "test_year" not in base_training:
+        # warm-started: trained on months after any year split, so the
+        # config's test year would score it on its own training rows
+        raise ValueError(
+            f"{base_version} was warm-started and has no test year to score "
+            "variants on; compress the version it was trained from instead"
+        )
+    features, target = base_config["input_features"], base_config["target"]
+    columns = raw_features(features, encoder)
+    data_version = base_training.get("data_version") or training["data_version"]
+    test_year = base_training.get("test_year") or training["test_year"]
+    params = {**config["params"], **base_training.get("params", {})}
+
+    df = load_prepared_dataset(
+        data_version,
+        columns=list(dict.fromkeys(columns + [target, "year"])),
+        filters=[("year", "<=", test_year)],
+        processed_dir=processed_dir,
+    )
+    raw_train, raw_test, y_train, y_test = split_dataset(df, columns, target, test_year)
+    del df
+    sample = np.random.default_rng(0).choice(
+        len(raw_test), requests or settings["latency_requests"]
+    )
+    rows = raw_test.iloc[sample].astype(object).to_dict("records")
+
+    def variant(name, kind, model, cm=category_map, enc=encoder, p=params, **spec):
+        return {
+            "name": name,
+            "kind": kind,
+            "model": model,
+            "category_map": cm,
+            "encoder": enc,
+            "params": p,
+            "settings": spec,
+        }
+
+    variants = [variant("base", "base", booster, trees=booster.current_iteration())]
+    for fraction in settings["truncate"]:
+        variants.append(
+            variant(
+                f"truncate_{fraction:g}",
+                "truncate",
+                truncated(booster, fraction),
+                fraction=fraction,
+            )
+        )
+
+    if settings["refit"]:
+        # the base's own Datasets (cached by train.py) and encodings
+        train_data, valid_data, refit_map, _, refit_encoder, _ = prepare_datasets(
+            data_version,
+            columns,
+            target,
+            params,
+            test_year,
+            processed_dir=processed_dir,
+            cache=cache,
+            encoder=encoder and HexEncoder(**encoder.settings()),
+        )
+        for spec in settings["refit"]:
+            spec = dict(spec)
+            rounds = spec.pop("num_boost_round", training["num_boost_round"])
+            refit_params = {**params, **spec}
+            model = train_booster(
+                refit_params,
+                train_data,
+                valid_data,
+                num_boost_round=rounds,
+                early_stopping_rounds=training["early_stopping_rounds"],
+                log_period=training["log_period"],
+            )
+            variants.append(
+                variant(
+                    variant_name("refit", spec, rounds),
+                    "refit",
+                    model,
+                    refit_map,
+                    refit_encoder,
+                    refit_params,
+                    num_boost_round=rounds,
+                    **spec,
+                )
+            )
+
+    if settings["distill"]:
+        X_train = encode(raw_train, category_map, encoder, features)
+        X_test = encode(raw_test, category_map, encoder, features)
+        soft = booster.predict(X_train)
+        for spec in settings["distill"]:
+            spec = dict(spec)
+            rounds = spec.pop("num_boost_round", training["num_boost_round"])
+            student_params = {**params, **spec}
+            student_train = lgb.Dataset(
+                X_train, label=soft, params=binning_params(student_params)
+            )
+            student_valid = lgb.Dataset(X_test, label=y_test, reference=student_train)
+            model = train_booster(
+                student_params,
+                student_train,
+                student_valid,
+                num_boost_round=rounds,
+                early_stopping_rounds=training["early_stopping_rounds"],
+                log_period=training["log_period"],
+            )
+            variants.append(
+                variant(
+                    variant_name("distill", spec, rounds),
+                    "distill",
+                    model,
+                    p=student_params,
+                    num_boost_round=rounds,
+                    **spec,
+                )
+            )
+
+    report = [measure(v, raw_test, y_test, rows) for v in variants]
+    return {v["name"]: v for v in variants}, report, base_config
+
+
+def choose(report, budget_ms: float) -> str:
+    """The lowest-RMSE variant whose median request latency fits `budget_ms`."""
+    fitting = [r for r in report if r["latency_ms_p50"] <= budget_ms]
+    if not fitting:
+        raise ValueError(f"No variant answers within {budget_ms} ms")
+    return min(fitting, key=lambda r: r["metrics"]["RMSE"])["name"]
+
+
+def save_variant(
+    variant: dict,
+    measured: dict,
+    base_version: str,
+    base_config: dict,
+    model_version: str,
+    model_tag: str = "default",
+):
+    model = variant["model"]
+    lineage = {
+        "mode": "compression",
+        "base_version": base_version,
+        "ancestors": [base_version]
+        + base_config.get("lineage", {}).get("ancestors", []),
+        "variant": measured["name"],
+        "data_through": data_through(base_config),
+    }
+    save_all(
+        model,
+        variant["category_map"],
+        model_version,
+        model.feature_name(),
+        base_config["target"],
+        model_tag=model_tag,
+        hex_encoder=variant["encoder"],
+        extra={
+            "training": {
+                **base_config.get("training", {}),
+                "params": variant["params"],
+                "best_iteration": model.current_iteration(),
+                "compression": measured,
+            },
+            "lineage": lineage,
+        },
+    )
+    save_metrics(measured["metrics"], model_version)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-version", required=True, help="folder under models/")
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--processed-dir", help="default: data/processed/<version>")
+    parser.add_argument("--cache-dir", help="default: data/cache/lgb_datasets")
+    parser.add_argument(
+        "--requests", type=int, help="default: compression.latency_requests"
+    )
+    choice = parser.add_mutually_exclusive_group()
+    choice.add_argument("--variant", help="variant to save, by report name")
+    choice.add_argument(
+        "--budget-ms", type=float, help="save the best variant within this p50"
+    )
+    parser.add_argument("--save-as", help="model version for the chosen variant")
+    parser.add_argument("--model-tag", default="default")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+    if (args.variant or args.budget_ms) and not args.save_as:
+        parser.error("--variant/--budget-ms need --save-as")
+
+    from utils.lgb_dataset_cache import DatasetCache
+
+    config = load_config(args.config)
+    variants, report, base_config = build_variants(
+        args.model_version,
+        config,
+        processed_dir=args.processed_dir,
+        cache=DatasetCache(args.cache_dir) if args.cache_dir else DatasetCache(),
+        requests=args.requests,
+    )
+
+    print(
+        f"\n{'variant':<28} {'trees':>5} {'leaves':>6} {'KB':>7} {'trees KB':>8} "
+        f"{'p50 ms':>7} {'p95 ms':>7} {'us/row':>7} {'RMSE':>10} {'MAPE':>7}"
+    )
+    for r in report:
+        print(
+            f"{r['name']:<28} {r['trees']:>5} {r['leaves']:>6} {r['model_kb']:>7.0f} "
+            f"{r['trees_kb']:>8.0f} {r['latency_ms_p50']:>7.2f} "
+            f"{r['latency_ms_p95']:>7.2f} "
+            f"{r['batch_us_per_row']:>7.2f} {r['metrics']['RMSE']:>10.1f} "
+            f"{r['metrics']['MAPE']:>7.4f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    name = args.variant
+    if args.budget_ms is not None:
+        name = choose(report, args.budget_ms)
+    if name:
+        if name not in variants:
+            raise ValueError(f"Unknown variant '{name}', choose from {list(variants)}")
+        measured = next(r for r in report if r["name"] == name)
+        save_variant(
+            variants[name],
+            measured,
+            args.model_version,
+            base_config,
+            args.save_as,
+            args.model_tag,
+        )
+        print(f"Saved {name} as {args.save_as}")
+
+
+if __name__ == "__main__":
+    main()
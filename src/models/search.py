@@ -0,0 +1,308 @@
+"""
+Random hyperparameter search over config.yaml's `search.space`.
+
+    python -m src.models.search --model-version v2_h_tuned
+    python -m src.models.search --model-version v2_h_tuned --trials 80 --workers 4
+
+Trials run concurrently in a process pool. The machine's cores are split
+between workers and LightGBM threads (num_threads = cores // workers).
+Every worker loads the same cached binary train/valid Datasets once (built
+first if needed, see src/models/train.py), so no trial touches pandas.
+
+Every `report_every` rounds a trial posts its best validation RMSE so far
+to a table shared by all workers. It is stopped (pruned) if that score is
+worse than the median of the other trials at the same round, once
+`min_trials` of them have reported there. Trials finish in whatever order
+the pool runs them, so with several workers the set of pruned trials can
+vary between runs; the scores of completed trials don't.
+
+The best completed trial is saved as a new model version with `save_all`
+and `save_metrics`, next to search_trials.json listing every trial.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+from lightgbm import early_stopping
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.models.train import (
+    load_cached_datasets,
+    hex_encoder,
+    parse_overrides,
+    prepare_datasets,
+    resolve_features,
+)
+from src.utils.feature_config import DISTANCE_FEATURE_SETS
+from utils.lgb_dataset_cache import DatasetCache
+from utils.model_utils import (
+    CONFIG_PATH,
+    evaluate,
+    load_config,
+    project_root,
+    save_all,
+    save_metrics,
+)
+from utils.parallel_utils import split_cores
+
+# Datasets and the shared score table of a worker process, set once by
+# `_init_worker` and reused by every trial the worker runs
+_WORKER = {}
+
+
+class TrialPruned(Exception):
+    """Raised by the pruning callback to stop a trial."""
+
+
+def sample_params(space: dict, rng: np.random.Generator) -> dict:
+    """
+    One draw from `space`: {name: {type: int|float, low, high, log} or
+    {type: choice, values}}.
+    """
+    params = {}
+    for name, spec in space.items():
+        if spec["type"] == "choice":
+            params[name] = spec["values"][rng.integers(len(spec["values"]))]
+            continue
+        low, high = spec["low"], spec["high"]
+        if spec.get("log"):
+            value = float(np.exp(rng.uniform(np.log(low), np.log(high))))
+        else:
+            value = float(rng.uniform(low, high))
+        params[name] = int(round(value)) if spec["type"] == "int" else value
+    return params
+
+
+def _init_worker(cache_dir: str, key: str, params: dict, shared, pruning: dict):
+    datasets, _ = load_cached_datasets(DatasetCache(cache_dir), key, params)
+    _WORKER.update(**datasets, shared=shared, pruning=pruning)
+
+
+def _pruning_callback(trial: int, shared, report_every: int, min_trials: int):
+    history = []
+    best = float("inf")
+
+    def callback(env):
+        nonlocal best
+        best = min(best, env.evaluation_result_list[0][2])
+        if (env.iteration + 1) % report_every:
+            return
+        history.append(best)
+        shared[trial] = list(history)
+        step = len(history) - 1
+        others = [
+            scores[step]
+            for other, scores in shared.items()
+            if other != trial and len(scores) > step
+        ]
+        if len(others) >= min_trials and best > np.median(others):
+            raise TrialPruned(env.iteration + 1)
+
+    callback.order = 40  # after early stopping
+    return callback
+
+
+def _run_trial(trial: int, params: dict, schedule: dict) -> dict:
+    start = time.perf_counter()
+    shared, pruning = _WORKER["shared"], _WORKER["pruning"]
+    result = {"trial": trial, "params": params}
+    try:
+        model = lgb.train(
+            params,
+            _WORKER["train"],
+            num_boost_round=schedule["num_boost_round"],
+            valid_sets=[_WORKER["valid"]],
+            callbacks=[
+                early_stopping(schedule["early_stopping_rounds"], verbose=False),
+                _pruning_callback(trial, shared, **pruning),
+            ],
+        )
+    except TrialPruned as pruned:
+        result.update(state="pruned", rounds=pruned.args[0], score=shared[trial][-1])
+    else:
+        result.update(
+            state="complete",
+            rounds=model.current_iteration(),
+            best_iteration=model.best_iteration,
+            score=next(iter(model.best_score["valid_0"].values())),
+            model=model.model_to_string(),
+        )
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    return result
+
+
+def search(
+    model_version: str,
+    config: dict,
+    features=None,
+    params: dict = None,
+    trials: int = None,
+    workers: int = 0,
+    seed: int = None,
+    data_version: str = None,
+    processed_dir=None,
+    cache: DatasetCache = None,
+    model_tag: str = "default",
+):
+    """
+    Run the search and save the best completed trial as `model_version`.
+
+    Returns:
+        (model, metrics, trial results without model strings, report)
+    """
+    training, settings = config["training"], config["search"]
+    features = features or list(config["features"])
+    target = config["target"]
+    # min_data_in_leaf is searched over, so the shared Datasets must not
+    # pre-filter features by it
+    base = {**(params or config["params"]), "feature_pre_filter": False}
+    data_version = data_version or training["data_version"]
+    trials = trials or settings["trials"]
+    seed = settings["seed"] if seed is None else seed
+    cache = cache or DatasetCache()
+
+    start = time.perf_counter()
+    _, _, category_map, (X_test, y_test), encoder, report = prepare_datasets(
+        data_version,
+        features,
+        target,
+        base,
+        training["test_year"],
+        processed_dir=processed_dir,
+        cache=cache,
+        encoder=hex_encoder(config.get("hex_encoding")),
+    )
+
+    rng = np.random.default_rng(seed)
+    candidates = [
+        {**base, **sample_params(settings["space"], rng)} for _ in range(trials)
+    ]
+    workers, threads = split_cores(workers, trials)
+    schedule = {
+        "num_boost_round": training["num_boost_round"],
+        "early_stopping_rounds": training["early_stopping_rounds"],
+    }
+    pruning = {
+        "report_every": settings["report_every"],
+        "min_trials": settings["min_trials"],
+    }
+    print(f"{trials} trials on {workers} workers x {threads} LightGBM threads")
+
+    results, best = [], None
+    ctx = mp.get_context("spawn")
+    with ctx.Manager() as manager:
+        shared = manager.dict()
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=ctx,
+            initializer=_init_worker,
+            initargs=(str(cache.cache_dir), report["key"], base, shared, pruning),
+        ) as pool:
+            futures = [
+                pool.submit(_run_trial, trial, {**p, "num_threads": threads}, schedule)
+                for trial, p in enumerate(candidates)
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                model_str = result.pop("model", None)
+                if model_str and (best is None or result["score"] < best[0]["score"]):
+                    best = (result, model_str)
+                results.append(result)
+                print(
+                    f"  trial {result['trial']:>3} {result['state']:<8} "
+                    f"{result['score']:.5f} after {result['rounds']:>4} rounds "
+                    f"({result['seconds']}s)"
+                )
+    results.sort(key=lambda r: r["trial"])
+    if best is None:
+        raise RuntimeError("Every trial was pruned; lower search.min_trials")
+
+    best_result, model_str = best
+    model = lgb.Booster(model_str=model_str)
+    metrics = evaluate(y_test, model.predict(X_test))
+    best_params = {k: v for k, v in best_result["params"].items() if k != "num_threads"}
+
+    report.update(
+        search_seconds=round(time.perf_counter() - start, 2),
+        workers=workers,
+        threads_per_worker=threads,
+        trials=trials,
+        completed=sum(r["state"] == "complete" for r in results),
+        pruned=sum(r["state"] == "pruned" for r in results),
+        rounds_trained=sum(r["rounds"] for r in results),
+        best_trial=best_result["trial"],
+    )
+    save_all(
+        model,
+        category_map,
+        model_version,
+        model.feature_name(),
+        target,
+        model_tag=model_tag,
+        hex_encoder=encoder,
+        extra={
+            "training": {
+                "data_version": data_version,
+                "test_year": training["test_year"],
+                "params": best_params,
+                "best_iteration": best_result["best_iteration"],
+                "report": report,
+            }
+        },
+    )
+    save_metrics(metrics, model_version)
+    trials_path = project_root / "models" / model_version / "search_trials.json"
+    with open(trials_path, "w") as f:
+        json.dump(results, f, indent=2)
+    return model, metrics, results, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-version", required=True, help="folder under models/")
+    parser.add_argument("--model-tag", default="default")
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--trials", type=int, help="default: search.trials")
+    parser.add_argument("--workers", type=int, default=0, help="0 = one per core")
+    parser.add_argument("--seed", type=int, help="default: search.seed")
+    parser.add_argument("--data-version", help="default: training.data_version")
+    parser.add_argument("--processed-dir", help="default: data/processed/<version>")
+    parser.add_argument(
+        "--distance",
+        choices=sorted(DISTANCE_FEATURE_SETS),
+        help="use feature_config's features for this distance instead",
+    )
+    parser.add_argument(
+        "--set", action="append", metavar="NAME=VALUE", help="override a base param"
+    )
+    parser.add_argument("--cache-dir", help="default: data/cache/lgb_datasets")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    _, metrics, _, report = search(
+        args.model_version,
+        config,
+        features=resolve_features(config, args.distance),
+        params={**config["params"], **parse_overrides(args.set)},
+        trials=args.trials,
+        workers=args.workers,
+        seed=args.seed,
+        data_version=args.data_version,
+        processed_dir=args.processed_dir,
+        cache=DatasetCache(args.cache_dir) if args.cache_dir else None,
+        model_tag=args.model_tag,
+    )
+    print(json.dumps({"metrics": metrics, "search": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
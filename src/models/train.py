@@ -0,0 +1,358 @@
+"""
+Train the LightGBM rate model described by src/config/config.yaml.
+
+    python -m src.models.train --model-version v2_h
+    python -m src.models.train --model-version v2_g --distance g
+    python -m src.models.train --model-version v2_h --set learning_rate=0.1
+
+Features come from the config's `features`, or from feature_config.py with
+--distance. The target, LightGBM params and boosting schedule come from
+`target`, `params` and `training`. Columns that COLUMN_DTYPES marks as
+"category" are trained as LightGBM categoricals, except the hex columns
+when `hex_encoding.mode` (or --hex-encoding) is "frequency" or "target":
+those are replaced by the lookups of utils/hex_encoding.py, fitted on the
+training rows and saved with the model.
+
+The train and validation Datasets are saved as LightGBM binary files under
+data/cache/lgb_datasets. They are keyed by the prepared data's digest, the
+features, the split and the binning params (see utils/lgb_dataset_cache.py).
+A later run with the same key loads them instead of rebuilding from pandas,
+and reads only the test year's rows for scoring.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import lightgbm as lgb
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.utils.feature_config import (
+    BASE_FEATURES,
+    COLUMN_DTYPES,
+    DISTANCE_FEATURE_SETS,
+)
+from utils.constants import CONSTANTS
+from utils.dataset_utils import (
+    compact_dtypes,
+    load_prepared_dataset,
+    prepared_dataset_digest,
+)
+from utils.hex_encoding import (
+    HEX_ENCODING_FILE,
+    MODES,
+    HexEncoder,
+    encoded_features,
+)
+from utils.lgb_dataset_cache import DatasetCache, dataset_key, dataset_params
+from utils.model_utils import (
+    CONFIG_PATH,
+    apply_category_map,
+    evaluate,
+    load_config,
+    prepare_categorical,
+    save_all,
+    save_metrics,
+    split_dataset,
+    train_booster,
+)
+
+
+def resolve_features(config: dict, distance: str = None) -> list:
+    """The config's features, or feature_config's set for `distance`."""
+    if distance:
+        return BASE_FEATURES + DISTANCE_FEATURE_SETS[distance]
+    return list(config["features"])
+
+
+def categorical_features(features) -> list:
+    return [col for col in features if COLUMN_DTYPES.get(col) == "category"]
+
+
+def hex_encoder(settings: dict = None):
+    """
+    A HexEncoder for config.yaml's `hex_encoding`, or None when the hex
+    columns are trained as categoricals.
+    """
+    settings = dict(settings or {"mode": "categorical"})
+    mode = settings.pop("mode")
+    if mode == "categorical":
+        return None
+    return HexEncoder(mode, resolution=CONSTANTS.H3_RES, **settings)
+
+
+def parse_overrides(items) -> dict:
+    """`NAME=VALUE` pairs, with values parsed as YAML (numbers, bools)."""
+    overrides = {}
+    for item in items or []:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected NAME=VALUE, got '{item}'")
+        overrides[name] = yaml.safe_load(value)
+    return overrides
+
+
+def binning_params(params: dict) -> dict:
+    # verbosity is not part of the key but keeps construction quiet
+    return {**dataset_params(params), "verbosity": params.get("verbosity", 1)}
+
+
+def load_cached_datasets(cache: DatasetCache, key: str, params: dict):
+    """
+    `cache.load` for Datasets built from the prepared data's features.
+
+    Returns:
+        ({name: Dataset}, meta)
+    """
+    datasets, meta = cache.load(key, binning_params(params))
+    # what lgb.Dataset records for pandas input, so the saved model
+    # carries the same category lists as one built from frames
+    cat_cols = categorical_features(meta["features"])
+    reference = next(iter(datasets.values()))
+    reference.pandas_categorical = [meta["category_map"][col] for col in cat_cols]
+    return datasets, meta
+
+
+def prepare_datasets(
+    data_version: str,
+    features,
+    target: str,
+    params: dict,
+    test_year: int,
+    processed_dir=None,
+    cache: DatasetCache = None,
+    encoder: HexEncoder = None,
+):
+    """
+    Train/validation LightGBM Datasets for `features`, from the binary cache
+    when possible. With `encoder`, the hex columns are replaced by its
+    encodings, fitted on the training rows.
+
+    Returns:
+        (train, valid, category_map, test_frame, encoder, report):
+        test_frame is (X_test, y_test) encoded as in training; encoder is
+        the fitted HexEncoder or None; report has the cache key, whether
+        the Datasets were built or loaded and the seconds spent.
+    """
+    features = list(features)
+    model_features = features
+    if encoder is not None:
+        model_features = encoded_features(features, encoder.mode, encoder.levels)
+    cat_cols = categorical_features(model_features)
+    bin_params = binning_params(params)
+    key = dataset_key(
+        prepared_dataset_digest(data_version, processed_dir),
+        [
+            prepare_datasets,
+            split_dataset,
+            prepare_categorical,
+            compact_dtypes,
+            HexEncoder,
+        ],
+        {
+            "features": features,
+            "categorical": cat_cols,
+            "target": target,
+            "test_year": test_year,
+            "binning": dataset_params(params),
+            "hex_encoding": encoder.settings() if encoder else "categorical",
+        },
+    )
+    report = {"key": key}
+
+    if cache is not None and cache.has(key):
+        start = time.perf_counter()
+        datasets, meta = load_cached_datasets(cache, key, params)
+        train, valid = datasets["train"], datasets["valid"]
+        category_map = meta["category_map"]
+        if encoder is not None:
+            encoder = HexEncoder.load(cache.path(key) / HEX_ENCODING_FILE)
+        report["dataset_source"] = "cache"
+        report["dataset_load_seconds"] = round(time.perf_counter() - start, 2)
+
+        start = time.perf_counter()
+        test = load_prepared_dataset(
+            data_version,
+            columns=features + [target],
+            filters=[("year", "==", test_year)],
+            processed_dir=processed_dir,
+        )
+        X_test = test[features].copy()
+        if encoder is not None:
+            X_test = encoder.transform(X_test)
+        X_test = apply_category_map(X_test, category_map)
+        report["test_load_seconds"] = round(time.perf_counter() - start, 2)
+        return train, valid, category_map, (X_test, test[target]), encoder, report
+
+    start = time.perf_counter()
+    df = load_prepared_dataset(
+        data_version,
+        columns=features + [target],
+        filters=[("year", "<=", test_year)],
+        processed_dir=processed_dir,
+    )
+    X_train, X_test, y_train, y_test = split_dataset(df, features, target, test_year)
+    del df
+    report["data_load_seconds"] = round(time.perf_counter() - start, 2)
+    if encoder is not None:
+        start = time.perf_counter()
+        X_train = encoder.fit_transform(X_train, y_train)
+        X_test = encoder.transform(X_test)
+        report["hex_encoding_seconds"] = round(time.perf_counter() - start, 2)
+    X_train, X_test, category_map = prepare_categorical(X_train, X_test, cat_cols)
+
+    start = time.perf_counter()
+    # categorical_feature stays "auto": the category columns are cat_cols,
+    # and lgb.train would refuse to change it once the raw data is freed
+    train = lgb.Dataset(X_train, label=y_train, params=bin_params).construct()
+    valid = lgb.Dataset(
+        X_test, label=y_test, reference=train, params=bin_params
+    ).construct()
+    report["dataset_source"] = "built"
+    report["dataset_build_seconds"] = round(time.perf_counter() - start, 2)
+
+    if cache is not None:
+        start = time.perf_counter()
+        meta = {
+            "data_version": data_version,
+            "features": model_features,
+            "target": target,
+            "test_year": test_year,
+            "category_map": category_map,
+            "train_rows": len(X_train),
+            "valid_rows": len(X_test),
+        }
+        files = {HEX_ENCODING_FILE: encoder.to_bytes()} if encoder else None
+        cache.store(key, {"train": train, "valid": valid}, meta, files=files)
+        report["dataset_save_seconds"] = round(time.perf_counter() - start, 2)
+    return train, valid, category_map, (X_test, y_test), encoder, report
+
+
+def train(
+    model_version: str,
+    config: dict,
+    features=None,
+    params: dict = None,
+    data_version: str = None,
+    processed_dir=None,
+    cache: DatasetCache = None,
+    model_tag: str = "default",
+    hex_encoding: dict = None,
+):
+    """
+    Train, score on the test year and save the model with `save_all` and
+    its metrics with `save_metrics`. `hex_encoding` defaults to the
+    config's.
+
+    Returns:
+        (model, metrics, report)
+    """
+    training = config["training"]
+    features = features or list(config["features"])
+    target = config["target"]
+    params = params or config["params"]
+    data_version = data_version or training["data_version"]
+    encoder = hex_encoder(hex_encoding or config.get("hex_encoding"))
+
+    train_data, valid_data, category_map, (X_test, y_test), encoder, report = (
+        prepare_datasets(
+            data_version,
+            features,
+            target,
+            params,
+            training["test_year"],
+            processed_dir=processed_dir,
+            cache=cache,
+            encoder=encoder,
+        )
+    )
+
+    start = time.perf_counter()
+    model = train_booster(
+        params,
+        train_data,
+        valid_data,
+        num_boost_round=training["num_boost_round"],
+        early_stopping_rounds=training["early_stopping_rounds"],
+        log_period=training["log_period"],
+    )
+    report["train_seconds"] = round(time.perf_counter() - start, 2)
+    report["best_iteration"] = model.best_iteration
+
+    metrics = evaluate(y_test, model.predict(X_test))
+    save_all(
+        model,
+        category_map,
+        model_version,
+        model.feature_name(),
+        target,
+        model_tag=model_tag,
+        hex_encoder=encoder,
+        extra={
+            "training": {
+                "data_version": data_version,
+                "test_year": training["test_year"],
+                "params": params,
+                "best_iteration": model.best_iteration,
+                "report": report,
+            }
+        },
+    )
+    save_metrics(metrics, model_version)
+    return model, metrics, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model-version", required=True, help="folder under models/")
+    parser.add_argument("--model-tag", default="default")
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument("--data-version", help="default: training.data_version")
+    parser.add_argument("--processed-dir", help="default: data/processed/<version>")
+    parser.add_argument(
+        "--distance",
+        choices=sorted(DISTANCE_FEATURE_SETS),
+        help="use feature_config's features for this distance instead",
+    )
+    parser.add_argument(
+        "--set", action="append", metavar="NAME=VALUE", help="override a param"
+    )
+    parser.add_argument(
+        "--hex-encoding", choices=MODES, help="default: hex_encoding.mode"
+    )
+    parser.add_argument("--cache-dir", help="default: data/cache/lgb_datasets")
+    parser.add_argument(
+        "--no-cache", action="store_true", help="build Datasets from pandas"
+    )
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    params = {**config["params"], **parse_overrides(args.set)}
+    hex_encoding = config.get("hex_encoding")
+    if args.hex_encoding:
+        hex_encoding = {**(hex_encoding or {}), "mode": args.hex_encoding}
+    cache = None
+    if not args.no_cache:
+        cache = DatasetCache(args.cache_dir) if args.cache_dir else DatasetCache()
+
+    _, metrics, report = train(
+        args.model_version,
+        config,
+        features=resolve_features(config, args.distance),
+        params=params,
+        data_version=args.data_version,
+        processed_dir=args.processed_dir,
+        cache=cache,
+        model_tag=args.model_tag,
+        hex_encoding=hex_encoding,
+    )
+    print(json.dumps({"metrics": metrics, "timing": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+"""
+Continue boosting a saved model version on new months of data.
+
+    python -m src.models.warm_start --base-version v2_h --model-version v2_h_2025_07
+    python -m src.models.warm_start --base-version v2_h --model-version v2_h_2025_07 \\
+        --months 2025-06 --valid-months 2025-07 --compare
+
+The base version's model.txt is passed to LightGBM as init_model, so the
+new version keeps every base tree and adds up to `warm_start.num_boost_round`
+more, fitted to the residuals on the new months only. Without --months these
+are the months after the data the base was trained on (its year split, or
+the months of an earlier warm start) up to the validation months, by default
+the last month of the prepared data.
+
+The base category map is extended with hexes and body/axle types it has not
+seen, appended after the existing categories so the base trees keep their
+codes (`extend_category_map`). A base trained with hex encodings
+(utils/hex_encoding.py) keeps its lookups: the new trees are fitted on the
+same encodings, and new hexes back off to their parent cells. The new
+version is saved with `save_all`, and its model_config.json records the
+lineage: base version, ancestors, months added, rounds added and categories
+added.
+
+--compare also retrains from scratch on every month up to the last new one,
+with the `training` schedule, and reports time and validation metrics of the
+base, warm-started and retrained models.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(PROJECT_ROOT))
+
+from src.models.backtest import load_months, period_labels
+from src.models.train import binning_params, categorical_features, parse_overrides
+from utils.dataset_utils import load_prepared_dataset
+from utils.hex_encoding import HexEncoder
+from utils.model_bundle import load_model_bundle
+from utils.model_utils import (
+    CONFIG_PATH,
+    apply_category_map,
+    evaluate,
+    extend_category_map,
+    load_config,
+    prepare_categorical,
+    project_root,
+    save_all,
+    save_metrics,
+    train_booster,
+)
+
+
+def load_base_model(version: str):
+    """
+    Booster, category map, config and hex encoder of a saved version,
+    from its model.bundle if it has one.
+
+    Returns:
+        (booster, category_map, model_config, hex encoder or None)
+    """
+    bundle = load_model_bundle(project_root / "models" / version)
+    booster, category_map = bundle.model, bundle.category_map
+    model_config = bundle.config
+
+    # the trees split on category codes, so the map must be the one the
+    # booster was trained with
+    expected = [category_map[col] for col in model_config["categorical"]]
+    if booster.pandas_categorical != expected:
+        raise ValueError(
+            f"Categories of {version} do not match its booster's categories"
+        )
+    return booster, category_map, model_config, bundle.hex_encoder
+
+
+def raw_features(features, encoder: HexEncoder = None) -> list:
+    """The prepared dataset's columns behind a model's `features`."""
+    if encoder is None:
+        return list(features)
+    rest = [col for col in features if col not in encoder.features]
+    return rest + ["origin_hex", "destination_hex"]
+
+
+def available_months(data_version: str, processed_dir=None) -> list:
+    df = load_prepared_dataset(
+        data_version, columns=["year", "month"], processed_dir=processed_dir
+    )
+    return sorted(set(period_labels(df["year"], df["month"]).tolist()))
+
+
+def data_through(model_config: dict) -> str:
+    """Last month ("YYYY-MM") a saved version was trained on."""
+    lineage = model_config.get("lineage")
+    if lineage:
+        return lineage["data_through"]
+    test_year = model_config.get("training", {}).get("test_year")
+    if test_year is None:
+        raise ValueError(
+            f"{model_config['version']} does not record its training data; "
+            "pass the months to train on"
+        )
+    return f"{test_year - 1}-12"
+
+
+def full_retrain(
+    data_version: str,
+    features,
+    target: str,
+    params: dict,
+    train_months,
+    valid_months,
+    schedule: dict,
+    processed_dir=None,
+    encoder: HexEncoder = None,
+):
+    """
+    A model trained from scratch on `train_months`, early-stopped on
+    `valid_months`, for comparison with a warm start. `features` are the
+    prepared dataset's; with `encoder`, a fresh encoder with its settings
+    replaces the hex columns.
+
+    Returns:
+        (model, metrics, seconds)
+    """
+    start = time.perf_counter()
+    df = load_months(
+        data_version,
+        list(features) + [target],
+        list(train_months) + list(valid_months),
+        processed_dir,
+    )
+    is_valid = np.isin(period_labels(df["year"], df["month"]), valid_months)
+    X_train, X_valid = df.loc[~is_valid, features], df.loc[is_valid, features]
+    y_train, y_valid = df.loc[~is_valid, target], df.loc[is_valid, target]
+    del df
+    if encoder is not None:
+        encoder = HexEncoder(**encoder.settings())
+        X_train = encoder.fit_transform(X_train, y_train)
+        X_valid = encoder.transform(X_valid)
+    X_train, X_valid, _ = prepare_categorical(
+        X_train.copy(), X_valid.copy(), categorical_features(list(X_train.columns))
+    )
+    train_data = lgb.Dataset(X_train, label=y_train, params=binning_params(params))
+    valid_data = lgb.Dataset(X_valid, label=y_valid, reference=train_data)
+    model = train_booster(params, train_data, valid_data, **schedule)
+    metrics = evaluate(y_valid, model.predict(X_valid))
+    return model, metrics, time.perf_counter() - start
+
+
+def warm_start(
+    base_version: str,
+    model_version: str,
+    config: dict,
+    months=None,
+    valid_months=None,
+    params: dict = None,
+    data_version: str = None,
+    processed_dir=None,
+    compare: bool = False,
+    model_tag: str = "default",
+):
+    """
+    Continue `base_version` on `months` and save it as `model_version`.
+
+    Returns:
+        (model, metrics, report): metrics on `valid_months`; with
+        `compare`, report["comparison"] has the base, warm-started and
+        fully retrained models' metrics and seconds.
+    """
+    settings, training = config["warm_start"], config["training"]
+    booster, category_map, base_config, encoder = load_base_model(base_version)
+    features, target = base_config["input_features"], base_config["target"]
+    columns = raw_features(features, encoder)
+    base_training = base_config.get("training", {})
+    data_version = (
+        data_version or base_training.get("data_version") or training["data_version"]
+    )
+    # the base's own params unless overridden; learning rate and tree shape
+    # may differ from the base's without harm
+    params = {**base_training.get("params", config["params"]), **(params or {})}
+
+    available = available_months(data_version, processed_dir)
+    valid_months = list(valid_months or available[-settings["valid_months"] :])
+    if months is None:
+        through = data_through(base_config)
+        months = [m for m in available if through < m < valid_months[0]]
+    months = sorted(months)
+    if not months:
+        raise ValueError(
+            f"No new months to train {base_version} on before {valid_months[0]}"
+        )
+    if set(months) & set(valid_months):
+        raise ValueError("Training and validation months overlap")
+
+    start = time.perf_counter()
+    df = load_months(
+        data_version, columns + [target], months + valid_months, processed_dir
+    )
+    is_valid = np.isin(period_labels(df["year"], df["month"]), valid_months)
+    extended, added = extend_category_map(category_map, df.loc[~is_valid])
+    X = df[columns].copy()
+    if encoder is not None:
+        X = encoder.transform(X)[features]
+    X = apply_category_map(X, extended)
+    X_train, X_valid = X[~is_valid], X[is_valid]
+    y_train, y_valid = df.loc[~is_valid, target], df.loc[is_valid, target]
+    del df, X
+    report = {
+        "train_rows": len(X_train),
+        "valid_rows": len(X_valid),
+        "data_load_seconds": round(time.perf_counter() - start, 2),
+    }
+
+    train_start = time.perf_counter()
+    # built from the frames: init_model scores their raw rows
+    train_data = lgb.Dataset(X_train, label=y_train, params=binning_params(params))
+    valid_data = lgb.Dataset(X_valid, label=y_valid, reference=train_data)
+    model = train_booster(
+        params,
+        train_data,
+        valid_data,
+        num_boost_round=settings["num_boost_round"],
+        early_stopping_rounds=settings["early_stopping_rounds"],
+        log_period=training["log_period"],
+        init_model=booster,
+    )
+    report["train_seconds"] = round(time.perf_counter() - train_start, 2)
+    report["seconds"] = round(time.perf_counter() - start, 2)
+
+    metrics = evaluate(y_valid, model.predict(X_valid))
+    base_iterations = booster.current_iteration()
+    lineage = {
+        "mode": "warm_start",
+        "base_version": base_version,
+        "ancestors": [base_version]
+        + base_config.get("lineage", {}).get("ancestors", []),
+        "base_iterations": base_iterations,
+        "added_iterations": model.best_iteration - base_iterations,
+        "months": months,
+        "valid_months": valid_months,
+        "data_through": months[-1],
+        "new_categories": added,
+    }
+
+    if compare:
+        _, retrain_metrics, retrain_s = full_retrain(
+            data_version,
+            columns,
+            target,
+            params,
+            [m for m in available if m <= months[-1]],
+            valid_months,
+            {
+                "num_boost_round": training["num_boost_round"],
+                "early_stopping_rounds": training["early_stopping_rounds"],
+                "log_period": training["log_period"],
+            },
+            processed_dir,
+            encoder,
+        )
+        # unseen categories go where the base trees send missing values
+        base_X = apply_category_map(X_valid.copy(), category_map)
+        report["comparison"] = {
+            "base": {"metrics": evaluate(y_valid, booster.predict(base_X))},
+            "warm_start": {"metrics": metrics, "seconds": report["seconds"]},
+            "full_retrain": {
+                "metrics": retrain_metrics,
+                "seconds": round(retrain_s, 2),
+            },
+        }
+
+    save_all(
+        model,
+        extended,
+        model_version,
+        features,
+        target,
+        model_tag=model_tag,
+        hex_encoder=encoder,
+        extra={
+            "training": {
+                "data_version": data_version,
+                "params": params,
+                "best_iteration": model.best_iteration,
+                "report": report,
+            },
+            "lineage": lineage,
+        },
+    )
+    save_metrics(metrics, model_version)
+    return model, metrics, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-version", required=True, help="folder under models/")
+    parser.add_argument("--model-version", required=True, help="folder under models/")
+    parser.add_argument("--model-tag", default="default")
+    parser.add_argument("--config", default=str(CONFIG_PATH))
+    parser.add_argument(
+        "--months",
+        nargs="+",
+        help="YYYY-MM to train on; default: months after the base's",
+    )
+    parser.add_argument(
+        "--valid-months", nargs="+", help="default: the last warm_start.valid_months"
+    )
+    parser.add_argument("--data-version", help="default: the base's data version")
+    parser.add_argument("--processed-dir", help="default: data/processed/<version>")
+    parser.add_argument(
+        "--set", action="append", metavar="NAME=VALUE", help="override a param"
+    )
+    parser.add_argument(
+        "--compare", action="store_true", help="also retrain from scratch and compare"
+    )
+    args = parser.parse_args()
+
+    _, metrics, report = warm_start(
+        args.base_version,
+        args.model_version,
+        load_config(args.config),
+        months=args.months,
+        valid_months=args.valid_months,
+        params=parse_overrides(args.set),
+        data_version=args.data_version,
+        processed_dir=args.processed_dir,
+        compare=args.compare,
+        model_tag=args.model_tag,
+    )
+    print(json.dumps({"metrics": metrics, "warm_start": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
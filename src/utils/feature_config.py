@@ -25,3 +25,28 @@ DISTANCE_FEATURE_SETS = {
 CATEGORICAL_COLS = ["origin_hex", "destination_hex", "lane_hex", "body_type"]
 
 TARGET = "log_base_price"
+
+# Compact dtypes for frames loaded for training and evaluation (applied by
+# utils.dataset_utils.compact_dtypes). Integer features are downcast only
+# when every value fits; other numeric features become float32, which is
+# what LightGBM bins them from anyway. The target stays float64.
+INTEGER_FEATURE_DTYPES = {
+    "hex_ring_distance": "int16",
+    "no_of_wheels": "int8",
+    "length_ft": "int8",
+    "is_multi_axle": "int8",
+    "day": "int8",
+    "month": "int8",
+    "year": "int16",
+}
+EXTRA_CATEGORICAL_COLS = ["axle_type"]
+
+COLUMN_DTYPES = {
+    col: (
+        "category"
+        if col in CATEGORICAL_COLS
+        else INTEGER_FEATURE_DTYPES.get(col, "float32")
+    )
+    for col in BASE_FEATURES + sum(DISTANCE_FEATURE_SETS.values(), [])
+}
+COLUMN_DTYPES.update({col: "category" for col in EXTRA_CATEGORICAL_COLS})
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+from utils.hex_encoding import HexEncoder
+
+DELHI = "883da11429fffff"
+# same digits, base cells 48 and 56: apart only in the base cell's high bit
+ORIGIN, OTHER_BASE_CELL = "88608b0b6bfffff", "88708b0b6bfffff"
+
+
+def test_lanes_from_other_base_cells_do_not_share_keys():
+    encoder = HexEncoder("frequency", resolution=8, parent_resolutions=[])
+    encoder.fit(pd.DataFrame({"origin_hex": [ORIGIN] * 10, "destination_hex": DELHI}))
+
+    encoded = encoder.encode([ORIGIN, OTHER_BASE_CELL], [DELHI, DELHI])
+    assert encoded["origin_hex_count"].tolist() == [10, 0]
+    assert encoded["lane_hex_count"].tolist() == [10, 0]
+
+
+def test_resolutions_whose_lane_keys_overflow_are_refused():
+    with pytest.raises(ValueError, match="resolution 8"):
+        HexEncoder("frequency", resolution=9, parent_resolutions=[])
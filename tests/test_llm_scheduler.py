@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from utils.llm_scheduler import GeminiScheduler, TokenBucket
+
+
+class Response:
+    status_code = 200
+    headers = {}
+
+
+def scheduler(rpm=60, burst=1):
+    return GeminiScheduler(
+        requests_per_minute=rpm,
+        burst=burst,
+        max_retries=0,
+        backoff_base=0.1,
+        backoff_max=1.0,
+    )
+
+
+def test_cancelled_waiters_give_their_tokens_back():
+    sched = scheduler()
+
+    async def send():
+        return Response()
+
+    async def run():
+        await sched.acall(send)  # uses the one burst token
+        waiters = [asyncio.ensure_future(sched.acall(send)) for _ in range(300)]
+        await asyncio.sleep(0.05)
+        for task in waiters:
+            task.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+    asyncio.run(run())
+    wait, _ = sched.bucket.reserve()
+    assert wait <= 1.0 / sched.rate + 0.1
+    assert sched.stats["attempts"] == 1
+
+
+def test_deadline_timeouts_give_their_tokens_back():
+    sched = scheduler()
+
+    async def send():
+        return Response()
+
+    async def run():
+        await sched.acall(send)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(sched.acall(send), 0.05) for _ in range(50)),
+            return_exceptions=True,
+        )
+        assert all(isinstance(r, asyncio.TimeoutError) for r in results)
+
+    asyncio.run(run())
+    wait, _ = sched.bucket.reserve()
+    assert wait <= 1.0 / sched.rate + 0.1
+
+
+def test_release_ignores_tokens_written_off_by_a_pause():
+    bucket = TokenBucket(rate=1.0, capacity=5)
+    for _ in range(5):
+        bucket.reserve()
+    _, epoch = bucket.reserve()
+    bucket.pause(0.0)
+    bucket.release(epoch)
+    assert bucket.tokens <= 1
+
+
+def test_sync_waiter_is_paced():
+    sched = scheduler(rpm=600, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        sched.call(Response)
+    assert time.monotonic() - start >= 0.18
@@ -0,0 +1,61 @@
+import asyncio
+
+from utils import llm_utils
+from utils.circuit_breaker import CLOSED, CircuitBreaker
+from utils.constants import CONSTANTS
+from utils.llm_scheduler import GeminiScheduler
+
+
+class Response:
+    status_code = 200
+    headers = {}
+    text = "{}"
+
+    def json(self):
+        return {}
+
+
+class HealthyTransport:
+    name = "fake"
+
+    def send(self, url, payload):
+        return Response()
+
+    async def asend(self, url, payload):
+        await asyncio.sleep(0.001)
+        return Response()
+
+
+def test_queue_timeouts_do_not_open_the_breaker(monkeypatch):
+    breaker = CircuitBreaker(
+        "test",
+        window=20,
+        min_calls=5,
+        failure_rate=0.5,
+        slow_call_seconds=30,
+        open_seconds=30,
+        half_open_calls=1,
+    )
+    # one call a second: most of 30 concurrent calls time out in the queue
+    scheduler = GeminiScheduler(
+        requests_per_minute=60,
+        burst=1,
+        max_retries=0,
+        backoff_base=0.1,
+        backoff_max=1.0,
+    )
+    monkeypatch.setattr(llm_utils, "gemini_breaker", breaker)
+    monkeypatch.setattr(llm_utils, "gemini_scheduler", scheduler)
+    monkeypatch.setattr(llm_utils, "get_transport", HealthyTransport)
+    monkeypatch.setattr(CONSTANTS, "GEMINI_DEADLINE", 0.3)
+
+    async def run():
+        return await asyncio.gather(
+            *(llm_utils.post_gemini_async({}) for _ in range(30)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert sum(isinstance(r, asyncio.TimeoutError) for r in results) >= 25
+    assert breaker.state == CLOSED
+    assert not any(breaker._outcomes)
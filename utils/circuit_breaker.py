@@ -0,0 +1,177 @@
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from utils.constants import CONSTANTS
+from utils.llm_scheduler import RETRYABLE_STATUS
+from utils.metrics import metrics
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+# numeric encoding for the state gauge
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Gemini while the breaker is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} circuit open, retry in {math.ceil(retry_after)}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Fails fast once a dependency looks unhealthy.
+
+    Outcomes of the last `window` calls are kept; a call (one HTTP attempt,
+    wrapped inside the scheduler so rate-limit queueing never counts) fails
+    if it raises, ends with a retryable status (429/5xx) or takes longer
+    than `slow_call_seconds`. A call cancelled by its caller is not an
+    outcome unless it had already run longer than a slow call. With at least `min_calls`
+    outcomes and a failure rate of `failure_rate` or more the breaker opens
+    and rejects calls for `open_seconds`. It then lets `half_open_calls`
+    trial calls through: if they all succeed it closes, any failure opens
+    it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_seconds: float,
+        open_seconds: float,
+        half_open_calls: int,
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # True = failed
+        self._opened_at = 0.0
+        self._trials = 0  # trial calls let through while half-open
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+        metrics.set("circuit_breaker_state", STATE_VALUES[CLOSED], breaker=name)
+
+    def _transition(self, state: str):
+        previous, self.state = self.state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state in (OPEN, HALF_OPEN):
+            self._trials = self._trial_successes = 0
+        if state == CLOSED:
+            self._outcomes.clear()
+        metrics.set("circuit_breaker_state", STATE_VALUES[state], breaker=self.name)
+        metrics.inc(
+            "circuit_breaker_transitions_total",
+            breaker=self.name,
+            from_state=previous,
+            to_state=state,
+        )
+        print(f"Circuit '{self.name}': {previous} -> {state}")
+
+    def allow(self):
+        """Reserve a call, or raise `CircuitOpenError`."""
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self._opened_at + self.open_seconds - time.monotonic()
+                if remaining > 0:
+                    metrics.inc("circuit_breaker_rejected_total", breaker=self.name)
+                    raise CircuitOpenError(self.name, remaining)
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    metrics.inc("circuit_breaker_rejected_total", breaker=self.name)
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._trials += 1
+
+    def release(self):
+        """Give back a reservation whose call never completed (cancelled)."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def record(self, failed: bool, seconds: float):
+        failed = failed or seconds > self.slow_call_seconds
+        with self._lock:
+            metrics.inc(
+                "circuit_breaker_calls_total",
+                breaker=self.name,
+                outcome="failure" if failed else "success",
+            )
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._transition(OPEN)
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._transition(CLOSED)
+                return
+            if self.state == OPEN:
+                # a call let through before the breaker opened
+                return
+
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_calls:
+                rate = sum(self._outcomes) / len(self._outcomes)
+                if rate >= self.failure_rate:
+                    self._transition(OPEN)
+
+    @staticmethod
+    def _is_failure(response) -> bool:
+        return response.status_code in RETRYABLE_STATUS
+
+    def call(self, send: Callable[[], object]):
+        """Run a blocking call returning a response through the breaker."""
+        self.allow()
+        start = time.monotonic()
+        try:
+            response = send()
+        except Exception:
+            self.record(True, time.monotonic() - start)
+            raise
+        self.record(self._is_failure(response), time.monotonic() - start)
+        return response
+
+    async def acall(self, send: Callable[[], Awaitable]):
+        """Async counterpart of `call`."""
+        self.allow()
+        start = time.monotonic()
+        try:
+            response = await send()
+        except asyncio.CancelledError:
+            seconds = time.monotonic() - start
+            if seconds > self.slow_call_seconds:
+                # cancelled (e.g. at the deadline) while Gemini was slow
+                self.record(True, seconds)
+            else:
+                # the caller went away; says nothing about Gemini's health
+                self.release()
+            raise
+        except Exception:
+            self.record(True, time.monotonic() - start)
+            raise
+        self.record(self._is_failure(response), time.monotonic() - start)
+        return response
+
+
+# Shared by every Gemini caller in the process
+gemini_breaker = CircuitBreaker(
+    "gemini",
+    window=CONSTANTS.GEMINI_BREAKER_WINDOW,
+    min_calls=CONSTANTS.GEMINI_BREAKER_MIN_CALLS,
+    failure_rate=CONSTANTS.GEMINI_BREAKER_FAILURE_RATE,
+    slow_call_seconds=CONSTANTS.GEMINI_BREAKER_SLOW_CALL,
+    open_seconds=CONSTANTS.GEMINI_BREAKER_OPEN_SECONDS,
+    half_open_calls=CONSTANTS.GEMINI_BREAKER_HALF_OPEN_CALLS,
+)
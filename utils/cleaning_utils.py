@@ -1,6 +1,51 @@
+import numpy as np
+import pandas as pd
+
+
+def normalize_raw_truck(raw):
+    return raw.replace(" ", "").upper()
+
+
 def iqr_filter(df, col, k=1.5):
     q1 = df[col].quantile(0.25)
     q3 = df[col].quantile(0.75)
     iqr = q3 - q1
     upper_limit = q3 + k * iqr
     return df[df[col] <= upper_limit]
+
+
+def round_like_python(values, ndigits=2):
+    """
+    Vectorized `round(x, ndigits)` that agrees with Python's built-in.
+
+    `np.round` scales, rounds and unscales, which can land on the other side
+    of a tie than Python's correctly rounded `round`; the few values near a
+    tie are re-rounded one by one.
+    """
+    values = np.asarray(values, dtype=float)
+    scaled = values * 10**ndigits
+    out = np.round(scaled) / 10**ndigits
+    near_tie = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_tie):
+        out[i] = round(float(values[i]), ndigits)
+    return out
+
+
+def factorize_rows(frame):
+    """
+    Codes identifying each distinct row of `frame` (NaN counts as a value),
+    numbered in order of first appearance, plus the position of each first
+    appearance. Much cheaper than groupby/drop_duplicates on object columns.
+    """
+    codes = np.zeros(len(frame), dtype=np.int64)
+    for col in frame.columns:
+        col_codes, uniques = pd.factorize(frame[col], use_na_sentinel=False)
+        codes, _ = pd.factorize(codes * len(uniques) + col_codes)
+    first = pd.Series(codes).drop_duplicates().index.to_numpy()
+    return codes, first
+
+
+def map_distinct(series, fn):
+    """Apply a column-wise `fn` to each distinct value only, then broadcast."""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    return fn(pd.Series(uniques, dtype=series.dtype)).to_numpy()[codes]
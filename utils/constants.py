@@ -13,4 +13,57 @@ class CONSTANTS:
 
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
     BASE_PROMPT = os.getenv("GEMINI_BASE_PROMPT")
-    GEMINI_URL = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+    GEMINI_URL = os.getenv(
+        "GEMINI_URL",
+        f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}",
+    )
+
+    # Gemini rate limiting (shared by the API and batch cleaner)
+    GEMINI_RPM = float(os.getenv("GEMINI_RPM", 60))
+    GEMINI_BURST = int(os.getenv("GEMINI_BURST", 5))
+    GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 4))
+    GEMINI_BACKOFF_BASE = float(os.getenv("GEMINI_BACKOFF_BASE", 0.5))
+    GEMINI_BACKOFF_MAX = float(os.getenv("GEMINI_BACKOFF_MAX", 30))
+
+    # Gemini HTTP timeouts (s); the deadline bounds one call including retries
+    GEMINI_CONNECT_TIMEOUT = float(os.getenv("GEMINI_CONNECT_TIMEOUT", 5))
+    GEMINI_READ_TIMEOUT = float(os.getenv("GEMINI_READ_TIMEOUT", 20))
+    GEMINI_DEADLINE = float(os.getenv("GEMINI_DEADLINE", 45))
+    GEMINI_MAX_CONNECTIONS = int(os.getenv("GEMINI_MAX_CONNECTIONS", 50))
+
+    # Gemini circuit breaker: opens when FAILURE_RATE of the last WINDOW calls
+    # failed or took longer than SLOW_CALL seconds, then lets HALF_OPEN_CALLS
+    # trial calls through after OPEN_SECONDS
+    GEMINI_BREAKER_WINDOW = int(os.getenv("GEMINI_BREAKER_WINDOW", 20))
+    GEMINI_BREAKER_MIN_CALLS = int(os.getenv("GEMINI_BREAKER_MIN_CALLS", 10))
+    GEMINI_BREAKER_FAILURE_RATE = float(os.getenv("GEMINI_BREAKER_FAILURE_RATE", 0.5))
+    GEMINI_BREAKER_SLOW_CALL = float(os.getenv("GEMINI_BREAKER_SLOW_CALL", 30))
+    GEMINI_BREAKER_OPEN_SECONDS = float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", 30))
+    GEMINI_BREAKER_HALF_OPEN_CALLS = int(os.getenv("GEMINI_BREAKER_HALF_OPEN_CALLS", 3))
+
+    # Gemini pricing (USD per 1M tokens) for LLM cost accounting, and how
+    # often the API prints a usage summary (s, 0 disables)
+    GEMINI_INPUT_PRICE_PER_M = float(os.getenv("GEMINI_INPUT_PRICE_PER_M", 0.10))
+    GEMINI_OUTPUT_PRICE_PER_M = float(os.getenv("GEMINI_OUTPUT_PRICE_PER_M", 0.40))
+    LLM_USAGE_LOG_INTERVAL = float(os.getenv("LLM_USAGE_LOG_INTERVAL", 300))
+
+    # Gemini transport: live | record | replay (record/replay use the cassette)
+    GEMINI_TRANSPORT = os.getenv("GEMINI_TRANSPORT", "live")
+    GEMINI_CASSETTE = os.getenv("GEMINI_CASSETTE", "data/cassettes/gemini.jsonl")
+
+    # auto_match_headers fingerprint cache (file persistence is optional)
+    HEADER_CACHE_SIZE = int(os.getenv("HEADER_CACHE_SIZE", 1000))
+    HEADER_CACHE_PATH = os.getenv("HEADER_CACHE_PATH")
+
+    # Truck-name index built from previous cleaning runs; /api/clean_truck
+    # answers from the closest known name when similarity clears the threshold
+    TRUCK_INDEX_GLOB = os.getenv(
+        "TRUCK_INDEX_GLOB", "src/data/cleaned_truck_outputs*.json"
+    )
+    TRUCK_MATCH_THRESHOLD = float(os.getenv("TRUCK_MATCH_THRESHOLD", 0.85))
+    # looser threshold used while the Gemini circuit is open
+    TRUCK_FALLBACK_THRESHOLD = float(os.getenv("TRUCK_FALLBACK_THRESHOLD", 0.6))
+
+    # Overall deadline (s) for /api/bulk_clean_truck/stream; unfinished items
+    # are returned as timed-out errors
+    BULK_CLEAN_DEADLINE = float(os.getenv("BULK_CLEAN_DEADLINE", 120))
@@ -1,4 +1,5 @@
 import numpy as np
+from utils.cleaning_utils import round_like_python
 
 
 def compute_fuel_price_per_km(fuel_price, distance):
@@ -11,3 +12,23 @@ def compute_estimated_fuel_cost(fuel_price, distance, capacity):
     if all([fuel_price, distance, capacity]) and capacity > 0:
         return round(fuel_price * distance * capacity, 2)
     return np.nan
+
+
+def compute_fuel_price_per_km_vectorized(fuel_price, distance):
+    """Column-wise `compute_fuel_price_per_km`."""
+    fuel_price = np.asarray(fuel_price, dtype=float)
+    distance = np.asarray(distance, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        per_km = round_like_python(fuel_price / distance, 2)
+    return np.where(distance > 0, per_km, np.nan)
+
+
+def compute_estimated_fuel_cost_vectorized(fuel_price, distance, capacity):
+    """Column-wise `compute_estimated_fuel_cost`."""
+    fuel_price = np.asarray(fuel_price, dtype=float)
+    distance = np.asarray(distance, dtype=float)
+    capacity = np.asarray(capacity, dtype=float)
+    # zeros are falsy in the scalar version; NaNs are truthy and propagate
+    valid = (fuel_price != 0) & (distance != 0) & (capacity > 0)
+    cost = round_like_python(fuel_price * distance * capacity, 2)
+    return np.where(valid, cost, np.nan)
@@ -0,0 +1,275 @@
+import hashlib
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.utils.feature_config import COLUMN_DTYPES
+from utils.stage_cache import file_digest
+
+project_root = Path(__file__).resolve().parents[1]
+PROCESSED_DIR = project_root / "data" / "processed"
+
+# Prepared datasets are split into one directory per month
+# (year=2024/month=7/...), so a new month only touches its own directory
+PARTITION_COLUMNS = ["year", "month"]
+PARTITION_SCHEMA = pa.schema([("year", pa.int32()), ("month", pa.int32())])
+
+# Repetitive strings, stored once per row group as a Parquet dictionary and
+# read back as pandas categoricals. lane_identifier stays plain: its long
+# labels overflow the dictionary page and made reads ~3x slower.
+DICTIONARY_COLUMNS = [
+    "origin_hex",
+    "destination_hex",
+    "lane_hex",
+    "axle_type",
+    "body_type",
+]
+
+# Rows buffered per row group when writing a partitioned dataset. Without a
+# minimum each partition file gets one tiny row group per input batch, and
+# every row group repeats its dictionaries on read.
+ROW_GROUP_ROWS = 1 << 20
+
+
+def dataset_base_name(version: str) -> str:
+    return f"rpt_prepared_lightgbm_{version}"
+
+
+def parquet_path(version: str, processed_dir=None) -> Path:
+    processed_dir = Path(processed_dir or PROCESSED_DIR / version)
+    return processed_dir / f"{dataset_base_name(version)}.parquet"
+
+
+def csv_path(version: str, processed_dir=None) -> Path:
+    processed_dir = Path(processed_dir or PROCESSED_DIR / version)
+    return processed_dir / f"{dataset_base_name(version)}.csv"
+
+
+def write_parquet_dataset(df: pd.DataFrame, path, partition_cols=PARTITION_COLUMNS):
+    """
+    Write `df` as a hive-partitioned Parquet directory, replacing whatever
+    was there. String columns in DICTIONARY_COLUMNS are dictionary-encoded,
+    numeric columns keep their dtypes.
+    """
+    path = Path(path)
+    table = pa.Table.from_pandas(_to_storage(df), preserve_index=False)
+
+    tmp = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    pq.write_to_dataset(
+        table,
+        tmp,
+        partition_cols=list(partition_cols),
+        basename_template="part-{i}.parquet",
+        use_dictionary=[c for c in DICTIONARY_COLUMNS if c in df.columns],
+        write_statistics=True,
+        compression="zstd",
+        min_rows_per_group=ROW_GROUP_ROWS,
+        max_rows_per_group=ROW_GROUP_ROWS,
+    )
+    # swap the finished directory in so readers never see a partial write
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+    return path
+
+
+def partition_dir(path, values: dict) -> Path:
+    """Directory of one partition, e.g. <path>/year=2025/month=3."""
+    return Path(path).joinpath(*(f"{col}={values[col]}" for col in PARTITION_COLUMNS))
+
+
+def write_parquet_partition(df: pd.DataFrame, path, values: dict):
+    """
+    Replace one partition of a dataset written by `write_parquet_dataset`
+    with `df` (whose partition columns must all equal `values`). An empty
+    frame removes the partition.
+    """
+    target = partition_dir(path, values)
+    if df.empty:
+        remove_parquet_partition(path, values)
+        return target
+
+    table = pa.Table.from_pandas(_to_storage(df), preserve_index=False)
+    # partition values live in the directory names; keep the pandas
+    # metadata of the full frame so reads restore the column order
+    metadata = table.schema.metadata
+    table = table.drop_columns(PARTITION_COLUMNS).replace_schema_metadata(metadata)
+
+    os.makedirs(target, exist_ok=True)
+    tmp = target / "part-0.parquet.tmp"
+    pq.write_table(
+        table,
+        tmp,
+        use_dictionary=[c for c in DICTIONARY_COLUMNS if c in df.columns],
+        write_statistics=True,
+        compression="zstd",
+    )
+    for stale in target.glob("*.parquet"):
+        os.remove(stale)
+    os.replace(tmp, target / "part-0.parquet")
+    return target
+
+
+def remove_parquet_partition(path, values: dict):
+    target = partition_dir(path, values)
+    shutil.rmtree(target, ignore_errors=True)
+    # drop the year directory too once its last month is gone
+    parent = target.parent
+    if parent != Path(path) and parent.exists() and not any(parent.iterdir()):
+        parent.rmdir()
+
+
+def _to_storage(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy(deep=False)
+    for col in DICTIONARY_COLUMNS:
+        if col in out.columns and out[col].dtype == object:
+            out[col] = out[col].astype("category")
+    return out
+
+
+def read_parquet_dataset(
+    path, columns=None, filters=None, memory_map: bool = True
+) -> pd.DataFrame:
+    """
+    Read a partitioned Parquet dataset.
+
+    Args:
+        path: Dataset directory written by `write_parquet_dataset`.
+        columns: Only read these columns (others are never decoded).
+        filters: pyarrow filters, e.g. [("year", "==", 2025)]; partitions
+            that cannot match are skipped without being opened.
+        memory_map: Map the files instead of reading them into buffers.
+    """
+    table = pq.read_table(
+        path,
+        columns=list(columns) if columns is not None else None,
+        filters=filters,
+        memory_map=memory_map,
+        partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+    )
+    schema = table.schema
+    # release each Arrow column once converted, capping peak memory
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    del table
+    # Arrow's allocator keeps freed decode buffers for reuse; hand them back
+    # before the caller builds anything large on top of the frame
+    pa.default_memory_pool().release_unused()
+    # the partition column comes back last; restore the written order
+    order = columns or _written_order(schema)
+    return df[[c for c in order if c in df.columns]]
+
+
+def _written_order(schema: pa.Schema):
+    pandas_meta = schema.pandas_metadata or {}
+    names = [c["name"] for c in pandas_meta.get("columns", []) if c["name"]]
+    return names or schema.names
+
+
+def load_prepared_dataset(
+    version: str, columns=None, filters=None, processed_dir=None, compact=True
+) -> pd.DataFrame:
+    """
+    Load a prepared dataset version, projecting `columns` and applying
+    `filters` (pyarrow syntax). Versions written before the Parquet format
+    fall back to their CSV, with the same projection and filters applied
+    after reading. With `compact`, columns are downcast to COLUMN_DTYPES
+    (see `compact_dtypes`).
+    """
+    path = parquet_path(version, processed_dir)
+    if path.exists():
+        df = read_parquet_dataset(path, columns=columns, filters=filters)
+    else:
+        legacy = csv_path(version, processed_dir)
+        if not legacy.exists():
+            raise FileNotFoundError(
+                f"No prepared dataset for version {version}: {path}"
+            )
+        df = pd.read_csv(legacy, usecols=columns)
+        for col, op, value in filters or []:
+            df = df[_compare(df[col], op, value)]
+        if columns is not None:
+            df = df[list(columns)]
+    return compact_dtypes(df) if compact else df
+
+
+def prepared_dataset_digest(version: str, processed_dir=None) -> str:
+    """
+    sha256 over the files of a prepared dataset version (every Parquet
+    part, or the legacy CSV), for keying anything derived from it.
+    """
+    path = parquet_path(version, processed_dir)
+    if path.exists():
+        files = sorted(path.rglob("*.parquet"))
+    else:
+        path = csv_path(version, processed_dir)
+        if not path.exists():
+            raise FileNotFoundError(
+                f"No prepared dataset for version {version}: {path}"
+            )
+        files = [path]
+
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(str(file.relative_to(path.parent)).encode("utf-8"))
+        digest.update(file_digest(file).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def compact_dtypes(df: pd.DataFrame, dtypes=COLUMN_DTYPES) -> pd.DataFrame:
+    """
+    Downcast the columns of `df` named in `dtypes` (see
+    src/utils/feature_config.py), in place. Integer columns are left alone
+    if any value is missing or out of range for the smaller type, float
+    columns if the cast would merge distinct values: LightGBM bins from
+    distinct values, so a merge changes the trained model.
+    Categories are sorted, as `astype("category")` on strings would give.
+    """
+    for col, dtype in dtypes.items():
+        if col not in df.columns or df[col].dtype == dtype:
+            continue
+        values = df[col]
+        if dtype == "category":
+            values = values.astype("category")
+            categories = values.cat.categories
+            if not categories.is_monotonic_increasing:
+                values = values.cat.reorder_categories(categories.sort_values())
+            df[col] = values
+        elif not pd.api.types.is_numeric_dtype(values):
+            continue
+        elif pd.api.types.is_float_dtype(dtype):
+            if _keeps_distinct(values, dtype):
+                df[col] = values.astype(dtype)
+        elif values.notna().all() and _fits(values, np.iinfo(dtype)):
+            df[col] = values.astype(dtype)
+    return df
+
+
+def _keeps_distinct(values: pd.Series, dtype) -> bool:
+    unique = np.unique(values.to_numpy(dtype="float64", na_value=np.nan))
+    cast = unique[~np.isnan(unique)].astype(dtype)
+    return bool((np.diff(cast) > 0).all())
+
+
+def _fits(values: pd.Series, info) -> bool:
+    return values.empty or (values.min() >= info.min and values.max() <= info.max)
+
+
+def _compare(series: pd.Series, op: str, value):
+    ops = {
+        "==": series.eq,
+        "!=": series.ne,
+        "<": series.lt,
+        "<=": series.le,
+        ">": series.gt,
+        ">=": series.ge,
+        "in": series.isin,
+    }
+    if op not in ops:
+        raise ValueError(f"Unsupported filter operator: {op}")
+    return ops[op](value)
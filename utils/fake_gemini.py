@@ -0,0 +1,158 @@
+"""
+Local stand-in for the Gemini generateContent endpoint, for offline load
+tests and benchmarks. Latency, error rate and throttling are configurable:
+
+    python -m utils.fake_gemini --port 8001 --latency 0.8 --jitter 0.4 \
+        --error-rate 0.05 --rpm 600
+    GEMINI_URL=http://localhost:8001/generate make run-api
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from utils.header_matcher import REQUIRED_FIELDS, match_headers_locally
+from utils.llm_scheduler import TokenBucket
+
+RAW_TRUCK_PATTERN = re.compile(r'Raw Truck: "(.*)"\s*Output:\s*$', re.DOTALL)
+HEADERS_PATTERN = re.compile(r"Headers: (\[.*\])\nSample Rows: (\[.*\])\s*$", re.DOTALL)
+
+
+def fake_truck_answer(raw: str) -> dict:
+    """Rule-of-thumb truck code, shaped like the real model's JSON output."""
+    text = raw.lower()
+    capacity = re.search(r"(\d+(?:\.\d+)?)\s*(?:mt|ton|t\b)", text)
+    capacity = float(capacity.group(1)) if capacity else 9.0
+    length = re.search(r"(\d+)\s*(?:ft|feet)", text)
+    length = int(length.group(1)) if length else 20
+
+    if "open" in text:
+        body = "OB"
+    elif "container" in text:
+        body = "CN"
+    elif "reefer" in text or "°" in text:
+        body = "RF"
+    else:
+        body = "CB"
+    wheels = 4 if capacity <= 3 else 6 if capacity <= 9 else 10 if capacity <= 18 else 12
+    axle = "SA" if capacity <= 9 else "MA"
+
+    return {
+        "raw_truck_name": raw,
+        "cleaned_code": f"{wheels}WL_{capacity:g}MT_{axle}_{body}_L{length}",
+        "dimensions": {
+            "no_of_wheels": wheels,
+            "capacity_mt": capacity,
+            "axle_type": axle,
+            "body_type": body,
+            "length_ft": length,
+        },
+        "reasoning": "Fake Gemini rule-based answer.",
+    }
+
+
+def fake_header_answer(headers: list, sample_rows: list) -> dict:
+    local = match_headers_locally(headers, sample_rows)
+    mapping = local["mapping"]
+    return {
+        "mapping": mapping,
+        "missing_fields": [f for f in REQUIRED_FIELDS if f not in mapping],
+    }
+
+
+def fake_answer(prompt: str) -> dict:
+    truck = RAW_TRUCK_PATTERN.search(prompt)
+    if truck:
+        return fake_truck_answer(truck.group(1))
+    headers = HEADERS_PATTERN.search(prompt)
+    if headers:
+        return fake_header_answer(
+            json.loads(headers.group(1)), json.loads(headers.group(2))
+        )
+    return {"text": "unrecognised prompt"}
+
+
+def create_fake_gemini_app(
+    latency: float = 0.5,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    rpm: float = 0.0,
+    seed: int = 42,
+) -> FastAPI:
+    """
+    Args:
+        latency: Mean response delay in seconds.
+        jitter: Uniform +/- spread around `latency`.
+        error_rate: Fraction of requests answered with 500/503.
+        rpm: Requests per minute before answering 429 (0 disables throttling).
+        seed: RNG seed for latency and error injection.
+    """
+    app = FastAPI(title="Fake Gemini")
+    rng = random.Random(seed)
+    bucket = TokenBucket(rpm / 60.0, max(1, rpm / 60.0)) if rpm else None
+    app.state.stats = {"requests": 0, "throttled": 0, "errors": 0}
+
+    @app.post("/generate")
+    @app.post("/v1beta/models/{model}:generateContent")
+    async def generate(request: Request, model: str = "gemini-2.0-flash"):
+        stats = app.state.stats
+        stats["requests"] += 1
+        await asyncio.sleep(max(0.0, latency + rng.uniform(-jitter, jitter)))
+
+        if bucket is not None and not bucket.try_take():
+            stats["throttled"] += 1
+            return JSONResponse(
+                {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                status_code=429,
+                headers={"Retry-After": "1"},
+            )
+        if rng.random() < error_rate:
+            stats["errors"] += 1
+            status = rng.choice([500, 503])
+            return JSONResponse({"error": {"code": status}}, status_code=status)
+
+        payload = await request.json()
+        prompt = payload["contents"][0]["parts"][0]["text"]
+        text = "```json\n" + json.dumps(fake_answer(prompt)) + "\n```"
+        return {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}],
+            "usageMetadata": {
+                "promptTokenCount": len(prompt) // 4,
+                "candidatesTokenCount": len(text) // 4,
+                "totalTokenCount": (len(prompt) + len(text)) // 4,
+            },
+        }
+
+    @app.get("/stats")
+    def stats():
+        return app.state.stats
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Run a local fake Gemini server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rpm", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_fake_gemini_app(
+        args.latency, args.jitter, args.error_rate, args.rpm, args.seed
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
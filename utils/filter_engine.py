@@ -0,0 +1,166 @@
+"""
+Declarative row filters (see `data_filters` in src/config/config.yaml).
+
+A rule keeps the rows matching its `keep` condition:
+
+    {column: base_price, op: ">=", value: 100}
+    {column: g_distance_km, op: "<", other: h_distance_km}
+    {column: fuel_price_inr_per_litre, op: notna}
+    {all: [...]}, {any: [...]}, {not: {...}}
+
+Rules of type `iqr_upper` keep rows whose `column` is at most
+Q3 + value * IQR, with quantiles taken over the rows every other rule kept.
+Conditions are compiled once into numpy predicates; all rules are evaluated
+on the whole frame and combined into one mask, and the frame is indexed
+once.
+"""
+
+import copy
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+CONFIG_PATH = Path(__file__).resolve().parents[1] / "src" / "config" / "config.yaml"
+
+ROW_RULE = "row"
+IQR_RULE = "iqr_upper"
+
+_COMPARISONS = {
+    ">": np.greater,
+    ">=": np.greater_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    "==": np.equal,
+    "!=": np.not_equal,
+}
+
+
+def load_filter_rules(path=CONFIG_PATH):
+    """The `data_filters.rules` list from the project config."""
+    with open(path, "r") as f:
+        config = yaml.safe_load(f)
+    return config["data_filters"]["rules"]
+
+
+def override_rules(rules, overrides):
+    """
+    Copy of `rules` with `name=value` overrides from the command line,
+    replacing the named rule's threshold (k for iqr_upper rules).
+    """
+    rules = copy.deepcopy(rules)
+    tunable = {rule["name"]: _threshold_of(rule) for rule in rules}
+    tunable = {name: holder for name, holder in tunable.items() if "value" in holder}
+    for item in overrides or []:
+        name, _, value = item.partition("=")
+        if name not in tunable:
+            raise ValueError(f"Unknown filter '{name}' (known: {', '.join(tunable)})")
+        tunable[name]["value"] = float(value)
+    return rules
+
+
+def _threshold_of(rule) -> dict:
+    return rule if rule_kind(rule) == IQR_RULE else rule["keep"]
+
+
+def compile_condition(condition):
+    """Turn a condition tree into a function of a frame returning a bool array."""
+    if "all" in condition or "any" in condition:
+        combine = np.logical_and if "all" in condition else np.logical_or
+        parts = [
+            compile_condition(c) for c in condition.get("all", condition.get("any"))
+        ]
+        return lambda df: combine.reduce([part(df) for part in parts])
+    if "not" in condition:
+        inner = compile_condition(condition["not"])
+        return lambda df: ~inner(df)
+
+    column, op = condition["column"], condition["op"]
+    if op == "notna":
+        return lambda df: df[column].notna().to_numpy()
+    if op == "isna":
+        return lambda df: df[column].isna().to_numpy()
+    if op == "in":
+        values = list(condition["value"])
+        return lambda df: df[column].isin(values).to_numpy()
+    if op not in _COMPARISONS:
+        raise ValueError(f"Unsupported filter op '{op}' on {column}")
+
+    compare = _COMPARISONS[op]
+    if "other" in condition:
+        other = condition["other"]
+        return lambda df: compare(df[column].to_numpy(), df[other].to_numpy())
+    value = condition["value"]
+    return lambda df: compare(df[column].to_numpy(), value)
+
+
+def rule_kind(rule) -> str:
+    return rule.get("type", ROW_RULE)
+
+
+def evaluate_row_rules(df: pd.DataFrame, rules):
+    """
+    Returns:
+        (keep mask, counts): counts[name] has "failed" (rows the rule alone
+        rejects) and "removed" (rows whose first failing rule, in declared
+        order, is this one; these sum to the rows dropped).
+    """
+    keep = np.ones(len(df), dtype=bool)
+    counts = {}
+    for rule in rules:
+        if rule_kind(rule) != ROW_RULE:
+            continue
+        passed = compile_condition(rule["keep"])(df)
+        counts[rule["name"]] = {
+            "failed": int((~passed).sum()),
+            "removed": int((keep & ~passed).sum()),
+        }
+        keep &= passed
+    return keep, counts
+
+
+def iqr_upper_limit(values: pd.Series, k: float) -> float:
+    q1 = values.quantile(0.25)
+    q3 = values.quantile(0.75)
+    return q3 + k * (q3 - q1)
+
+
+def evaluate_iqr_rules(df: pd.DataFrame, rules, keep=None):
+    """Mask and counts of the iqr_upper rules, over the rows in `keep`."""
+    keep = np.ones(len(df), dtype=bool) if keep is None else keep.copy()
+    counts = {}
+    for rule in rules:
+        if rule_kind(rule) != IQR_RULE:
+            continue
+        values = df[rule["column"]]
+        limit = iqr_upper_limit(values[keep], rule["value"])
+        passed = (values <= limit).to_numpy()
+        failed = keep & ~passed
+        counts[rule["name"]] = {
+            "failed": int(failed.sum()),
+            "removed": int(failed.sum()),
+            "limit": float(limit),
+        }
+        keep &= passed
+    return keep, counts
+
+
+def apply_filters(df: pd.DataFrame, rules, kinds=(ROW_RULE, IQR_RULE)):
+    """
+    Keep the rows passing every rule of the given kinds, indexing `df` once.
+    Per-rule counts are added to `attrs["filter_counts"]` of the result, on
+    top of counts already there from earlier stages.
+    """
+    keep = np.ones(len(df), dtype=bool)
+    counts = dict(df.attrs.get("filter_counts", {}))
+    if ROW_RULE in kinds:
+        keep, row_counts = evaluate_row_rules(df, rules)
+        counts.update(row_counts)
+    if IQR_RULE in kinds:
+        keep, iqr_counts = evaluate_iqr_rules(df, rules, keep)
+        counts.update(iqr_counts)
+
+    out = df if keep.all() else df.loc[keep]
+    out.attrs["filter_counts"] = counts
+    return out
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List
+
+import httpx
+import requests
+
+from utils.constants import CONSTANTS
+
+GEMINI_TIMEOUT = httpx.Timeout(
+    CONSTANTS.GEMINI_READ_TIMEOUT, connect=CONSTANTS.GEMINI_CONNECT_TIMEOUT
+)
+
+# Shared async client, created on first use inside the running event loop
+_async_client = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    global _async_client
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=GEMINI_TIMEOUT,
+            limits=httpx.Limits(max_connections=CONSTANTS.GEMINI_MAX_CONNECTIONS),
+        )
+    return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def payload_key(payload: dict) -> str:
+    """
+    Cassette key for a request. Only the payload is hashed: the URL carries
+    the API key and must never end up in a cassette.
+    """
+    body = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class GeminiResponse:
+    """
+    Response object for recorded exchanges, exposing the subset of the
+    requests/httpx interface the Gemini callers use.
+    """
+
+    def __init__(self, status_code: int, text: str, headers: dict = None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class LiveTransport:
+    """Sends requests to the real endpoint (or whatever GEMINI_URL points at)."""
+
+    name = "live"
+
+    def send(self, url: str, payload: dict):
+        timeout = (CONSTANTS.GEMINI_CONNECT_TIMEOUT, CONSTANTS.GEMINI_READ_TIMEOUT)
+        return requests.post(
+            url,
+            headers={"Content-Type": "application/json"},
+            data=json.dumps(payload),
+            timeout=timeout,
+        )
+
+    async def asend(self, url: str, payload: dict):
+        return await get_async_client().post(
+            url, headers={"Content-Type": "application/json"}, json=payload
+        )
+
+
+class RecordingTransport:
+    """
+    Forwards to another transport and appends every exchange to a JSONL
+    cassette that `ReplayTransport` can serve later.
+    """
+
+    name = "record"
+
+    def __init__(self, cassette_path: str, inner=None):
+        self.cassette_path = cassette_path
+        self.inner = inner or LiveTransport()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(cassette_path) or ".", exist_ok=True)
+
+    def _record(self, payload: dict, response):
+        entry = {
+            "key": payload_key(payload),
+            "request": payload,
+            "status_code": response.status_code,
+            "headers": {
+                k: v for k, v in response.headers.items() if k.lower() == "retry-after"
+            },
+            "body": response.text,
+        }
+        with self._lock, open(self.cassette_path, "a") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def send(self, url: str, payload: dict):
+        response = self.inner.send(url, payload)
+        self._record(payload, response)
+        return response
+
+    async def asend(self, url: str, payload: dict):
+        response = await self.inner.asend(url, payload)
+        self._record(payload, response)
+        return response
+
+
+class CassetteMiss(LookupError):
+    pass
+
+
+class ReplayTransport:
+    """
+    Serves recorded responses without touching the network. Repeated
+    requests with the same payload replay their recordings in order, then
+    keep returning the last one, so runs are deterministic.
+    """
+
+    name = "replay"
+
+    def __init__(self, cassette_path: str):
+        self.cassette_path = cassette_path
+        self._entries: Dict[str, List[dict]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        with open(cassette_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+
+    def send(self, url: str, payload: dict):
+        key = payload_key(payload)
+        entries = self._entries.get(key)
+        if not entries:
+            raise CassetteMiss(
+                f"No recording for request {key[:12]} in {self.cassette_path}"
+            )
+        with self._lock:
+            idx = self._cursor.get(key, 0)
+            self._cursor[key] = idx + 1
+        entry = entries[min(idx, len(entries) - 1)]
+        return GeminiResponse(entry["status_code"], entry["body"], entry["headers"])
+
+    async def asend(self, url: str, payload: dict):
+        return self.send(url, payload)
+
+
+def build_transport(mode: str = None, cassette_path: str = None):
+    mode = (mode or CONSTANTS.GEMINI_TRANSPORT).lower()
+    cassette_path = cassette_path or CONSTANTS.GEMINI_CASSETTE
+    if mode == "live":
+        return LiveTransport()
+    if mode == "record":
+        return RecordingTransport(cassette_path)
+    if mode == "replay":
+        return ReplayTransport(cassette_path)
+    raise ValueError(f"Unknown GEMINI_TRANSPORT '{mode}' (live, record, replay)")
+
+
+_transport = None
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = build_transport()
+    return _transport
+
+
+def set_transport(transport):
+    """Swap the process-wide transport, e.g. to replay a cassette in a benchmark."""
+    global _transport
+    _transport = transport
@@ -2,9 +2,15 @@ import h3
 from geopy.distance import geodesic
 from math import radians, degrees, atan2
 import numpy as np
+import pandas as pd
+from utils.cleaning_utils import factorize_rows, round_like_python
 from utils.constants import CONSTANTS
 from typing import Tuple
 
+# WGS-84, the ellipsoid geopy's geodesic uses by default
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+
 
 def compute_bearing_angle(
     origin: Tuple[float, float], destination: Tuple[float, float]
@@ -107,3 +113,185 @@ def compute_lane_features_from_row(row, h3_res=CONSTANTS.H3_RES):
         "lng": row["Destination Longitude"],
     }
     return compute_lane_features_from_coords(origin, destination, h3_res)
+
+
+def compute_geodesic_distances(lat1, lon1, lat2, lon2, max_iter: int = 200):
+    """
+    Vectorized Vincenty inverse on WGS-84, in kilometres.
+
+    Agrees with geopy's `geodesic` to well under a millimetre; pairs where
+    the iteration doesn't converge (nearly antipodal points) fall back to
+    geopy one by one.
+    """
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2)
+    )
+    a, f = WGS84_A, WGS84_F
+    b = a * (1 - f)
+
+    U1 = np.arctan((1 - f) * np.tan(lat1))
+    U2 = np.arctan((1 - f) * np.tan(lat2))
+    sinU1, cosU1, sinU2, cosU2 = np.sin(U1), np.cos(U1), np.sin(U2), np.cos(U2)
+    L = lon2 - lon1
+    lam = L.copy()
+
+    converged = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(max_iter):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(
+                cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam
+            )
+            cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(
+                sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma
+            )
+            cos2_alpha = 1 - sin_alpha**2
+            cos_2sm = np.where(
+                cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha
+            )
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma
+                + C * sin_sigma * (cos_2sm + C * cos_sigma * (-1 + 2 * cos_2sm**2))
+            )
+            converged = np.abs(lam - lam_prev) < 1e-12
+            if converged.all():
+                break
+
+        u2 = cos2_alpha * (a**2 - b**2) / b**2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = (
+            B
+            * sin_sigma
+            * (
+                cos_2sm
+                + B
+                / 4
+                * (
+                    cos_sigma * (-1 + 2 * cos_2sm**2)
+                    - B / 6 * cos_2sm * (-3 + 4 * sin_sigma**2) * (-3 + 4 * cos_2sm**2)
+                )
+            )
+        )
+        km = b * A * (sigma - delta_sigma) / 1000
+
+    retry = ~converged & np.isfinite(lat1 + lon1 + lat2 + lon2)
+    for i in np.flatnonzero(retry):
+        km[i] = geodesic(
+            (np.degrees(lat1[i]), np.degrees(lon1[i])),
+            (np.degrees(lat2[i]), np.degrees(lon2[i])),
+        ).km
+    return km
+
+
+def compute_bearing_angles(lat1, lon1, lat2, lon2):
+    """Vectorized `compute_bearing_angle`, unrounded."""
+    lat1, lon1, lat2, lon2 = (
+        np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2)
+    )
+    dlon = lon2 - lon1
+    x = np.arctan2(
+        np.sin(dlon) * np.cos(lat2),
+        np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon),
+    )
+    return (np.degrees(x) + 360) % 360
+
+
+def compute_lane_features_frame(
+    origin_lat,
+    origin_lng,
+    destination_lat,
+    destination_lng,
+    h3_res: int = CONSTANTS.H3_RES,
+) -> pd.DataFrame:
+    """
+    Vectorized `compute_lane_features_from_coords` over whole columns.
+
+    Each distinct point is converted to H3 once and each distinct
+    origin/destination pair is measured once, so cost scales with the number
+    of lanes rather than rows. Values match the row-wise function exactly.
+
+    Returns:
+        DataFrame with origin_hex, destination_hex, lane_hex, h_distance_km,
+        bearing_angle_deg and hex_ring_distance, aligned with the inputs.
+    """
+    coords = pd.DataFrame(
+        {
+            "olat": np.asarray(origin_lat, dtype=float),
+            "olng": np.asarray(origin_lng, dtype=float),
+            "dlat": np.asarray(destination_lat, dtype=float),
+            "dlng": np.asarray(destination_lng, dtype=float),
+        }
+    )
+    lane_codes, first = factorize_rows(coords)
+    lanes = coords.iloc[first].reset_index(drop=True)
+
+    # H3 cells for every distinct point, origins and destinations together
+    points = pd.DataFrame(
+        {
+            "lat": np.concatenate([lanes.olat, lanes.dlat]),
+            "lng": np.concatenate([lanes.olng, lanes.dlng]),
+        }
+    )
+    point_codes, first = factorize_rows(points)
+    cells = np.array(
+        [
+            h3.latlng_to_cell(lat, lng, h3_res)
+            for lat, lng in zip(points.lat[first], points.lng[first])
+        ],
+        dtype=object,
+    )[point_codes]
+    origin_hex, destination_hex = cells[: len(lanes)], cells[len(lanes) :]
+
+    # grid distance for every distinct hex pair
+    pair_codes, first = factorize_rows(
+        pd.DataFrame({"origin": origin_hex, "destination": destination_hex})
+    )
+    ring = np.array(
+        [compute_hex_ring_distance(origin_hex[i], destination_hex[i]) for i in first],
+        dtype=np.int64,
+    )[pair_codes]
+
+    distance = compute_geodesic_distances(
+        lanes.olat, lanes.olng, lanes.dlat, lanes.dlng
+    )
+    bearing = compute_bearing_angles(lanes.olat, lanes.olng, lanes.dlat, lanes.dlng)
+
+    # re-measure the few pairs whose 2-decimal rounding could be flipped by
+    # Vincenty vs geopy or numpy vs math float differences
+    for values, scalar in (
+        (
+            distance,
+            lambda i: compute_haversine_distance(
+                (lanes.olat[i], lanes.olng[i]), (lanes.dlat[i], lanes.dlng[i])
+            ),
+        ),
+        (
+            bearing,
+            lambda i: compute_bearing_angle(
+                (lanes.olat[i], lanes.olng[i]), (lanes.dlat[i], lanes.dlng[i])
+            ),
+        ),
+    ):
+        scaled = values * 100
+        close = np.abs(np.abs(scaled - np.floor(scaled)) - 0.5) < 1e-3
+        for i in np.flatnonzero(close):
+            values[i] = scalar(i)
+
+    per_lane = pd.DataFrame(
+        {
+            "origin_hex": origin_hex,
+            "destination_hex": destination_hex,
+            "lane_hex": pd.Series(origin_hex, dtype=object)
+            + "_"
+            + pd.Series(destination_hex, dtype=object),
+            "h_distance_km": round_like_python(distance, 2),
+            "bearing_angle_deg": round_like_python(bearing, 2),
+            "hex_ring_distance": ring,
+        }
+    )
+    return per_lane.iloc[lane_codes].reset_index(drop=True)
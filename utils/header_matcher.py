@@ -0,0 +1,333 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+REQUIRED_FIELDS = ["origin_name", "destination_name", "truck_type", "date_column"]
+
+# Bump when matching rules change so fingerprints computed under old rules miss
+MATCHER_VERSION = "1"
+
+FIELD_SYNONYMS = {
+    "origin_name": [
+        "origin",
+        "origin name",
+        "origin city",
+        "origin location",
+        "from",
+        "from city",
+        "from location",
+        "source",
+        "pickup",
+        "loading point",
+        "load point",
+    ],
+    "destination_name": [
+        "destination",
+        "destination name",
+        "destination city",
+        "destination location",
+        "dest",
+        "to",
+        "to city",
+        "to location",
+        "drop",
+        "delivery",
+        "unloading point",
+    ],
+    "truck_type": [
+        "truck type",
+        "truck",
+        "vehicle type",
+        "vehicle",
+        "vehicle category",
+        "truck category",
+        "vehicle size",
+        "truck size",
+    ],
+    "date_column": [
+        "date",
+        "dispatch date",
+        "movement date",
+        "shipment date",
+        "loading date",
+        "trip date",
+        "indent date",
+        "placement date",
+    ],
+}
+
+# Header tokens that mark a column as something other than the place name
+NON_NAME_TOKENS = {
+    "lat",
+    "latitude",
+    "lng",
+    "lon",
+    "long",
+    "longitude",
+    "pincode",
+    "pin",
+    "code",
+    "id",
+}
+
+DATE_FORMATS = [
+    "%Y-%m-%d",
+    "%d-%m-%Y",
+    "%d/%m/%Y",
+    "%m/%d/%Y",
+    "%Y/%m/%d",
+    "%d-%b-%Y",
+    "%d %b %Y",
+    "%d.%m.%Y",
+]
+
+TRUCK_VALUE_PATTERN = re.compile(
+    r"\d+(\.\d+)?\s*(mt|ton|tons|tonne|t\b|ft|feet|wheel|whl|wl)"
+    r"|\b(open|closed|container|trailer|taurus|reefer|lcv|hcv|tata|eicher|body|cbm)\b",
+    re.IGNORECASE,
+)
+
+# A field is decided locally when its best score clears HIGH_SCORE by MARGIN;
+# below LOW_SCORE it is treated as absent unless value shapes suggest otherwise.
+HIGH_SCORE = 0.75
+LOW_SCORE = 0.45
+MARGIN = 0.1
+
+
+def normalize_header(header: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", str(header).lower()).split())
+
+
+def header_fingerprint(headers: List[str], prompt_version: str = "") -> str:
+    """
+    Order-insensitive fingerprint of a header set. The prompt version is
+    folded in so LLM-derived mappings are invalidated when the prompt changes.
+    """
+    key = json.dumps(
+        {
+            "headers": sorted(str(h).strip() for h in headers),
+            "matcher": MATCHER_VERSION,
+            "prompt": prompt_version,
+        }
+    )
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _name_similarity(header: str, field: str) -> float:
+    norm = normalize_header(header)
+    tokens = set(norm.split())
+    best = 0.0
+    for synonym in FIELD_SYNONYMS[field]:
+        if norm == synonym:
+            return 1.0
+        score = SequenceMatcher(None, norm, synonym).ratio()
+        if set(synonym.split()) <= tokens:
+            # every synonym word appears in the header, e.g. "Origin City Name"
+            score = max(score, 0.85)
+        best = max(best, score)
+    return best
+
+
+def _is_number(value) -> bool:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return True
+    try:
+        float(str(value).replace(",", ""))
+        return True
+    except ValueError:
+        return False
+
+
+def _is_date(value) -> bool:
+    text = str(value).strip()
+    # Excel serial dates between 1982 and 2064
+    if _is_number(text) and 30000 <= float(text.replace(",", "")) <= 60000:
+        return True
+    text = text.split(" ")[0].split("T")[0] if len(text) > 11 else text
+    for fmt in DATE_FORMATS:
+        try:
+            datetime.strptime(text, fmt)
+            return True
+        except ValueError:
+            continue
+    return False
+
+
+def _is_coordinate(value) -> bool:
+    if not _is_number(value):
+        return False
+    number = float(str(value).replace(",", ""))
+    return -180 <= number <= 180 and not float(number).is_integer()
+
+
+def column_shape(values: list) -> Dict[str, float]:
+    """
+    Fraction of non-empty sample values that look like each shape.
+    """
+    values = [v for v in values if v is not None and str(v).strip() != ""]
+    if not values:
+        return {}
+    n = len(values)
+    return {
+        "coordinate": sum(_is_coordinate(v) for v in values) / n,
+        "date": sum(_is_date(v) for v in values) / n,
+        "number": sum(_is_number(v) for v in values) / n,
+        "truck": sum(bool(TRUCK_VALUE_PATTERN.search(str(v))) for v in values) / n,
+    }
+
+
+def _shape_factor(field: str, header: str, shape: Dict[str, float]) -> float:
+    if field in ("origin_name", "destination_name"):
+        if set(normalize_header(header).split()) & NON_NAME_TOKENS:
+            return 0.2
+        if not shape:
+            return 0.9
+        # place names are text: reject coordinate, date and numeric columns
+        return 1.0 - max(shape["coordinate"], shape["date"], shape["number"])
+    if not shape:
+        return 0.9
+    if field == "date_column":
+        return 0.2 + 0.8 * shape["date"]
+    if field == "truck_type":
+        if shape["number"] > 0.5:
+            # a bare numeric capacity column is not the truck type
+            return 0.3
+        return 0.6 + 0.4 * shape["truck"]
+    return 1.0
+
+
+def _strong_shape(field: str, shape: Dict[str, float]) -> bool:
+    if not shape:
+        return False
+    if field == "date_column":
+        return shape["date"] >= 0.8
+    if field == "truck_type":
+        return shape["truck"] >= 0.8
+    return False
+
+
+def match_headers_locally(headers: List[str], sample_rows: List[list]) -> dict:
+    """
+    Deterministically map required fields to headers using header-name
+    similarity weighted by sample value shapes.
+
+    Returns:
+        dict: {
+            "mapping": {field: header} for confident matches,
+            "missing_fields": fields with no plausible header,
+            "ambiguous_fields": fields that need the LLM,
+            "scores": {field: best score},
+        }
+    """
+    columns = {
+        i: column_shape([row[i] for row in sample_rows if i < len(row)])
+        for i in range(len(headers))
+    }
+
+    candidates = {}
+    for field in REQUIRED_FIELDS:
+        scored = [
+            (_name_similarity(h, field) * _shape_factor(field, h, columns[i]), i)
+            for i, h in enumerate(headers)
+        ]
+        # highest score first, ties broken by column order
+        candidates[field] = sorted(scored, key=lambda c: (-c[0], c[1]))
+
+    mapping, missing, ambiguous, scores = {}, [], [], {}
+    claimed = set()
+
+    # decide the strongest fields first so they claim their header
+    order = sorted(
+        REQUIRED_FIELDS,
+        key=lambda f: candidates[f][0][0] if candidates[f] else 0,
+        reverse=True,
+    )
+    for field in order:
+        ranked = [(s, i) for s, i in candidates[field] if i not in claimed]
+        best, best_idx = ranked[0] if ranked else (0.0, None)
+        runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+        scores[field] = round(best, 3)
+
+        if best >= HIGH_SCORE and best - runner_up >= MARGIN:
+            mapping[field] = headers[best_idx]
+            claimed.add(best_idx)
+        elif best < LOW_SCORE and not any(
+            _strong_shape(field, columns[i]) for _, i in ranked
+        ):
+            missing.append(field)
+        else:
+            ambiguous.append(field)
+
+    return {
+        "mapping": {f: mapping[f] for f in REQUIRED_FIELDS if f in mapping},
+        "missing_fields": [f for f in REQUIRED_FIELDS if f in missing],
+        "ambiguous_fields": [f for f in REQUIRED_FIELDS if f in ambiguous],
+        "scores": scores,
+    }
+
+
+class FingerprintCache:
+    """
+    LRU cache of header-set fingerprint -> resolved mapping, optionally
+    persisted to a JSON file so known templates survive restarts.
+    """
+
+    def __init__(self, max_size: int = 1000, path: Optional[str] = None):
+        self.max_size = max_size
+        self.path = path
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path, "r") as f:
+                self._entries.update(json.load(f))
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key: str, value: dict):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def put(self, key: str, value: dict):
+        self._store(key, value)
+        if self.path:
+            self.flush()
+
+    async def aput(self, key: str, value: dict):
+        """`put` for the event loop: the file is written in a worker thread."""
+        self._store(key, value)
+        if self.path:
+            await asyncio.to_thread(self.flush)
+
+    def flush(self):
+        """
+        Write the entries to `path` through a temporary file and os.replace,
+        so a crash mid-write leaves the previous file intact.
+        """
+        # one writer at a time, each with the latest entries
+        with self._write_lock:
+            with self._lock:
+                data = json.dumps(self._entries)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+
+    def __len__(self):
+        return len(self._entries)
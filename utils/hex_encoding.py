@@ -0,0 +1,318 @@
+"""
+Numeric encodings of the H3 hex columns, an alternative to training
+origin_hex, destination_hex and lane_hex as LightGBM categoricals.
+
+Each origin, destination and lane is looked up at its own resolution and at
+coarser parent resolutions. Every level gives the number of training rows
+with that key ("frequency" mode). "target" mode also gives the mean target,
+smoothed towards the parent level's mean (and the coarsest level towards
+the overall mean). A key missing from training backs off to its parent's
+mean with a count of 0, so a new hex in a known area still gets a useful
+value. Training rows get out-of-fold means, so a row's own price never
+leaks into its encoding.
+
+Cells are stored as integers: the base cell and the cell's digits, without
+the unused trailing digits, so a parent's key is a right shift of the
+child's and a lane packs both ends into one uint64 (up to resolution 8).
+Every level is a sorted key array with count and mean arrays, looked up with
+np.searchsorted, and saved with np.savez next to model.txt.
+"""
+
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HEX_COLUMNS = ["origin_hex", "destination_hex", "lane_hex"]
+MODES = ["categorical", "frequency", "target"]
+HEX_ENCODING_FILE = "hex_encoding.npz"
+
+# key of values that cannot be encoded (missing or not a cell); no table
+# has it, so they back off like unseen cells
+_MISSING = np.uint64(2**64 - 1)
+
+
+def _cell_bits(resolution: int) -> int:
+    """Bits of a cell key: 7 for the base cell, 3 per digit."""
+    return 7 + 3 * resolution
+
+
+def cell_keys(values, resolution: int) -> np.ndarray:
+    """
+    Base cell and digits of H3 cells (hex strings) at `resolution`, as
+    uint64. Parent keys at resolution p are `keys >> 3 * (resolution - p)`.
+    """
+    values = pd.Series(values)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+    ints = np.array([int(cell, 16) for cell in uniques], dtype=np.uint64)
+    if len(ints):
+        found = (ints >> np.uint64(52)) & np.uint64(0xF)
+        if (found != resolution).any():
+            raise ValueError(f"Expected H3 cells of resolution {resolution}")
+    unused = np.uint64(3 * (15 - resolution))
+    bits = (ints >> unused) & np.uint64((1 << (7 + 3 * resolution)) - 1)
+    keys = np.append(bits, _MISSING)
+    return keys[codes]  # code -1 (missing) takes the last entry
+
+
+def feature_names(mode: str, levels) -> list:
+    """Encoded columns for `levels` (resolutions, finest first)."""
+    stats = ["count"] if mode == "frequency" else ["count", "te"]
+    names = []
+    for col in HEX_COLUMNS:
+        for i, level in enumerate(levels):
+            prefix = col if i == 0 else f"{col}_p{level}"
+            names += [f"{prefix}_{stat}" for stat in stats]
+    return names
+
+
+def encoded_features(features, mode: str, levels) -> list:
+    """`features` with the hex columns replaced by their encoded columns."""
+    if mode == "categorical":
+        return list(features)
+    rest = [col for col in features if col not in HEX_COLUMNS]
+    # where the first hex column was
+    at = next((i for i, col in enumerate(features) if col in HEX_COLUMNS), len(rest))
+    return rest[:at] + feature_names(mode, levels) + rest[at:]
+
+
+class HexEncoder:
+    """
+    Frequency/target encodings of the hex columns at `resolution` and its
+    `parent_resolutions`.
+
+        encoder = HexEncoder("target", resolution=6, parent_resolutions=[4, 2])
+        X_train = encoder.fit_transform(X_train, y_train)
+        X_test = encoder.transform(X_test)
+    """
+
+    def __init__(
+        self,
+        mode: str = "target",
+        resolution: int = 6,
+        parent_resolutions=(4, 2),
+        smoothing: float = 20.0,
+        folds: int = 5,
+        seed: int = 42,
+    ):
+        if mode not in MODES[1:]:
+            raise ValueError(f"Unknown hex encoding mode '{mode}'")
+        if 2 * _cell_bits(resolution) > 64:
+            raise ValueError(
+                f"Lane keys at resolution {resolution} need "
+                f"{2 * _cell_bits(resolution)} bits; uint64 keys fit up to "
+                "resolution 8"
+            )
+        self.mode = mode
+        self.resolution = resolution
+        self.levels = [resolution] + sorted(
+            (r for r in parent_resolutions if r < resolution), reverse=True
+        )
+        self.smoothing = float(smoothing)
+        self.folds = folds
+        self.seed = seed
+        self.global_mean = 0.0
+        # {(source, level): (keys, counts, means)}, source origin|destination|lane
+        self.tables = {}
+
+    @property
+    def features(self) -> list:
+        return feature_names(self.mode, self.levels)
+
+    def settings(self) -> dict:
+        return {
+            "mode": self.mode,
+            "resolution": self.resolution,
+            "parent_resolutions": self.levels[1:],
+            "smoothing": self.smoothing,
+            "folds": self.folds,
+            "seed": self.seed,
+        }
+
+    def _keys(self, origin, destination) -> dict:
+        """{(source, level): key per row}"""
+        ends = {
+            "origin": cell_keys(origin, self.resolution),
+            "destination": cell_keys(destination, self.resolution),
+        }
+        keys = {}
+        for level in self.levels:
+            shift = np.uint64(3 * (self.resolution - level))
+            o, d = (ends[end] >> shift for end in ("origin", "destination"))
+            lane = (o << np.uint64(_cell_bits(level))) | d
+            missing = (ends["origin"] == _MISSING) | (ends["destination"] == _MISSING)
+            o[ends["origin"] == _MISSING] = _MISSING
+            d[ends["destination"] == _MISSING] = _MISSING
+            lane[missing] = _MISSING
+            keys.update(
+                {("origin", level): o, ("destination", level): d, ("lane", level): lane}
+            )
+        return keys
+
+    def _fit_keys(self, keys: dict, y: np.ndarray):
+        self.global_mean = float(y.mean())
+        self.tables = {}
+        for source in ("origin", "destination", "lane"):
+            prior = np.full(len(y), self.global_mean)
+            for level in reversed(self.levels):
+                row_keys = keys[source, level]
+                uniq, first, inverse, counts = np.unique(
+                    row_keys, return_index=True, return_inverse=True, return_counts=True
+                )
+                sums = np.bincount(inverse, weights=y, minlength=len(uniq))
+                means = (sums + self.smoothing * prior[first]) / (
+                    counts + self.smoothing
+                )
+                seen = uniq != _MISSING
+                self.tables[source, level] = (
+                    uniq[seen],
+                    counts[seen].astype(np.uint32),
+                    means[seen].astype(np.float32),
+                )
+                prior = np.where(row_keys != _MISSING, means[inverse], prior)
+
+    def _encode_keys(self, keys: dict) -> dict:
+        out = {}
+        n = len(next(iter(keys.values())))
+        for source in ("origin", "destination", "lane"):
+            prior = np.full(n, self.global_mean, dtype=np.float32)
+            for level in reversed(self.levels):
+                table_keys, counts, means = self.tables[source, level]
+                row_keys = keys[source, level]
+                if len(table_keys):
+                    idx = np.searchsorted(table_keys, row_keys)
+                    idx[idx == len(table_keys)] = 0
+                    found = table_keys[idx] == row_keys
+                else:
+                    idx, found = np.zeros(n, dtype=np.intp), np.zeros(n, dtype=bool)
+                    counts, means = np.zeros(1, np.uint32), np.zeros(1, np.float32)
+                prefix = f"{source}_hex"
+                if level != self.resolution:
+                    prefix += f"_p{level}"
+                out[f"{prefix}_count"] = np.where(found, counts[idx], 0).astype(
+                    np.float32
+                )
+                prior = np.where(found, means[idx], prior).astype(np.float32)
+                if self.mode == "target":
+                    out[f"{prefix}_te"] = prior
+        return out
+
+    def _target(self, y, n: int) -> np.ndarray:
+        # frequency mode only counts rows
+        if self.mode == "frequency" or y is None:
+            return np.zeros(n)
+        return np.asarray(y, dtype=np.float64)
+
+    def fit(self, X: pd.DataFrame, y=None):
+        y = self._target(y, len(X))
+        self._fit_keys(self._keys(X["origin_hex"], X["destination_hex"]), y)
+        return self
+
+    def encode(self, origin, destination) -> dict:
+        """{encoded column: values} for origin/destination cells."""
+        return self._encode_keys(self._keys(origin, destination))
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        """`X` with the hex columns replaced by their encodings."""
+        encoded = self.encode(X["origin_hex"], X["destination_hex"])
+        return self._replace(X, encoded)
+
+    def fit_transform(self, X: pd.DataFrame, y=None) -> pd.DataFrame:
+        """
+        Fit on all rows; in target mode each row's means come from the
+        tables of the other folds.
+        """
+        y = self._target(y, len(X))
+        keys = self._keys(X["origin_hex"], X["destination_hex"])
+        self._fit_keys(keys, y)
+        encoded = self._encode_keys(keys)
+        if self.mode == "target" and self.folds > 1:
+            fold = np.random.default_rng(self.seed).integers(self.folds, size=len(y))
+            fold_encoder = HexEncoder(**self.settings())
+            for k in range(self.folds):
+                held_out = fold == k
+                fold_encoder._fit_keys(
+                    {name: v[~held_out] for name, v in keys.items()}, y[~held_out]
+                )
+                held = fold_encoder._encode_keys(
+                    {name: v[held_out] for name, v in keys.items()}
+                )
+                for name in held:
+                    if name.endswith("_te"):
+                        encoded[name][held_out] = held[name]
+        return self._replace(X, encoded)
+
+    def _replace(self, X: pd.DataFrame, encoded: dict) -> pd.DataFrame:
+        features = encoded_features(list(X.columns), self.mode, self.levels)
+        columns = {col: X[col] for col in X.columns if col not in HEX_COLUMNS}
+        columns.update(
+            {name: pd.Series(v, index=X.index) for name, v in encoded.items()}
+        )
+        return pd.DataFrame(columns, index=X.index)[features]
+
+    def to_arrays(self) -> dict:
+        """{name: array} of the settings (a JSON string) and lookup tables."""
+        arrays = {
+            "settings": np.array(
+                json.dumps({**self.settings(), "global_mean": self.global_mean})
+            )
+        }
+        for (source, level), (keys, counts, means) in self.tables.items():
+            arrays[f"{source}_{level}_keys"] = keys
+            arrays[f"{source}_{level}_counts"] = counts
+            arrays[f"{source}_{level}_means"] = means
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "HexEncoder":
+        """
+        An encoder from `to_arrays` output; the tables are used as given,
+        so they may be views into a memory-mapped file.
+        """
+        settings = json.loads(str(arrays["settings"]))
+        global_mean = settings.pop("global_mean")
+        encoder = cls(**settings)
+        encoder.global_mean = global_mean
+        for source in ("origin", "destination", "lane"):
+            for level in encoder.levels:
+                encoder.tables[source, level] = tuple(
+                    arrays[f"{source}_{level}_{name}"]
+                    for name in ("keys", "counts", "means")
+                )
+        return encoder
+
+    def to_bytes(self) -> bytes:
+        """The lookup arrays and settings as an (uncompressed) .npz file."""
+        buf = io.BytesIO()
+        np.savez(buf, **self.to_arrays())
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HexEncoder":
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls.from_arrays(arrays)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path) -> "HexEncoder":
+        with open(path, "rb") as f:
+            return cls.from_bytes(f.read())
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for table in self.tables.values() for a in table)
+
+
+def load_hex_encoder(model_dir, model_config: dict):
+    """A saved model's HexEncoder, or None if it trains hexes as categoricals."""
+    if "hex_encoding" not in model_config:
+        return None
+    return HexEncoder.load(Path(model_dir) / HEX_ENCODING_FILE)
@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+
+from utils.stage_cache import stage_key
+
+project_root = Path(__file__).resolve().parents[1]
+DATASET_CACHE_DIR = project_root / "data" / "cache" / "lgb_datasets"
+
+# LightGBM parameters that change how a Dataset is binned; the rest only
+# affect training and can change freely against the same binary files.
+# min_data_in_leaf is here because feature_pre_filter drops features by it;
+# with feature_pre_filter off it can change too.
+DATASET_PARAMS = [
+    "max_bin",
+    "max_bin_by_feature",
+    "min_data_in_bin",
+    "bin_construct_sample_cnt",
+    "data_random_seed",
+    "seed",
+    "feature_pre_filter",
+    "min_data_in_leaf",
+    "use_missing",
+    "zero_as_missing",
+    "linear_tree",
+    "enable_bundle",
+    "forcedbins_filename",
+]
+
+
+def dataset_params(params: dict) -> dict:
+    """The part of `params` the binary Dataset files depend on."""
+    names = DATASET_PARAMS
+    if params.get("feature_pre_filter") is False:
+        names = [name for name in names if name != "min_data_in_leaf"]
+    return {name: params[name] for name in names if name in params}
+
+
+def dataset_key(data_digest: str, code, settings: dict) -> str:
+    """
+    Key of a train/valid Dataset pair: the prepared data's digest, the code
+    that turns it into features and the feature, split and binning settings.
+    """
+    return stage_key(data_digest, code, {**settings, "lightgbm": lgb.__version__})
+
+
+def subset(dataset: lgb.Dataset, indices) -> lgb.Dataset:
+    """
+    Rows `indices` of a constructed Dataset, binned with its bin mappers
+    and without going back to pandas.
+    """
+    indices = np.asarray(indices, dtype=np.int32)
+    rows = dataset.subset(indices)
+    # lightgbm 4.3 keeps the indices as a list, which it then passes to
+    # np.array(copy=False); numpy 2 refuses that copy
+    rows.used_indices = indices
+    return rows
+
+
+class DatasetCache:
+    """
+    Named binary LightGBM Datasets per key under `cache_dir`, each key in
+    its own directory with a meta.json (category map, row counts). Only the
+    `keep` most recently used entries are kept on disk.
+
+        <cache_dir>/<key[:16]>/train.bin
+        <cache_dir>/<key[:16]>/valid.bin
+        <cache_dir>/<key[:16]>/meta.json
+    """
+
+    def __init__(self, cache_dir=DATASET_CACHE_DIR, keep: int = 3):
+        self.cache_dir = Path(cache_dir)
+        self.keep = keep
+
+    def path(self, key: str) -> Path:
+        return self.cache_dir / key[:16]
+
+    def has(self, key: str) -> bool:
+        return (self.path(key) / "meta.json").exists()
+
+    def meta(self, key: str) -> dict:
+        with open(self.path(key) / "meta.json") as f:
+            return json.load(f)
+
+    def load(self, key: str, params: dict = None):
+        """
+        Returns:
+            ({name: constructed Dataset}, meta): Datasets after the first
+            are binned with the first one's bin mappers.
+        """
+        entry = self.path(key)
+        meta = self.meta(key)
+        datasets = {}
+        for name in meta["datasets"]:
+            reference = next(iter(datasets.values()), None)
+            datasets[name] = lgb.Dataset(
+                str(entry / f"{name}.bin"), reference=reference, params=params
+            ).construct()
+        os.utime(entry)  # mark as recently used for pruning
+        return datasets, meta
+
+    def store(self, key: str, datasets: dict, meta: dict, files: dict = None):
+        """
+        `datasets`: {name: constructed Dataset}, the reference first.
+        `files`: {file name: bytes} saved next to them, e.g. fitted encoders.
+        """
+        entry = self.path(key)
+        tmp = entry.with_name(entry.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for name, dataset in datasets.items():
+            dataset.save_binary(str(tmp / f"{name}.bin"))
+        for name, data in (files or {}).items():
+            (tmp / name).write_bytes(data)
+        meta = {**meta, "datasets": list(datasets)}
+        with open(tmp / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2)
+        # never leave a half-written entry behind
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+        self._prune()
+
+    def _prune(self):
+        entries = sorted(
+            (p for p in self.cache_dir.iterdir() if (p / "meta.json").exists()),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for stale in entries[self.keep :]:
+            shutil.rmtree(stale, ignore_errors=True)
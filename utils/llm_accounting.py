@@ -0,0 +1,166 @@
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Dict
+
+from utils.constants import CONSTANTS
+from utils.metrics import metrics
+
+# Which endpoint (or batch job) the current LLM call is made for. Set once
+# per request; tasks spawned afterwards (gather, ensure_future) inherit it.
+llm_endpoint = contextvars.ContextVar("llm_endpoint", default="unknown")
+
+
+def set_llm_endpoint(name: str):
+    llm_endpoint.set(name)
+
+
+def usage_from_response(response) -> Dict[str, int]:
+    """Token counts from a generateContent response's usageMetadata."""
+    try:
+        usage = response.json().get("usageMetadata", {})
+    except Exception:
+        usage = {}
+    return {
+        "prompt_tokens": int(usage.get("promptTokenCount", 0)),
+        "response_tokens": int(usage.get("candidatesTokenCount", 0)),
+    }
+
+
+class LLMUsage:
+    """
+    Per-endpoint LLM accounting: calls by status, prompt/response tokens,
+    latency, estimated cost, and how requests were answered (llm, cache,
+    index, local...). Everything is also pushed to the shared metrics
+    registry as llm_* series.
+    """
+
+    def __init__(self, input_price_per_m: float, output_price_per_m: float):
+        self.input_price_per_m = input_price_per_m
+        self.output_price_per_m = output_price_per_m
+        self._endpoints: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, name: str) -> dict:
+        return self._endpoints.setdefault(
+            name,
+            {
+                "calls": 0,
+                "errors": 0,
+                "prompt_tokens": 0,
+                "response_tokens": 0,
+                "cost_usd": 0.0,
+                "latency_ms_sum": 0.0,
+                "answers": {},
+            },
+        )
+
+    def record_call(self, status: str, latency_s: float, response=None, transport=""):
+        """
+        One Gemini call (retries included).
+
+        Args:
+            status: HTTP status code, or an error label such as "timeout".
+            latency_s: Wall time of the call.
+            response: Final response, if any, to read token usage from.
+            transport: live, record or replay.
+        """
+        endpoint = llm_endpoint.get()
+        status = str(status)
+        usage = (
+            usage_from_response(response)
+            if response is not None and status == "200"
+            else {"prompt_tokens": 0, "response_tokens": 0}
+        )
+        cost = (
+            usage["prompt_tokens"] * self.input_price_per_m
+            + usage["response_tokens"] * self.output_price_per_m
+        ) / 1e6
+        latency_ms = latency_s * 1000
+
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats["calls"] += 1
+            stats["errors"] += status != "200"
+            stats["prompt_tokens"] += usage["prompt_tokens"]
+            stats["response_tokens"] += usage["response_tokens"]
+            stats["cost_usd"] += cost
+            stats["latency_ms_sum"] += latency_ms
+
+        metrics.inc(
+            "llm_calls_total", endpoint=endpoint, status=status, transport=transport
+        )
+        metrics.inc(
+            "llm_prompt_tokens_total", usage["prompt_tokens"], endpoint=endpoint
+        )
+        metrics.inc(
+            "llm_response_tokens_total", usage["response_tokens"], endpoint=endpoint
+        )
+        metrics.inc("llm_cost_usd_total", cost, endpoint=endpoint)
+        metrics.observe("llm_latency_ms", latency_ms, endpoint=endpoint)
+
+    def record_answer(self, source: str):
+        """How one request was answered: llm, cache, index, local, ..."""
+        endpoint = llm_endpoint.get()
+        with self._lock:
+            answers = self._endpoint(endpoint)["answers"]
+            answers[source] = answers.get(source, 0) + 1
+        metrics.inc("llm_answers_total", endpoint=endpoint, source=source)
+
+    def summary(self) -> Dict[str, dict]:
+        with self._lock:
+            out = {}
+            for name, stats in sorted(self._endpoints.items()):
+                answered = sum(stats["answers"].values())
+                via_llm = sum(
+                    n
+                    for source, n in stats["answers"].items()
+                    if "llm" in source.split("+")
+                )
+                out[name] = {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "prompt_tokens": stats["prompt_tokens"],
+                    "response_tokens": stats["response_tokens"],
+                    "cost_usd": round(stats["cost_usd"], 6),
+                    "avg_latency_ms": (
+                        round(stats["latency_ms_sum"] / stats["calls"], 1)
+                        if stats["calls"]
+                        else 0.0
+                    ),
+                    "answers": dict(stats["answers"]),
+                    # share of requests answered without calling Gemini
+                    "llm_avoided": (
+                        round(1 - via_llm / answered, 3) if answered else 0.0
+                    ),
+                }
+            return out
+
+    def format_summary(self) -> str:
+        lines = []
+        for name, s in self.summary().items():
+            lines.append(
+                f"{name}: {s['calls']} calls ({s['errors']} failed), "
+                f"{s['prompt_tokens']}+{s['response_tokens']} tokens, "
+                f"${s['cost_usd']:.4f}, avg {s['avg_latency_ms']}ms, "
+                f"answers {s['answers']}"
+            )
+        return "\n".join(lines) or "no LLM usage yet"
+
+
+llm_usage = LLMUsage(
+    input_price_per_m=CONSTANTS.GEMINI_INPUT_PRICE_PER_M,
+    output_price_per_m=CONSTANTS.GEMINI_OUTPUT_PRICE_PER_M,
+)
+
+
+async def log_usage_periodically(interval: float):
+    """Print the usage summary every `interval` seconds (run as a task)."""
+    last = None
+    while True:
+        await asyncio.sleep(interval)
+        text = llm_usage.format_summary()
+        if text != last:
+            print(f"[LLM usage {time.strftime('%H:%M:%S')}]\n{text}")
+            last = text
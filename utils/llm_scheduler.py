@@ -0,0 +1,270 @@
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional, Tuple
+
+from utils.constants import CONSTANTS
+
+# Status codes worth retrying: throttling and transient server-side failures
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date) into seconds.
+    Returns None if the header is missing or unparsable.
+    """
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Callers reserve a token and are told how long
+    to wait before using it, so the same bucket serves sync and async code.
+
+    `pause` stops refilling until a point in the future and bumps `epoch`;
+    callers holding a reservation from an older epoch should reserve again
+    so that everyone queued behind a Retry-After doesn't fire at once.
+    A caller that gives up before using its token hands it back with
+    `release`, so the callers queued behind it don't wait for it.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.epoch = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        if now <= self.updated:
+            return
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def pause(self, seconds: float):
+        with self._lock:
+            resume_at = time.monotonic() + seconds
+            if resume_at > self.updated:
+                self.updated = resume_at
+                self.tokens = min(self.capacity, 1)
+                self.epoch += 1
+
+    def try_take(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.updated and self.tokens >= 1 - 1e-9:
+                self.tokens -= 1
+                return True
+            return False
+
+    def reserve(self) -> Tuple[float, int]:
+        """
+        Take one token. Returns (seconds to wait before using it, epoch).
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(0.0, self.updated - now) + max(0.0, -self.tokens) / self.rate
+            return wait, self.epoch
+
+    def release(self, epoch: int):
+        """
+        Return an unused token reserved in `epoch`. Tokens of older epochs
+        were already written off by `pause`, so giving them back would let
+        the callers queued behind a Retry-After burst.
+        """
+        with self._lock:
+            if epoch == self.epoch:
+                self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class GeminiScheduler:
+    """
+    Paces Gemini calls through a token bucket sized to the quota and retries
+    429/5xx responses with exponential backoff and full jitter.
+
+    Throttling halves the allowed rate (down to `min_rate_fraction` of the
+    quota, at most once per `decrease_cooldown` seconds so a burst of 429s
+    counts as one signal) and every success adds back a small step, so the
+    pace settles just under whatever the API is actually accepting. A
+    Retry-After header pauses the whole bucket, not just the throttled caller.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        burst: int,
+        max_retries: int,
+        backoff_base: float,
+        backoff_max: float,
+        min_rate_fraction: float = 0.1,
+        decrease_cooldown: float = 1.0,
+    ):
+        self.max_rate = requests_per_minute / 60.0
+        self.min_rate = self.max_rate * min_rate_fraction
+        self.bucket = TokenBucket(self.max_rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.decrease_cooldown = decrease_cooldown
+
+        self._lock = threading.Lock()
+        self._last_decrease = 0.0
+        self.stats = {"attempts": 0, "throttled": 0, "server_errors": 0, "retries": 0}
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    def _count_attempt(self):
+        with self._lock:
+            self.stats["attempts"] += 1
+
+    def _on_success(self):
+        if self.bucket.rate < self.max_rate:
+            step = self.max_rate * 0.05
+            self.bucket.set_rate(min(self.max_rate, self.bucket.rate + step))
+
+    def _on_retryable(self, status_code: int, retry_after: Optional[float]):
+        now = time.monotonic()
+        decrease = False
+        with self._lock:
+            if status_code == 429:
+                self.stats["throttled"] += 1
+                if now - self._last_decrease >= self.decrease_cooldown:
+                    self._last_decrease = now
+                    decrease = True
+            else:
+                self.stats["server_errors"] += 1
+        if retry_after:
+            self.bucket.pause(retry_after)
+        if decrease:
+            self.bucket.set_rate(max(self.min_rate, self.bucket.rate / 2))
+
+    def _backoff_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            # the bucket is already paused until Retry-After has elapsed
+            return 0.0
+        ceiling = min(self.backoff_max, self.backoff_base * (2**attempt))
+        return random.uniform(0, ceiling)
+
+    def _handle(self, response, attempt: int) -> Optional[float]:
+        """
+        Record the outcome of one attempt. Returns the delay before retrying,
+        or None if the response should be handed back to the caller.
+        """
+        status = response.status_code
+        if status not in RETRYABLE_STATUS:
+            if status < 400:
+                self._on_success()
+            return None
+
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        self._on_retryable(status, retry_after)
+        if attempt >= self.max_retries:
+            return None
+
+        with self._lock:
+            self.stats["retries"] += 1
+        return self._backoff_delay(attempt, retry_after)
+
+    def _wait_for_token(self):
+        while True:
+            delay, epoch = self.bucket.reserve()
+            try:
+                time.sleep(delay)
+            except BaseException:
+                self.bucket.release(epoch)
+                raise
+            if epoch == self.bucket.epoch:
+                return
+            # paused while we waited, which wrote this token off: queue
+            # again behind the Retry-After
+
+    async def _await_token(self):
+        while True:
+            delay, epoch = self.bucket.reserve()
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                # cancelled, e.g. by the caller's deadline or a disconnect
+                self.bucket.release(epoch)
+                raise
+            if epoch == self.bucket.epoch:
+                return
+            # paused while we waited, which wrote this token off: queue
+            # again behind the Retry-After
+
+    def call(self, send: Callable[[], object]):
+        """
+        Run a blocking request through the scheduler.
+
+        Args:
+            send: Zero-argument callable that performs the HTTP request and
+                returns a response with `status_code` and `headers`.
+
+        Returns:
+            The first non-retryable response, or the last response once
+            retries are exhausted.
+        """
+        attempt = 0
+        while True:
+            self._wait_for_token()
+            self._count_attempt()
+            response = send()
+            delay = self._handle(response, attempt)
+            if delay is None:
+                return response
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, send: Callable[[], Awaitable[object]]):
+        """
+        Async counterpart of `call`; `send` returns an awaitable response.
+        """
+        attempt = 0
+        while True:
+            await self._await_token()
+            self._count_attempt()
+            response = await send()
+            delay = self._handle(response, attempt)
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+# Shared instance for every Gemini caller in the process
+gemini_scheduler = GeminiScheduler(
+    requests_per_minute=CONSTANTS.GEMINI_RPM,
+    burst=CONSTANTS.GEMINI_BURST,
+    max_retries=CONSTANTS.GEMINI_MAX_RETRIES,
+    backoff_base=CONSTANTS.GEMINI_BACKOFF_BASE,
+    backoff_max=CONSTANTS.GEMINI_BACKOFF_MAX,
+)
@@ -1,3 +1,13 @@
+import asyncio
+import time
+
+from utils.circuit_breaker import CircuitOpenError, gemini_breaker
+from utils.constants import CONSTANTS
+from utils.gemini_transport import get_transport
+from utils.llm_accounting import llm_usage
+from utils.llm_scheduler import gemini_scheduler
+
+
 def read_prompt_from_file(filepath) -> str:
     # Read the base prompt from the text file
     try:
@@ -7,3 +17,72 @@ def read_prompt_from_file(filepath) -> str:
         raise FileNotFoundError("File was not found.")
     except Exception as e:
         raise RuntimeError(f"An error occurred while reading the base prompt: {e}")
+
+
+def build_gemini_payload(prompt: str) -> dict:
+    return {"contents": [{"parts": [{"text": prompt}]}]}
+
+
+def _error_status(error: Exception) -> str:
+    # status label for calls that ended without a response
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    return type(error).__name__
+
+
+def post_gemini(payload: dict, url: str = None):
+    """
+    Send a generateContent request through the shared rate-limit scheduler
+    and the configured transport (live, record or replay). Returns the
+    final response after any retries. Each attempt goes through the circuit
+    breaker, so only Gemini's answers count towards its health, not time
+    queued for the rate limit; while it is open `CircuitOpenError` is
+    raised without calling Gemini.
+    """
+    url = url or CONSTANTS.GEMINI_URL
+    transport = get_transport()
+    start = time.perf_counter()
+    try:
+        response = gemini_scheduler.call(
+            lambda: gemini_breaker.call(lambda: transport.send(url, payload))
+        )
+    except CircuitOpenError:
+        raise  # no call was made
+    except Exception as e:
+        llm_usage.record_call(
+            _error_status(e), time.perf_counter() - start, transport=transport.name
+        )
+        raise
+    llm_usage.record_call(
+        response.status_code, time.perf_counter() - start, response, transport.name
+    )
+    return response
+
+
+async def post_gemini_async(payload: dict, url: str = None):
+    """
+    Async counterpart of `post_gemini`; live calls use the shared client.
+    The whole call, queueing and retries included, is cancelled after
+    GEMINI_DEADLINE seconds and raises `asyncio.TimeoutError`.
+    """
+    url = url or CONSTANTS.GEMINI_URL
+    transport = get_transport()
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(
+            gemini_scheduler.acall(
+                lambda: gemini_breaker.acall(lambda: transport.asend(url, payload))
+            ),
+            timeout=CONSTANTS.GEMINI_DEADLINE,
+        )
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        llm_usage.record_call(
+            _error_status(e), time.perf_counter() - start, transport=transport.name
+        )
+        raise
+    llm_usage.record_call(
+        response.status_code, time.perf_counter() - start, response, transport.name
+    )
+    return response
@@ -0,0 +1,54 @@
+import threading
+
+
+def rss_mb(field: str = "VmRSS") -> float:
+    """
+    Resident memory of this process from /proc/self/status (Linux). VmHWM is
+    the peak so far; unlike ru_maxrss it is reset on exec.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class PeakRss:
+    """
+    Samples RSS on a background thread while the block runs; `peak_mb` is
+    the highest RSS seen above the level at entry.
+
+        with PeakRss() as mem:
+            ...
+        print(mem.peak_mb)
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.start_mb = 0.0
+        self.max_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def peak_mb(self) -> float:
+        return max(self.max_mb - self.start_mb, 0.0)
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.max_mb = max(self.max_mb, rss_mb())
+
+    def __enter__(self):
+        self.start_mb = self.max_mb = rss_mb()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.max_mb = max(self.max_mb, rss_mb())
+        return False
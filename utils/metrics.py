@@ -0,0 +1,81 @@
+import threading
+from typing import Dict, Tuple
+
+
+def _key(name: str, labels: dict) -> Tuple[str, Tuple]:
+    return name, tuple(sorted(labels.items()))
+
+
+class Metrics:
+    """
+    Minimal in-process metrics registry: counters, gauges and summaries
+    (count/sum/max), rendered as Prometheus text or a JSON snapshot.
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+        self._summaries: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.setdefault(key, [0, 0.0, 0.0])
+            summary[0] += 1
+            summary[1] += value
+            summary[2] = max(summary[2], value)
+
+    def get(self, name: str, **labels) -> float:
+        key = _key(name, labels)
+        with self._lock:
+            return self._counters.get(key, self._gauges.get(key, 0))
+
+    def snapshot(self) -> dict:
+        def fmt(name, labels):
+            if not labels:
+                return name
+            return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+        with self._lock:
+            out = {fmt(*k): v for k, v in sorted(self._counters.items())}
+            out.update({fmt(*k): v for k, v in sorted(self._gauges.items())})
+            for k, (count, total, peak) in sorted(self._summaries.items()):
+                out[fmt(*k)] = {
+                    "count": count,
+                    "avg": total / count if count else 0.0,
+                    "max": peak,
+                }
+        return out
+
+    def render_prometheus(self) -> str:
+        def fmt(name, labels, suffix=""):
+            if not labels:
+                return f"{name}{suffix}"
+            body = ",".join(f'{k}="{v}"' for k, v in labels)
+            return f"{name}{suffix}{{{body}}}"
+
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                lines.append(f"{fmt(name, labels)} {value}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                lines.append(f"{fmt(name, labels)} {value}")
+            for (name, labels), (count, total, peak) in sorted(self._summaries.items()):
+                lines.append(f"{fmt(name, labels, '_count')} {count}")
+                lines.append(f"{fmt(name, labels, '_sum')} {total}")
+                lines.append(f"{fmt(name, labels, '_max')} {peak}")
+        return "\n".join(lines) + "\n"
+
+
+# Shared registry exposed at /metrics
+metrics = Metrics()
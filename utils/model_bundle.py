@@ -0,0 +1,264 @@
+"""
+A model version in one file: booster text, compiled category lookups, hex
+encoding tables and model_config, behind a checksummed header.
+
+    models/<version>/model.bundle
+
+    header (64 bytes): magic, format version, index length, payload length,
+                       sha256 of the payload
+    payload:           JSON index {name: dtype, shape, offset, nbytes}, then
+                       every section as raw array bytes, 64-byte aligned
+
+The file is memory-mapped on load and every array is a view into it, so
+loading costs parsing the booster text and little else. Categorical columns
+are stored as their categories sorted (fixed-width bytes for strings) with
+each one's code, so a lookup is np.searchsorted rather than building a
+pandas index of every hex per request.
+
+`load_model_bundle` is the one loader of the API, ModelLoader and
+`load_model`; versions saved before bundles existed are read from their
+separate files.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import Mapping
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+
+from utils.hex_encoding import HexEncoder, load_hex_encoder
+
+BUNDLE_FILE = "model.bundle"
+MAGIC = b"RPTMODEL"
+FORMAT_VERSION = 1
+# magic, format version, index bytes, payload bytes, sha256 of the payload
+_HEADER = struct.Struct("<8sIIQ32s")
+HEADER_SIZE = 64
+_ALIGN = 64
+
+
+def _aligned(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+class CategoryLookup(Mapping):
+    """
+    Training categories of each categorical column as sorted arrays with
+    their codes. As a mapping it gives {column: categories in code order},
+    like a category_map.
+    """
+
+    def __init__(self, columns: dict):
+        # {column: (sorted categories, code of each)}
+        self.columns = columns
+        self._categories = {}
+
+    @classmethod
+    def from_category_map(cls, category_map: dict) -> "CategoryLookup":
+        columns = {}
+        for col, cats in category_map.items():
+            values = _category_array(cats)
+            order = np.argsort(values, kind="stable")
+            columns[col] = (values[order], order.astype(np.int32))
+        return cls(columns)
+
+    def __getitem__(self, col) -> list:
+        if col not in self._categories:
+            values, codes = self.columns[col]
+            cats = np.empty_like(values)
+            cats[codes] = values
+            if cats.dtype.kind == "S":
+                cats = np.char.decode(cats, "utf-8")
+            self._categories[col] = cats.tolist()
+        return self._categories[col]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    def codes(self, col, values) -> np.ndarray:
+        """Codes of `values` in `col` as floats; NaN if unseen or missing."""
+        sorted_values, codes = self.columns[col]
+        if sorted_values.dtype.kind == "S":
+            query = np.array(
+                [v.encode("utf-8") if isinstance(v, str) else b"" for v in values]
+            )
+        else:
+            query = np.array(
+                [np.nan if v is None else v for v in values], dtype=np.float64
+            )
+        out = np.full(len(query), np.nan)
+        if len(sorted_values):
+            idx = np.searchsorted(sorted_values, query)
+            idx[idx == len(sorted_values)] = 0
+            found = sorted_values[idx] == query
+            out[found] = codes[idx[found]]
+        return out
+
+    def encode_row(self, features, values: dict) -> np.ndarray:
+        """One model input row (1 x features), categoricals as their codes."""
+        row = np.empty((1, len(features)))
+        for i, col in enumerate(features):
+            value = values[col]
+            if col in self.columns:
+                row[0, i] = self.codes(col, [value])[0]
+            else:
+                row[0, i] = np.nan if value is None else value
+        return row
+
+    def to_arrays(self) -> dict:
+        arrays = {}
+        for col, (values, codes) in self.columns.items():
+            arrays[f"{col}/values"] = values
+            arrays[f"{col}/codes"] = codes
+        return arrays
+
+
+def _category_array(cats) -> np.ndarray:
+    if all(isinstance(c, str) for c in cats):
+        return np.array([c.encode("utf-8") for c in cats], dtype=bytes)
+    values = np.asarray(list(cats))
+    if values.dtype.kind not in "iuf":
+        raise ValueError("Categories must be all strings or all numbers")
+    return values.astype(np.float64)
+
+
+class ModelBundle:
+    """What a saved model version serves with: booster, categories, config."""
+
+    def __init__(self, model, category_map, config: dict, hex_encoder=None):
+        self.model = model
+        self.category_map = category_map
+        self.config = config
+        self.hex_encoder = hex_encoder
+
+
+def write_bundle(path, model, category_map: dict, config: dict, hex_encoder=None):
+    """Write `model.bundle` to `path` (atomically, through a .tmp file)."""
+    sections = {
+        "config": np.frombuffer(json.dumps(config).encode("utf-8"), np.uint8),
+        "model": np.frombuffer(model.model_to_string().encode("utf-8"), np.uint8),
+    }
+    lookup = CategoryLookup.from_category_map(category_map)
+    sections.update({f"cat/{k}": v for k, v in lookup.to_arrays().items()})
+    if hex_encoder is not None:
+        sections.update({f"hex/{k}": v for k, v in hex_encoder.to_arrays().items()})
+
+    index, offset = {}, 0
+    for name, array in sections.items():
+        index[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+            "nbytes": array.nbytes,
+        }
+        offset = _aligned(offset + array.nbytes)
+    index_bytes = json.dumps(index).encode("utf-8")
+    start = _aligned(len(index_bytes))  # sections start after the index
+
+    chunks = [index_bytes.ljust(start, b"\0")] + [
+        array.tobytes().ljust(_aligned(array.nbytes), b"\0")
+        for array in sections.values()
+    ]
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    payload = sum(len(chunk) for chunk in chunks)
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, len(index_bytes), payload, digest.digest()
+    )
+
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+
+
+def read_bundle(path, verify: bool = True) -> ModelBundle:
+    """
+    Memory-map a model.bundle. With `verify`, the payload's sha256 must
+    match the header's.
+
+    Raises:
+        ValueError: not a bundle, a newer format version or a bad checksum
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if len(view) < HEADER_SIZE:
+        raise ValueError(f"{path} is not a model bundle")
+    magic, version, index_len, payload, checksum = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a model bundle")
+    if version > FORMAT_VERSION:
+        raise ValueError(
+            f"{path} has bundle format {version}; this code reads up to "
+            f"{FORMAT_VERSION}"
+        )
+    body = view[HEADER_SIZE:]
+    if len(body) != payload:
+        raise ValueError(f"{path} is truncated")
+    if verify and hashlib.sha256(body).digest() != checksum:
+        raise ValueError(f"{path} failed its checksum")
+
+    index = json.loads(bytes(body[:index_len]))
+    start = _aligned(index_len)
+
+    def section(name) -> np.ndarray:
+        entry = index[name]
+        dtype = np.dtype(entry["dtype"])
+        array = np.frombuffer(
+            body,
+            dtype=dtype,
+            count=entry["nbytes"] // dtype.itemsize,
+            offset=start + entry["offset"],
+        )
+        return array.reshape(entry["shape"])
+
+    config = json.loads(section("config").tobytes())
+    model = lgb.Booster(model_str=section("model").tobytes().decode("utf-8"))
+    lookup = CategoryLookup(
+        {
+            col: (section(f"cat/{col}/values"), section(f"cat/{col}/codes"))
+            for col in config["categorical"]
+        }
+    )
+    hex_encoder = None
+    if "hex/settings" in index:
+        hex_encoder = HexEncoder.from_arrays(
+            {name[4:]: section(name) for name in index if name.startswith("hex/")}
+        )
+    return ModelBundle(model, lookup, config, hex_encoder)
+
+
+def read_model_files(model_dir: Path) -> ModelBundle:
+    """A version saved as model.pkl, category_map.pkl and model_config.json."""
+    paths = [model_dir / name for name in ("model.pkl", "category_map.pkl")]
+    config_path = model_dir / "model_config.json"
+    if not all(p.exists() for p in paths + [config_path]):
+        raise FileNotFoundError(f"Model files not found in {model_dir}")
+    with open(paths[0], "rb") as f:
+        model = pickle.load(f)
+    with open(paths[1], "rb") as f:
+        category_map = pickle.load(f)
+    with open(config_path) as f:
+        config = json.load(f)
+    return ModelBundle(model, category_map, config, load_hex_encoder(model_dir, config))
+
+
+def load_model_bundle(model_dir, verify: bool = True) -> ModelBundle:
+    """The model in `model_dir`, from its bundle if it has one."""
+    model_dir = Path(model_dir)
+    if (model_dir / BUNDLE_FILE).exists():
+        return read_bundle(model_dir / BUNDLE_FILE, verify=verify)
+    return read_model_files(model_dir)
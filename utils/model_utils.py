@@ -12,14 +12,29 @@ from sklearn.metrics import (
 from lightgbm import early_stopping, log_evaluation
 import pickle
 import json
+import yaml
 from pathlib import Path
 
-project_root = Path(__file__).resolve().parents[2]
+from utils.model_bundle import (
+    BUNDLE_FILE,
+    CategoryLookup,
+    load_model_bundle,
+    write_bundle,
+)
+
+project_root = Path(__file__).resolve().parents[1]
+CONFIG_PATH = project_root / "src" / "config" / "config.yaml"
+
+
+def load_config(path=CONFIG_PATH) -> dict:
+    """The project config: features, target, LightGBM params, training."""
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
 
 
-def split_dataset(df, features, target):
-    traindf = df[df["year"] < 2025].copy()
-    testdf = df[df["year"] == 2025].copy()
+def split_dataset(df, features, target, test_year=2025):
+    traindf = df[df["year"] < test_year].copy()
+    testdf = df[df["year"] == test_year].copy()
 
     X_train, X_test = traindf[features], testdf[features]
     y_train, y_test = traindf[target], testdf[target]
@@ -29,7 +44,12 @@ def split_dataset(df, features, target):
 
 def prepare_categorical(X_train, X_test, cat_cols):
     for col in cat_cols:
-        X_train[col] = X_train[col].astype("category")
+        # columns loaded as categoricals may carry categories of other rows;
+        # keep only the training values, sorted as for plain strings
+        train_col = X_train[col].astype("category").cat.remove_unused_categories()
+        X_train[col] = train_col.cat.reorder_categories(
+            train_col.cat.categories.sort_values()
+        )
         X_test[col] = pd.Categorical(
             X_test[col], categories=X_train[col].cat.categories
         )
@@ -37,31 +57,65 @@ def prepare_categorical(X_train, X_test, cat_cols):
     return X_train, X_test, category_map
 
 
-def train_model(X_train, X_test, y_train, y_test, cat_cols):
-    train_data = lgb.Dataset(X_train, label=y_train)
-    valid_data = lgb.Dataset(X_test, label=y_test, reference=train_data)
+def apply_category_map(df, category_map):
+    """Encode categorical columns of `df` with the categories seen in training."""
+    for col, cats in category_map.items():
+        if col in df.columns:
+            df[col] = pd.Categorical(df[col], categories=cats)
+    return df
 
-    params = {
-        "objective": "regression",
-        "metric": "rmse",
-        "verbosity": -1,
-        "boosting_type": "gbdt",
-        "learning_rate": 0.05,
-        "num_leaves": 31,
-        "feature_fraction": 0.9,
-        "bagging_fraction": 0.8,
-        "bagging_freq": 5,
-        "seed": 42,
-    }
 
-    model = lgb.train(
+def extend_category_map(category_map, df):
+    """
+    `category_map` with the values of `df` it lacks appended (sorted) to
+    each column's categories. Existing categories keep their codes, so a
+    model trained with `category_map` predicts the same for known values
+    and sends new ones where it sent unseen values before.
+
+    Returns:
+        (extended map, {column: number of categories added})
+    """
+    extended, added = {}, {}
+    for col, cats in category_map.items():
+        known = pd.Index(cats)
+        values = df[col].dropna().astype(object).unique() if col in df else []
+        new = pd.Index(values).difference(known).sort_values()
+        extended[col] = cats + new.tolist()
+        added[col] = len(new)
+    return extended, added
+
+
+def train_model(X_train, X_test, y_train, y_test, cat_cols, params=None):
+    """Train on pandas frames with `params` (default: config.yaml's)."""
+    train_data = lgb.Dataset(X_train, label=y_train)
+    valid_data = lgb.Dataset(X_test, label=y_test, reference=train_data)
+    return train_booster(params or load_config()["params"], train_data, valid_data)
+
+
+def train_booster(
+    params,
+    train_data,
+    valid_data,
+    num_boost_round=1000,
+    early_stopping_rounds=50,
+    log_period=100,
+    init_model=None,
+):
+    """
+    `lgb.train` with early stopping on `valid_data`, continuing the trees
+    of `init_model` if given.
+    """
+    return lgb.train(
         params,
         train_data,
         valid_sets=[train_data, valid_data],
-        num_boost_round=1000,
-        callbacks=[early_stopping(stopping_rounds=50), log_evaluation(100)],
+        num_boost_round=num_boost_round,
+        init_model=init_model,
+        callbacks=[
+            early_stopping(stopping_rounds=early_stopping_rounds),
+            log_evaluation(log_period),
+        ],
     )
-    return model
 
 
 def evaluate(y_true, y_pred_log):
@@ -100,7 +154,16 @@ def save_metrics(metrics: dict, model_version: str):
     print(f"📈 Metrics saved at: {metrics_path}")
 
 
-def save_all(model, category_map, model_version, features, target, model_tag="default"):
+def save_all(
+    model,
+    category_map,
+    model_version,
+    features,
+    target,
+    model_tag="default",
+    extra=None,
+    hex_encoder=None,
+):
     out_dir = project_root / "models" / model_version
     out_dir.mkdir(parents=True, exist_ok=True)
 
@@ -109,6 +172,7 @@ def save_all(model, category_map, model_version, features, target, model_tag="de
     model_pkl_path = out_dir / "model.pkl"
     category_path = out_dir / "category_map.pkl"
     config_path = out_dir / "model_config.json"
+    bundle_path = out_dir / BUNDLE_FILE
 
     # Save LightGBM model in .txt and .pkl formats
     model.save_model(model_txt_path)
@@ -130,16 +194,32 @@ def save_all(model, category_map, model_version, features, target, model_tag="de
             "model_txt": str(model_txt_path),
             "model_pickle": str(model_pkl_path),
             "category_map": str(category_path),
+            "bundle": str(bundle_path),
         },
     }
+    # lookups replacing the hex categoricals (utils/hex_encoding.py)
+    if hex_encoder is not None:
+        hex_path = out_dir / "hex_encoding.npz"
+        hex_encoder.save(hex_path)
+        config["artifacts"]["hex_encoding"] = str(hex_path)
+        config["hex_encoding"] = {
+            **hex_encoder.settings(),
+            "features": hex_encoder.features,
+        }
+    # e.g. how the model was trained
+    config.update(extra or {})
 
     with open(config_path, "w") as f:
         json.dump(config, f, indent=2)
 
+    # everything above in one memory-mappable file (utils/model_bundle.py)
+    write_bundle(bundle_path, model, category_map, config, hex_encoder)
+
     print(f"✔ Model saved in {out_dir}")
     print(f"• TXT model:     {model_txt_path}")
     print(f"• Pickle model:  {model_pkl_path}")
     print(f"• Config:        {config_path}")
+    print(f"• Bundle:        {bundle_path}")
 
 
 def load_model(version: str, tag: str = "default"):
@@ -151,28 +231,14 @@ def load_model(version: str, tag: str = "default"):
         tag (str): Optional model tag to verify identity
 
     Returns:
-        model, category_map, config
+        model, category_map, config: from model.bundle if the version has
+        one (category_map is then a CategoryLookup), else from its pickles
 
     Raises:
-        FileNotFoundError / ValueError if paths or tag mismatch
+        FileNotFoundError / ValueError if paths, checksum or tag mismatch
     """
-    base_path = project_root / "models" / version
-
-    model_pkl_path = base_path / "model.pkl"
-    category_path = base_path / "category_map.pkl"
-    config_path = base_path / "model_config.json"
-
-    if not all(p.exists() for p in [model_pkl_path, category_path, config_path]):
-        raise FileNotFoundError(
-            f"Model files not found in version: {version}, {base_path}"
-        )
-
-    with open(model_pkl_path, "rb") as f:
-        model = pickle.load(f)
-    with open(category_path, "rb") as f:
-        category_map = pickle.load(f)
-    with open(config_path, "r") as f:
-        config = json.load(f)
+    bundle = load_model_bundle(project_root / "models" / version)
+    model, category_map, config = bundle.model, bundle.category_map, bundle.config
 
     # if config.get("tag") != tag:
     #     raise ValueError(
@@ -196,13 +262,16 @@ def predict_lane_price(model, category_map, features, **kwargs):
         Predicted base_price (float, rounded to 2 decimals)
     """
 
+    # compiled lookups of a bundle: codes straight into a numpy row
+    if isinstance(category_map, CategoryLookup):
+        log_price = model.predict(category_map.encode_row(features, kwargs))[0]
+        return round(np.expm1(log_price), 2)
+
     # Build single-row DataFrame
     df_input = pd.DataFrame([kwargs], columns=features)
 
     # Ensure categorical dtypes are preserved
-    for col, cats in category_map.items():
-        if col in df_input.columns:
-            df_input[col] = pd.Categorical(df_input[col], categories=cats)
+    df_input = apply_category_map(df_input, category_map)
 
     # Predict and inverse log
     log_price = model.predict(df_input)[0]
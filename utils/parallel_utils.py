@@ -0,0 +1,82 @@
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import pandas as pd
+
+# Frame being split by `map_row_chunks`; forked workers inherit it, so only
+# row bounds are sent to them and only results come back
+_SHARED = None
+
+
+def resolve_workers(workers: int) -> int:
+    """0 or less means every available core."""
+    if workers and workers > 0:
+        return workers
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def split_cores(workers: int, tasks: int):
+    """
+    (workers, threads per worker) for `tasks` multi-threaded tasks:
+    `workers` of 0 means one per core, never more workers than tasks, and
+    the cores shared out between them.
+    """
+    cores = resolve_workers(0)
+    workers = max(1, min(resolve_workers(workers), tasks))
+    return workers, max(1, cores // workers)
+
+
+def chunk_bounds(n_rows: int, chunk_rows: int):
+    return [
+        (start, min(start + chunk_rows, n_rows))
+        for start in range(0, n_rows, max(chunk_rows, 1))
+    ]
+
+
+def run_stages(stages, df: pd.DataFrame) -> pd.DataFrame:
+    for stage in stages:
+        df = stage(df)
+    return df
+
+
+def _run_slice(fn, start: int, stop: int):
+    return fn(_SHARED.iloc[start:stop].copy())
+
+
+def _run_chunk(fn, chunk: pd.DataFrame):
+    return fn(chunk)
+
+
+def map_row_chunks(fn, df: pd.DataFrame, workers: int, chunk_rows: int):
+    """
+    Apply a row-local `fn` (each output row depends only on its input row)
+    to contiguous chunks of `df` in a process pool and concatenate the
+    results in input order, which makes the output identical to `fn(df)`.
+    `fn` must be picklable: a module-level function or a partial of one.
+    """
+    global _SHARED
+    bounds = chunk_bounds(len(df), chunk_rows)
+    workers = min(resolve_workers(workers), len(bounds))
+    if workers <= 1:
+        return fn(df)
+
+    if "fork" in mp.get_all_start_methods():
+        _SHARED = df
+        try:
+            with ProcessPoolExecutor(
+                workers, mp_context=mp.get_context("fork")
+            ) as pool:
+                starts, stops = zip(*bounds)
+                parts = list(pool.map(_run_slice, repeat(fn), starts, stops))
+        finally:
+            _SHARED = None
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            chunks = (df.iloc[start:stop] for start, stop in bounds)
+            parts = list(pool.map(_run_chunk, repeat(fn), chunks))
+    return pd.concat(parts)
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict
+
+from utils.llm_utils import read_prompt_from_file
+
+PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
+
+# {{name}} placeholders, as used in utils/prompts/*.txt
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+
+class PromptTemplate:
+    """
+    A prompt file split once into literal chunks and placeholder names, so
+    rendering is a single join instead of chained string replaces.
+    """
+
+    def __init__(self, name: str, text: str, mtime_ns: int):
+        self.name = name
+        self.text = text
+        self.mtime_ns = mtime_ns
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+        # even indexes are literal text, odd indexes are placeholder names
+        self._parts = PLACEHOLDER_PATTERN.split(text)
+        self.placeholders = sorted(set(self._parts[1::2]))
+
+    def render(self, **values) -> str:
+        missing = [p for p in self.placeholders if p not in values]
+        if missing:
+            raise KeyError(f"Prompt '{self.name}' missing values for: {missing}")
+
+        parts = list(self._parts)
+        parts[1::2] = [str(values[p]) for p in self._parts[1::2]]
+        return "".join(parts)
+
+
+class PromptRegistry:
+    """
+    Loads every template in the prompts directory and reloads one when its
+    file's mtime changes. Each template carries a content-hash `version`
+    that callers can fold into cache keys.
+    """
+
+    def __init__(self, prompts_dir: Path = PROMPTS_DIR):
+        self.prompts_dir = Path(prompts_dir)
+        self._templates: Dict[str, PromptTemplate] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> Path:
+        return self.prompts_dir / f"{name}.txt"
+
+    def _load(self, name: str, mtime_ns: int) -> PromptTemplate:
+        text = read_prompt_from_file(self._path(name))
+        template = PromptTemplate(name, text, mtime_ns)
+        with self._lock:
+            self._templates[name] = template
+        return template
+
+    def load_all(self):
+        for path in sorted(self.prompts_dir.glob("*.txt")):
+            self._load(path.stem, os.stat(path).st_mtime_ns)
+        print(f"Loaded prompts: {self.versions()}")
+
+    def get(self, name: str) -> PromptTemplate:
+        """
+        Return the compiled template for `name` (file stem), reloading it
+        if the file changed on disk since it was last compiled.
+        """
+        try:
+            mtime_ns = os.stat(self._path(name)).st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Prompt template not found: {self._path(name)}")
+
+        template = self._templates.get(name)
+        if template is None or template.mtime_ns != mtime_ns:
+            template = self._load(name, mtime_ns)
+        return template
+
+    def versions(self) -> Dict[str, str]:
+        return {name: t.version for name, t in sorted(self._templates.items())}
+
+
+# Shared instance, loaded on API startup
+prompt_registry = PromptRegistry()
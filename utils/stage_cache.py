@@ -0,0 +1,73 @@
+import glob
+import hashlib
+import inspect
+import json
+import os
+
+import pandas as pd
+
+
+def file_digest(path, chunk_size: int = 1 << 20) -> str:
+    """sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_digest(code) -> str:
+    """sha256 over the source of functions and/or modules."""
+    digest = hashlib.sha256()
+    for obj in code:
+        digest.update(inspect.getsource(obj).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def stage_key(input_key: str, code, params: dict) -> str:
+    """
+    Cache key of a stage: what it reads (the previous stage's key or the
+    raw file's digest), the source of the code it runs and its parameters.
+    """
+    digest = hashlib.sha256()
+    digest.update(input_key.encode("utf-8"))
+    digest.update(code_digest(code).encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Pickled DataFrames per (stage, key) under `cache_dir`. Only the
+    `keep` most recent outputs of each stage are kept on disk.
+    """
+
+    def __init__(self, cache_dir, keep: int = 3):
+        self.cache_dir = str(cache_dir)
+        self.keep = keep
+
+    def path(self, stage: str, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{stage}-{key[:16]}.pkl")
+
+    def has(self, stage: str, key: str) -> bool:
+        return os.path.exists(self.path(stage, key))
+
+    def load(self, stage: str, key: str) -> pd.DataFrame:
+        return pd.read_pickle(self.path(stage, key))
+
+    def store(self, stage: str, key: str, df: pd.DataFrame):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(stage, key)
+        tmp = path + ".tmp"
+        df.to_pickle(tmp)
+        os.replace(tmp, path)  # never leave a half-written entry behind
+        self._prune(stage)
+
+    def _prune(self, stage: str):
+        entries = sorted(
+            glob.glob(os.path.join(self.cache_dir, f"{stage}-*.pkl")),
+            key=os.path.getmtime,
+            reverse=True,
+        )
+        for stale in entries[self.keep :]:
+            os.remove(stale)
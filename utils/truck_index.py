@@ -0,0 +1,249 @@
+import glob
+import json
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.cleaning_utils import normalize_raw_truck
+
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+# Numbers (capacity, length, wheels) decide the truck code, so a number token
+# counts as much as this many character n-grams.
+NUMBER_WEIGHT = 3.0
+
+
+def truck_features(raw: str, ngram: int = 3) -> Counter:
+    """
+    Character n-grams of the upper-cased, whitespace-collapsed name, plus one
+    token per number so that "9 MT" and "19 MT" don't look alike.
+    """
+    text = " ".join(str(raw).upper().split())
+    padded = f"^{text}$"
+    features = Counter(padded[i : i + ngram] for i in range(len(padded) - ngram + 1))
+    for number in NUMBER_PATTERN.findall(text):
+        features[f"#{float(number):g}"] += NUMBER_WEIGHT
+    return features
+
+
+class TruckNameIndex:
+    """
+    TF-IDF cosine index over raw truck names from previously cleaned outputs.
+
+    Weights are kept both per feature (postings) and per entry, as flat numpy
+    arrays. A query accumulates partial scores from the postings of its
+    rarest features only, stopping once the remaining features can't lift a
+    non-candidate to `min_score` or `posting_budget` postings have been read,
+    then re-scores the best `max_candidates` exactly. Common n-grams like
+    " MT" therefore never expand to the whole index, which keeps queries
+    sub-millisecond at 100k entries; the budget makes the search approximate
+    on very repetitive corpora (see scripts/bench_truck_index.py for recall).
+    """
+
+    def __init__(
+        self, ngram: int = 3, posting_budget: int = 20000, max_candidates: int = 256
+    ):
+        self.ngram = ngram
+        self.posting_budget = posting_budget
+        self.max_candidates = max_candidates
+        self.entries: List[dict] = []
+        self.raw_names: List[str] = []
+        self.exact: Dict[str, int] = {}
+        self.vocab: Dict[str, int] = {}
+        self.idf = np.zeros(0, dtype=np.float32)
+        # postings: feature -> (doc_ids, weights)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.float32)
+        self.max_weight = np.zeros(0, dtype=np.float32)
+        # per entry: doc -> (feature ids, weights)
+        self.doc_indptr = np.zeros(1, dtype=np.int64)
+        self.doc_feats = np.zeros(0, dtype=np.int32)
+        self.doc_weights = np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def build(self, items: Iterable[Tuple[str, dict]]) -> "TruckNameIndex":
+        """
+        Args:
+            items: (raw_truck_name, cleaned result) pairs. Duplicates by
+                normalized name keep the first occurrence.
+        """
+        docs = []
+        for raw, result in items:
+            key = normalize_raw_truck(raw)
+            if key in self.exact:
+                continue
+            self.exact[key] = len(self.entries)
+            self.entries.append(result)
+            self.raw_names.append(raw)
+            docs.append(truck_features(raw, self.ngram))
+
+        n_docs = len(docs)
+        df = Counter(f for doc in docs for f in doc)
+        self.vocab = {f: i for i, f in enumerate(sorted(df))}
+        self.idf = np.array(
+            [math.log((1 + n_docs) / (1 + df[f])) + 1 for f in sorted(df)],
+            dtype=np.float32,
+        )
+
+        # (feature, doc, weight) triples, L2-normalised per doc
+        feat_idx, doc_idx, weight = [], [], []
+        for d, doc in enumerate(docs):
+            cols = [self.vocab[f] for f in doc]
+            w = np.array(list(doc.values()), dtype=np.float32) * self.idf[cols]
+            w /= np.linalg.norm(w) or 1.0
+            feat_idx.extend(cols)
+            doc_idx.extend([d] * len(cols))
+            weight.extend(w.tolist())
+
+        feat_idx = np.asarray(feat_idx, dtype=np.int32)
+        doc_idx = np.asarray(doc_idx, dtype=np.int32)
+        weight = np.asarray(weight, dtype=np.float32)
+
+        self.doc_feats, self.doc_weights = feat_idx, weight
+        self.doc_indptr = np.searchsorted(doc_idx, np.arange(n_docs + 1))
+
+        order = np.argsort(feat_idx, kind="stable")
+        self.doc_ids = doc_idx[order]
+        self.weights = weight[order]
+        self.indptr = np.searchsorted(feat_idx[order], np.arange(len(self.vocab) + 1))
+        self.max_weight = np.zeros(len(self.vocab), dtype=np.float32)
+        np.maximum.at(self.max_weight, feat_idx, weight)
+        return self
+
+    @classmethod
+    def from_files(cls, pattern: str, ngram: int = 3) -> "TruckNameIndex":
+        """
+        Build from `cleaned_truck_outputs*.json` files written by
+        src/data/clean_truck_types.py. Failed entries are skipped.
+        """
+        items = []
+        for path in sorted(glob.glob(pattern)):
+            with open(path, "r") as f:
+                for entry in json.load(f):
+                    if entry.get("status") == "failed" or not entry.get("cleaned_code"):
+                        continue
+                    raw = entry.get("raw") or entry.get("raw_truck_name")
+                    if not raw:
+                        continue
+                    items.append(
+                        (
+                            raw,
+                            {
+                                "cleaned_code": entry["cleaned_code"],
+                                "dimensions": entry.get("dimensions", {}),
+                                "reasoning": entry.get("reasoning", ""),
+                            },
+                        )
+                    )
+        return cls(ngram).build(items)
+
+    def _query_vector(self, raw: str):
+        features = truck_features(raw, self.ngram)
+        known = [f for f in features if f in self.vocab]
+        cols = np.array([self.vocab[f] for f in known], dtype=np.int64)
+        q = np.array([features[f] for f in known], dtype=np.float32) * self.idf[cols]
+
+        # unseen features (df=0) still count towards the query norm
+        unseen_idf = math.log(1 + len(self.entries)) + 1
+        unseen = sum(
+            (v * unseen_idf) ** 2 for f, v in features.items() if f not in self.vocab
+        )
+        q /= math.sqrt(float(q @ q) + unseen) or 1.0
+        return cols, q
+
+    def _candidates(self, cols, q, min_score: float) -> np.ndarray:
+        # rarest features first
+        lengths = self.indptr[cols + 1] - self.indptr[cols]
+        order = np.argsort(lengths, kind="stable")
+        cols, q, lengths = cols[order], q[order], lengths[order]
+
+        # stop once the remaining features can't reach min_score on their own...
+        bound = np.cumsum((q * self.max_weight[cols])[::-1])[::-1]
+        stop = int(np.sum(bound >= min_score)) if min_score > 0 else len(cols)
+        # ...or the posting budget is spent (always read at least one feature)
+        within_budget = int(np.sum(np.cumsum(lengths) <= self.posting_budget))
+        prefix = max(1, min(stop, within_budget))
+
+        ids = np.concatenate(
+            [self.doc_ids[self.indptr[c] : self.indptr[c + 1]] for c in cols[:prefix]]
+        )
+        w = np.concatenate(
+            [self.weights[self.indptr[c] : self.indptr[c + 1]] for c in cols[:prefix]]
+        )
+        partial = np.bincount(ids, weights=w * np.repeat(q[:prefix], lengths[:prefix]))
+        # rank postings by their doc's partial score instead of scanning the
+        # whole score array; docs repeat across postings, hence the unique()
+        ranked = partial[ids]
+        take = self.max_candidates * 4
+        if len(ids) > take:
+            ids = ids[np.argpartition(-ranked, take - 1)[:take]]
+        candidates = np.unique(ids)
+        if len(candidates) > self.max_candidates:
+            best = np.argpartition(-partial[candidates], self.max_candidates - 1)
+            candidates = candidates[best[: self.max_candidates]]
+        return candidates
+
+    def query(self, raw: str, k: int = 1, min_score: float = 0.0):
+        """
+        Args:
+            raw: Raw truck name.
+            k: Number of neighbours to return.
+            min_score: Score the caller cares about; lets the search stop
+                reading postings early.
+
+        Returns:
+            Up to k (cosine score, entry id) pairs, best first.
+        """
+        if not self.entries:
+            return []
+
+        exact = self.exact.get(normalize_raw_truck(raw))
+        if exact is not None:
+            return [(1.0, exact)]
+
+        cols, q = self._query_vector(raw)
+        if len(cols) == 0:
+            return []
+
+        candidates = self._candidates(cols, q, min_score)
+
+        # gather every candidate's (feature, weight) run in one shot
+        starts = self.doc_indptr[candidates]
+        lengths = self.doc_indptr[candidates + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        idx = offsets + np.arange(int(lengths.sum()))
+
+        q_dense = np.zeros(len(self.vocab), dtype=np.float32)
+        q_dense[cols] = q
+        scores = np.bincount(
+            np.repeat(np.arange(len(candidates)), lengths),
+            weights=self.doc_weights[idx] * q_dense[self.doc_feats[idx]],
+            minlength=len(candidates),
+        )
+
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(k)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(float(scores[i]), int(candidates[i])) for i in top]
+
+    def best_match(self, raw: str, threshold: float) -> Optional[dict]:
+        """
+        Closest known truck if its similarity clears `threshold`, as a
+        clean_truck style response with `match_score` and `matched_raw`.
+        """
+        hits = self.query(raw, k=1, min_score=threshold)
+        if not hits or hits[0][0] < threshold:
+            return None
+        score, idx = hits[0]
+        return {
+            **self.entries[idx],
+            "raw_truck_name": raw,
+            "match_score": round(min(score, 1.0), 4),
+            "matched_raw": self.raw_names[idx],
+        }